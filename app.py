@@ -2,13 +2,16 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import os
 import streamlit as st
-import pandas as pd
 
-from models import ClosureTable
+from models import ClosureTable, ClosureHistory
+from sqlite_store import SQLiteClosureTable, resolve_database_path
 from views import AdminView, UserView
 from text_interface import TextInterface
-from utils import get_file_id
+from utils import (
+    get_file_id, ClosureFileReader, columnar_formats_available, is_edge_list, read_edge_list, COLUMNAR_EXTENSIONS
+)
 
 def main():
     """Main application entry point."""
@@ -23,6 +26,9 @@ def main():
     if 'admin_closure_table' not in st.session_state:
         st.session_state.admin_closure_table = ClosureTable.create_default_admin_table()
     
+    if 'admin_history' not in st.session_state:
+        st.session_state.admin_history = ClosureHistory()
+    
     if 'user_closure_table' not in st.session_state:
         st.session_state.user_closure_table = ClosureTable.create_empty_user_table()
     
@@ -31,6 +37,7 @@ def main():
     
     # Handle file upload
     handle_file_upload()
+    handle_database()
     
     # Render the appropriate view
     if page == "Administrátor":
@@ -48,50 +55,135 @@ def main():
 
 def handle_file_upload():
     """Handle file upload for admin and user closure tables."""
+    # Parquet and Arrow files keep their dtypes but need pyarrow
+    file_types = ["csv"] + (COLUMNAR_EXTENSIONS if columnar_formats_available() else [])
+    
     # Admin file upload
     with st.sidebar.expander("Admin súbory", expanded=False):
-        uploaded_admin_file = st.file_uploader("Nahraj admin closure_table (CSV)", type="csv", key="admin_uploader")
+        uploaded_admin_file = st.file_uploader("Nahraj admin closure_table (CSV, Parquet, Arrow)", type=file_types, key="admin_uploader")
+        # Deep hierarchies can keep only short paths plus the parent links
+        closure_depth = st.number_input(
+            "Ukladať cesty do hĺbky (0 = celá closure tabuľka)", min_value=0, value=0, step=1, key="admin_closure_depth"
+        )
         
         if uploaded_admin_file is not None:
             file_id = get_file_id(uploaded_admin_file)
             
             if file_id not in st.session_state.processed_file_ids:
-                df = pd.read_csv(uploaded_admin_file)
-                st.session_state.admin_closure_table = ClosureTable(df)
-                
-                # Synchronize user table with the newly uploaded admin table
-                if 'user_closure_table' in st.session_state:
-                    st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(
-                        st.session_state.admin_closure_table
-                    )
-                
-                st.session_state.working_file_id = file_id
-                st.session_state.processed_file_ids = {file_id}
-                st.success("Admin closure_table úspešne nahraný!")
-                st.rerun()
+                # The admin table is the reference tree, so every node must be complete
+                admin_table = load_uploaded_table(
+                    uploaded_admin_file, closure_depth=closure_depth or None, require_complete=True, is_admin=True
+                )
+                if admin_table is not None:
+                    st.session_state.admin_closure_table = admin_table
+                    st.session_state.admin_history = ClosureHistory()
+                    
+                    # Synchronize user table with the newly uploaded admin table
+                    if 'user_closure_table' in st.session_state:
+                        st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(
+                            st.session_state.admin_closure_table
+                        )
+                    
+                    st.session_state.working_file_id = file_id
+                    st.session_state.processed_file_ids = {file_id}
+                    st.success("Admin closure_table úspešne nahraný!")
+                    st.rerun()
     
     # User file upload
     with st.sidebar.expander("Používateľské súbory", expanded=False):
-        uploaded_user_file = st.file_uploader("Nahraj používateľský closure_table (CSV)", type="csv", key="user_uploader")
+        uploaded_user_file = st.file_uploader("Nahraj používateľský closure_table (CSV, Parquet, Arrow)", type=file_types, key="user_uploader")
         
         if uploaded_user_file is not None:
             file_id = get_file_id(uploaded_user_file)
             
             if file_id not in st.session_state.processed_file_ids:
-                df = pd.read_csv(uploaded_user_file)
-                
                 # Create a new ClosureTable from the uploaded file
-                user_table = ClosureTable(df)
-                
-                # Synchronize with the admin table to ensure consistency
-                user_table = user_table.synchronize_with(st.session_state.admin_closure_table)
-                
-                # Update the session state
-                st.session_state.user_closure_table = user_table
-                st.session_state.working_file_id = file_id
-                st.session_state.processed_file_ids = {file_id}
-                st.success("Používateľský closure_table úspešne nahraný!")
-                st.rerun()
+                user_table = load_uploaded_table(uploaded_user_file)
+                if user_table is not None:
+                    # Synchronize with the admin table to ensure consistency
+                    user_table = user_table.synchronize_with(st.session_state.admin_closure_table)
+                    
+                    # Update the session state
+                    st.session_state.user_closure_table = user_table
+                    st.session_state.working_file_id = file_id
+                    st.session_state.processed_file_ids = {file_id}
+                    st.success("Používateľský closure_table úspešne nahraný!")
+                    st.rerun()
+    
+    # Report how much memory the compact dtypes saved on the last upload
+    if st.session_state.get('memory_saved', 0) > 0:
+        st.sidebar.caption(f"Kompaktné dátové typy ušetrili {st.session_state.memory_saved / 1024:.1f} kB pamäte.")
+
+def load_uploaded_table(uploaded_file, closure_depth=None, require_complete=False, is_admin=False):
+    """Build a closure table from an uploaded file, showing progress.
+    
+    Closure rows are loaded chunk by chunk; an edge list (parent and child
+    columns) is read whole and its closure rebuilt in one pass.
+    
+    Args:
+        uploaded_file: Uploaded CSV, Parquet or Arrow file
+        closure_depth: Optional maximum depth of the stored paths
+        require_complete: Whether every node must have its own depth 0 row
+        is_admin: Whether the file holds the admin table, whose edge list
+            nodes default to KoKo and not user-defined
+        
+    Returns:
+        ClosureTable: Loaded table, or None if the file is invalid
+    """
+    progress = st.progress(0.0, text="Načítavam súbor...")
+    try:
+        if is_edge_list(uploaded_file):
+            table = ClosureTable.from_edges(
+                read_edge_list(uploaded_file),
+                is_descendant_koko=is_admin,
+                is_user_defined=not is_admin,
+                closure_depth=closure_depth
+            )
+            st.session_state.memory_saved = 0
+        else:
+            reader = ClosureFileReader(uploaded_file, progress=progress.progress)
+            table = ClosureTable.from_chunks(reader, closure_depth=closure_depth, require_complete=require_complete)
+            st.session_state.memory_saved = reader.memory_saved
+    except (ValueError, ImportError) as e:
+        st.error(f"Súbor '{uploaded_file.name}' sa nepodarilo načítať: {e}")
+        return None
+    finally:
+        progress.empty()
+    return table
+
+def handle_database():
+    """Save the admin closure table to a SQLite database or load it back."""
+    with st.sidebar.expander("Databáza", expanded=False):
+        # Only a file name is accepted; databases are kept in the data directory
+        database_name = st.text_input(
+            "Názov databázy", value=os.environ.get("CLOSURE_DB_NAME", "closure_table.db"), key="database_name"
+        )
+        save_column, load_column = st.columns(2)
+        try:
+            database_path = resolve_database_path(database_name)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        
+        if save_column.button("Uložiť"):
+            SQLiteClosureTable.from_closure_table(database_path, st.session_state.admin_closure_table).close()
+            st.success("Admin closure_table uložený do databázy!")
+        
+        if load_column.button("Načítať"):
+            if not os.path.exists(database_path):
+                st.error(f"Databáza '{database_name}' neexistuje.")
+                return
+            database = SQLiteClosureTable(database_path)
+            st.session_state.admin_closure_table = database.to_closure_table()
+            database.close()
+            st.session_state.admin_history = ClosureHistory()
+            
+            # Synchronize user table with the loaded admin table
+            st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(
+                st.session_state.admin_closure_table
+            )
+            st.success("Admin closure_table načítaný z databázy!")
+            st.rerun()
 
 def show_raw_tables():
     """Show raw closure tables if requested."""
@@ -101,6 +193,8 @@ def show_raw_tables():
     if show_table:
         st.subheader("Admin closure table")
         st.dataframe(st.session_state.admin_closure_table.to_dataframe())
+        cache_stats = st.session_state.admin_closure_table.cache_stats
+        st.caption(f"Vyrovnávacia pamäť odvodených pohľadov: {cache_stats['hits']} zásahov, {cache_stats['misses']} prepočtov")
         
         st.subheader("Používateľská closure table")
         st.dataframe(st.session_state.user_closure_table.to_dataframe())
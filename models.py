@@ -1,289 +1,2651 @@
+import bisect
+import contextlib
+import functools
+import itertools
+import numpy as np
 import pandas as pd
 import streamlit as st
 import json
 
+CLOSURE_COLUMNS = ['ancestor', 'descendant', 'depth', 'is_descendant_koko', 'is_user_defined', 'node_type', 'attributes']
+# Columns of the slim closure rows and of the per-node property table
+PATH_COLUMNS = ['ancestor', 'descendant', 'depth']
+NODE_COLUMNS = ['is_descendant_koko', 'is_user_defined', 'node_type', 'attributes']
+
+# Version stamps are drawn from one process-wide counter, so a stamp identifies
+# a table state even across tables and can be used as a cache key on its own
+_versions = itertools.count(1)
+
+# Share of the admin and user nodes above which a change set is applied by a full synchronization
+DELTA_SYNC_SHARE = 0.25
+
+
+def _to_bool(values):
+    """Coerce a column of flags to real booleans.
+    
+    Strings such as 'True'/'False' read from CSV files are parsed, and missing
+    values become False.
+    
+    Args:
+        values: Series of flags
+        
+    Returns:
+        Series: bool Series
+    """
+    if values.dtype == bool:
+        return values
+    if pd.api.types.is_numeric_dtype(values):
+        return values.fillna(0).astype(bool)
+    return values.astype(str).str.strip().str.lower().isin(['true', '1', '1.0'])
+
+
+def normalize_closure_schema(df):
+    """Convert a closure table DataFrame to compact dtypes.
+    
+    Node names become categoricals sharing one set of categories, depth
+    becomes int16, the flag columns become real booleans and node_type becomes
+    categorical. Missing optional columns are added.
+    
+    Args:
+        df: DataFrame with closure table data keyed by node names
+        
+    Returns:
+        tuple: (normalized, saved) where normalized is the converted DataFrame
+               and saved is the number of bytes of memory saved
+    
+    Raises:
+        ValueError: If depth is missing or doesn't fit into int16
+    """
+    before = df.memory_usage(deep=True).sum()
+    df = df.copy()
+    
+    # Shared categories so ancestor and descendant codes refer to the same names
+    names = pd.unique(pd.concat([df['ancestor'], df['descendant']], ignore_index=True).astype(object))
+    for column in ('ancestor', 'descendant'):
+        df[column] = pd.Categorical(df[column].astype(object), categories=names)
+    
+    depth = pd.to_numeric(df['depth'], errors='coerce')
+    if depth.isna().any() or (depth.abs() > np.iinfo(np.int16).max).any():
+        raise ValueError("Stĺpec 'depth' obsahuje chýbajúce alebo príliš veľké hodnoty.")
+    df['depth'] = depth.astype(np.int16)
+    
+    for column in ('is_descendant_koko', 'is_user_defined'):
+        df[column] = _to_bool(df[column]) if column in df.columns else False
+    
+    node_type = df['node_type'] if 'node_type' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    df['node_type'] = node_type.astype('category')
+    
+    df['attributes'] = df['attributes'].fillna('{}') if 'attributes' in df.columns else '{}'
+    
+    df = df[CLOSURE_COLUMNS + [column for column in df.columns if column not in CLOSURE_COLUMNS]]
+    return df, int(before - df.memory_usage(deep=True).sum())
+
+
+def validate_closure_chunk(df, first_row=0):
+    """Check one chunk of closure table rows before it is loaded.
+    
+    Only checks that can be decided within the chunk are made here; whether
+    every node has its own depth 0 row is checked once all chunks are loaded.
+    
+    Args:
+        df: DataFrame with closure table data keyed by node names
+        first_row: Number of rows read before this chunk, for error messages
+        
+    Raises:
+        ValueError: If a required column is missing, a node name is empty,
+            a depth is not a non-negative integer or a depth 0 row links two
+            different nodes
+    """
+    missing = [column for column in PATH_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Chýbajú povinné stĺpce: {', '.join(missing)}")
+    
+    def fail(invalid, message):
+        position = int(np.flatnonzero(invalid)[0])
+        raise ValueError(f"Riadok {first_row + position + 1}: {message}")
+    
+    empty = (df['ancestor'].isna() | df['descendant'].isna()).to_numpy()
+    if empty.any():
+        fail(empty, "chýba názov uzla.")
+    depth = pd.to_numeric(df['depth'], errors='coerce').to_numpy(dtype=float)
+    invalid = np.isnan(depth) | (depth < 0) | (depth != np.floor(depth))
+    if invalid.any():
+        fail(invalid, f"neplatná hĺbka '{df['depth'].iloc[int(np.flatnonzero(invalid)[0])]}'.")
+    not_self = (depth == 0) & (df['ancestor'].astype(object) != df['descendant'].astype(object)).to_numpy()
+    if not_self.any():
+        fail(not_self, "cesta s hĺbkou 0 musí viesť z uzla do seba.")
+
+
+def _segments(starts, counts):
+    """Get the positions covered by consecutive array segments.
+    
+    Args:
+        starts: Start position of each segment
+        counts: Length of each segment
+        
+    Returns:
+        ndarray: Concatenation of range(start, start + count) for each segment
+    """
+    return np.arange(counts.sum()) + np.repeat(starts - np.cumsum(counts) + counts, counts)
+
+
+def _attributes_to_json(attributes):
+    """Convert node attributes to the JSON string stored in the closure table.
+    
+    Args:
+        attributes: Dictionary of attributes, an existing JSON string, or None/NaN
+        
+    Returns:
+        str: JSON string with the attributes
+    """
+    if isinstance(attributes, str):
+        return attributes
+    if not isinstance(attributes, dict) or not attributes:
+        return '{}'
+    return json.dumps(attributes, ensure_ascii=False)
+
+
+def _memoized(method):
+    """Cache the result of a query method until the object's version changes.
+    
+    The object needs ``version``, ``_cache``, ``_cache_version`` and
+    ``cache_stats`` attributes. Cached arrays are made read-only and cached
+    DataFrames are copied on the way out, so callers can't corrupt the cache.
+    """
+    @functools.wraps(method)
+    def wrapper(self):
+        if self._cache_version != self.version:
+            self._cache = {}
+            self._cache_version = self.version
+        name = method.__name__
+        if name in self._cache:
+            self.cache_stats['hits'] += 1
+        else:
+            self.cache_stats['misses'] += 1
+            result = method(self)
+            if isinstance(result, np.ndarray):
+                result.flags.writeable = False
+            self._cache[name] = result
+        result = self._cache[name]
+        return result.copy() if isinstance(result, pd.DataFrame) else result
+    return wrapper
+
+
+class NodeDictionary:
+    """Bidirectional mapping between node names and compact int32 node IDs.
+    
+    IDs are assigned in order of first appearance and are never reused, so a
+    node keeps its ID for the lifetime of the dictionary even if it is deleted
+    from the closure table and added again later.
+    """
+    
+    def __init__(self, names=None):
+        """Initialize a NodeDictionary with optional initial names.
+        
+        Args:
+            names: Optional iterable of node names to intern
+        """
+        self._ids = {}
+        self._names = []
+        # Object array mirroring the first ``_filled`` names, grown with doubling capacity
+        self._lookup = np.empty(0, dtype=object)
+        self._filled = 0
+        if names is not None:
+            self.intern_many(names)
+    
+    def __len__(self):
+        return len(self._names)
+    
+    def __contains__(self, name):
+        return name in self._ids
+    
+    def copy(self):
+        """Create an independent copy of the dictionary.
+        
+        Returns:
+            NodeDictionary: Copy with the same name to ID assignments
+        """
+        copy = NodeDictionary()
+        copy._ids = dict(self._ids)
+        copy._names = list(self._names)
+        return copy
+    
+    def intern(self, name):
+        """Get the ID of a node name, assigning a new one if necessary.
+        
+        Args:
+            name: Node name
+            
+        Returns:
+            int: Node ID
+        """
+        node_id = self._ids.get(name)
+        if node_id is None:
+            node_id = len(self._names)
+            self._ids[name] = node_id
+            self._names.append(name)
+        return node_id
+    
+    def intern_many(self, names):
+        """Get the IDs of many node names, assigning new ones where necessary.
+        
+        Args:
+            names: Iterable of node names
+            
+        Returns:
+            ndarray: int32 array of node IDs
+        """
+        # Intern each distinct name once and broadcast the IDs back
+        names = pd.Series(names)
+        if isinstance(names.dtype, pd.CategoricalDtype):
+            codes, uniques = names.cat.codes.to_numpy(), names.cat.categories
+        else:
+            codes, uniques = pd.factorize(names.astype(object), use_na_sentinel=False)
+        unique_ids = np.fromiter((self.intern(name) for name in uniques), dtype=np.int32, count=len(uniques))
+        return unique_ids[codes]
+    
+    def get_id(self, name):
+        """Get the ID of a node name without interning it.
+        
+        Args:
+            name: Node name
+            
+        Returns:
+            int: Node ID, or None if the name is unknown
+        """
+        return self._ids.get(name)
+    
+    def get_ids(self, names):
+        """Get the IDs of many node names without interning them.
+        
+        Args:
+            names: Iterable of node names
+            
+        Returns:
+            ndarray: int32 array of node IDs, with -1 for unknown names
+        """
+        # Look up each distinct name once, at a cost independent of the dictionary size
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object), use_na_sentinel=False)
+        unique_ids = np.fromiter((self._ids.get(name, -1) for name in uniques), dtype=np.int32, count=len(uniques))
+        return unique_ids[codes]
+    
+    def get_name(self, node_id):
+        """Get the name of a node ID.
+        
+        Args:
+            node_id: Node ID
+            
+        Returns:
+            str: Node name
+        """
+        return self._names[node_id]
+    
+    def names(self, ids):
+        """Translate an array of node IDs back to node names.
+        
+        Args:
+            ids: Array-like of node IDs
+            
+        Returns:
+            ndarray: Object array of node names
+        """
+        # Only names interned since the last call are copied, so a lookup costs O(len(ids))
+        count = len(self._names)
+        if self._filled < count:
+            if len(self._lookup) < count:
+                grown = np.empty(max(2 * len(self._lookup), count), dtype=object)
+                grown[:self._filled] = self._lookup[:self._filled]
+                self._lookup = grown
+            self._lookup[self._filled:count] = self._names[self._filled:]
+            self._filled = count
+        return self._lookup[:count][np.asarray(ids, dtype=np.intp)]
+    
+    def translate(self, other):
+        """Build a lookup array translating IDs of another dictionary into this one.
+        
+        Names unknown to this dictionary are interned.
+        
+        Args:
+            other: Another NodeDictionary
+            
+        Returns:
+            ndarray: int32 array where position i holds this dictionary's ID for other's ID i
+        """
+        if other is self:
+            return np.arange(len(self._names), dtype=np.int32)
+        return self.intern_many(other._names)
+
+
+class NodeTable:
+    """Properties of the nodes of a closure table, stored once per node.
+    
+    Rows are addressed directly by NodeDictionary IDs, so reading or updating
+    a node's properties is O(1) no matter how many closure rows reference it.
+    Capacity doubles as new IDs appear. Flags are stored as booleans and
+    node_type as int16 codes into a dictionary of type names (-1 for none).
+    
+    ``share()`` hands out a view of the columns for a snapshot; a column is
+    copied only when an ID the view can see is overwritten afterwards.
+    """
+    
+    COLUMN_DTYPES = {'is_descendant_koko': bool, 'is_user_defined': bool, 'node_type': np.int16, 'attributes': object}
+    MISSING = {'is_descendant_koko': False, 'is_user_defined': False, 'node_type': -1, 'attributes': None}
+    
+    def __init__(self, capacity=64):
+        """Initialize an empty NodeTable.
+        
+        Args:
+            capacity: Initial number of node IDs to allocate
+        """
+        self.capacity = max(int(capacity), 1)
+        self.columns = {name: self._allocate(name, self.capacity) for name in NODE_COLUMNS}
+        self.node_types = NodeDictionary()
+        # Columns shared with a view, mapped to the number of IDs the view can see
+        self._shared = {}
+    
+    def _allocate(self, name, capacity):
+        """Allocate a column filled with its missing value."""
+        return np.full(capacity, self.MISSING[name], dtype=self.COLUMN_DTYPES[name])
+    
+    def copy(self):
+        """Create an independent copy of the node table.
+        
+        Returns:
+            NodeTable: Copy with the same properties
+        """
+        copy = NodeTable(self.capacity)
+        copy.columns = {name: column.copy() for name, column in self.columns.items()}
+        copy.node_types = self.node_types.copy()
+        return copy
+    
+    def share(self, count):
+        """Get a read-only view of the node table that later writes leave intact.
+        
+        Args:
+            count: Number of node IDs the view needs to see
+            
+        Returns:
+            NodeTable: View sharing the current columns
+        """
+        view = NodeTable.__new__(NodeTable)
+        view.capacity = self.capacity
+        view.columns = dict(self.columns)
+        # Type names are only ever appended, so the dictionary can be shared
+        view.node_types = self.node_types
+        view._shared = {}
+        self._shared = dict.fromkeys(self.columns, count)
+        return view
+    
+    def _type_codes(self, node_types):
+        """Encode node type names as codes, with -1 for missing types."""
+        node_types = pd.Series(node_types, dtype=object)
+        codes = np.full(len(node_types), -1, dtype=np.int16)
+        present = node_types.notna().to_numpy()
+        codes[present] = self.node_types.intern_many(node_types[present])
+        return codes
+    
+    def _type_names(self, codes):
+        """Decode node type codes back to names, with None for missing types."""
+        names = np.full(len(codes), None, dtype=object)
+        present = codes >= 0
+        names[present] = self.node_types.names(codes[present])
+        return names
+    
+    def _grow(self, required):
+        """Double the capacity until IDs below ``required`` fit."""
+        capacity = self.capacity
+        while capacity < required:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+        for name, column in self.columns.items():
+            grown = self._allocate(name, capacity)
+            grown[:self.capacity] = column
+            self.columns[name] = grown
+        self.capacity = capacity
+        self._shared = {}
+    
+    def set(self, ids, values):
+        """Set the properties of nodes.
+        
+        Args:
+            ids: Array of node IDs
+            values: Dictionary mapping property names to arrays aligned with
+                ``ids`` or to scalars; properties that are left out keep their values
+        """
+        ids = np.asarray(ids, dtype=np.intp)
+        if len(ids):
+            self._grow(int(ids.max()) + 1)
+        for name, value in values.items():
+            if name == 'node_type':
+                value = self._type_codes(value) if np.ndim(value) else self._type_codes([value])[0]
+            # Copy a shared column before overwriting IDs a view can see
+            if name in self._shared and (ids < self._shared[name]).any():
+                self.columns[name] = self.columns[name].copy()
+                del self._shared[name]
+            self.columns[name][ids] = value
+    
+    def get(self, node_id):
+        """Get the properties of a single node.
+        
+        Args:
+            node_id: Node ID
+            
+        Returns:
+            dict: Property values of the node
+        """
+        return self.take([node_id]).iloc[0].to_dict()
+    
+    def take(self, ids):
+        """Get the properties of many nodes as a DataFrame.
+        
+        Args:
+            ids: Array of node IDs
+            
+        Returns:
+            DataFrame: One row of properties per ID
+        """
+        ids = np.asarray(ids, dtype=np.intp)
+        self._grow(int(ids.max()) + 1 if len(ids) else 0)
+        return pd.DataFrame({
+            'is_descendant_koko': self.columns['is_descendant_koko'][ids],
+            'is_user_defined': self.columns['is_user_defined'][ids],
+            # Keep missing values as None rather than letting pandas infer NaN strings
+            'node_type': pd.Series(self._type_names(self.columns['node_type'][ids]), dtype=object),
+            'attributes': pd.Series(self.columns['attributes'][ids], dtype=object)
+        })
+
+
+class ClosureBuffer:
+    """Growable columnar storage for closure table rows.
+    
+    Each column is a pre-allocated NumPy array whose capacity doubles when it
+    fills up, so appending rows one node at a time costs amortized O(1) per row
+    instead of copying the whole table. A row's position in the buffer is its
+    stable label; deleted rows are only marked dead until the buffer is compacted.
+    
+    Rows are never rewritten once appended. Each ``kill()`` starts a new
+    generation and stamps the deleted rows with it, so the rows that were live
+    at any earlier (size, generation) pair can still be recovered. Snapshots
+    use this to share the buffer instead of copying it.
+    """
+    
+    COLUMN_DTYPES = {'ancestor': np.int32, 'descendant': np.int32, 'depth': np.int16}
+    ALIVE = np.iinfo(np.int32).max
+    
+    def __init__(self, columns=PATH_COLUMNS, capacity=64):
+        """Initialize an empty ClosureBuffer.
+        
+        Args:
+            columns: Column names
+            capacity: Initial number of rows to allocate
+        """
+        self.size = 0
+        self.dead = 0
+        self.generation = 0
+        self.capacity = max(int(capacity), 1)
+        self.columns = {
+            name: np.empty(self.capacity, dtype=self.COLUMN_DTYPES[name])
+            for name in columns
+        }
+        self.deleted_at = np.full(self.capacity, self.ALIVE, dtype=np.int32)
+    
+    @classmethod
+    def from_frame(cls, df):
+        """Create a ClosureBuffer holding the rows of a DataFrame.
+        
+        Args:
+            df: DataFrame with ancestor, descendant and depth columns
+            
+        Returns:
+            ClosureBuffer: Buffer with one live row per row of the DataFrame
+        """
+        buffer = cls(capacity=max(len(df), 64))
+        buffer.append({name: df[name].to_numpy() for name in PATH_COLUMNS}, len(df))
+        return buffer
+    
+    def __len__(self):
+        return self.size - self.dead
+    
+    def _grow(self, required):
+        """Double the capacity until at least ``required`` rows fit."""
+        capacity = self.capacity
+        while capacity < required:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+        deleted_at = np.full(capacity, self.ALIVE, dtype=np.int32)
+        deleted_at[:self.size] = self.deleted_at[:self.size]
+        self.deleted_at = deleted_at
+        self.capacity = capacity
+    
+    def append(self, values, count):
+        """Append rows to the buffer.
+        
+        Args:
+            values: Dictionary mapping column names to arrays of length ``count``
+                or to scalars
+            count: Number of rows to append
+            
+        Returns:
+            ndarray: Labels of the appended rows
+        """
+        start = self.size
+        self._grow(start + count)
+        for name, column in self.columns.items():
+            column[start:start + count] = values[name]
+        self.size += count
+        return np.arange(start, start + count)
+    
+    def kill(self, labels):
+        """Mark rows as deleted in a new generation.
+        
+        Args:
+            labels: Array of labels of live rows
+        """
+        self.generation += 1
+        self.deleted_at[labels] = self.generation
+        self.dead += len(labels)
+    
+    def live_labels(self, size=None, generation=None):
+        """Get the labels of the live rows in order.
+        
+        Args:
+            size: Optional earlier row count to look back to
+            generation: Optional earlier generation to look back to
+            
+        Returns:
+            ndarray: Labels of the rows that were live at that point, by
+                default the rows live now
+        """
+        size = self.size if size is None else size
+        generation = self.generation if generation is None else generation
+        return np.flatnonzero(self.deleted_at[:size] > generation)
+    
+    def take(self, labels):
+        """Get rows of the buffer as a DataFrame.
+        
+        Args:
+            labels: Array of row labels
+            
+        Returns:
+            DataFrame: The rows, indexed by their labels
+        """
+        return pd.DataFrame(
+            {name: column[labels] for name, column in self.columns.items()},
+            index=labels
+        )
+    
+    def to_frame(self):
+        """Materialize all live rows as a DataFrame indexed by their labels."""
+        return self.take(self.live_labels())
+    
+    def checkpoint(self):
+        """Capture the buffer state so later appends and deletes can be undone.
+        
+        Rows below ``size`` are never rewritten and deletions are stamped with
+        their generation, so the counters are enough to restore the buffer as
+        long as it is not compacted in between.
+        
+        Returns:
+            tuple: Checkpoint to pass to ``rollback()``
+        """
+        return self.size, self.dead, self.generation
+    
+    def rollback(self, checkpoint):
+        """Restore the buffer to a checkpoint.
+        
+        Args:
+            checkpoint: Value returned by ``checkpoint()``
+        """
+        size, dead, generation = checkpoint
+        stamps = self.deleted_at[:self.size]
+        stamps[stamps > generation] = self.ALIVE
+        self.size = size
+        self.dead = dead
+        self.generation = generation
+    
+    def compact(self):
+        """Drop dead rows, relabelling the live rows from zero.
+        
+        Returns:
+            ClosureBuffer: New buffer containing only the live rows
+        """
+        labels = self.live_labels()
+        buffer = ClosureBuffer(list(self.columns), capacity=max(len(labels), 64))
+        buffer.append({name: column[labels] for name, column in self.columns.items()}, len(labels))
+        return buffer
+
+
+class IntervalIndex:
+    """Pre-order interval labels of a forest given by its parent/child edges.
+    
+    A depth-first walk numbers the nodes in pre-order; each node gets the
+    number ``pre`` at which the walk enters it and the number ``end`` of the
+    last node of its subtree. A subtree therefore occupies the contiguous
+    range [pre, end] of ``order``, so ancestor tests are two comparisons and
+    a subtree is a slice. Labels are computed level by level with NumPy.
+    """
+    
+    def __init__(self, parents, children, nodes=None):
+        """Label the forest described by a list of edges.
+        
+        Args:
+            parents: Array of the parent of each edge
+            children: Array of the child of each edge
+            nodes: Optional iterable of all nodes, so nodes without edges
+                are labeled as roots too
+        """
+        parents, children = np.asarray(parents), np.asarray(children)
+        nodes = np.asarray([] if nodes is None else nodes, dtype=parents.dtype)
+        codes, self.labels = pd.factorize(np.concatenate([nodes, parents, children]))
+        self.labels = pd.Index(self.labels)
+        count = len(self.labels)
+        parent_codes = codes[len(nodes):len(nodes) + len(parents)]
+        child_codes = codes[len(nodes) + len(parents):]
+        
+        # A well-formed forest has exactly one parent per child; keep the first otherwise
+        parent = np.full(count, -1, dtype=np.int64)
+        first = np.unique(child_codes, return_index=True)[1]
+        parent[child_codes[first]] = parent_codes[first]
+        self.is_forest = len(first) == len(child_codes)
+        
+        # Walk down level by level, keeping each parent's children in edge order
+        order = np.argsort(parent, kind='stable')
+        sorted_parents = parent[order]
+        levels = [np.flatnonzero(parent < 0)]
+        groups = []
+        placed = np.zeros(count, dtype=bool)
+        placed[levels[0]] = True
+        while len(levels[-1]):
+            level = levels[-1]
+            starts = np.searchsorted(sorted_parents, level, side='left')
+            counts = np.searchsorted(sorted_parents, level, side='right') - starts
+            level_children = order[_segments(starts, counts)]
+            # Nodes on a cycle may be reached again; never label a node twice
+            fresh = ~placed[level_children]
+            if not fresh.all():
+                self.is_forest = False
+                groups_of = np.repeat(np.arange(len(level)), counts)
+                counts = np.bincount(groups_of[fresh], minlength=len(level))
+                level_children = level_children[fresh]
+            placed[level_children] = True
+            groups.append(counts)
+            levels.append(level_children)
+        self.is_forest = self.is_forest and placed.all()
+        
+        # Subtree sizes bottom-up, then pre-order numbers top-down
+        self.size = placed.astype(np.int64)
+        for level in reversed(levels[1:]):
+            np.add.at(self.size, parent[level], self.size[level])
+        self.pre = np.full(count, -1, dtype=np.int64)
+        self.pre[levels[0]] = np.cumsum(self.size[levels[0]]) - self.size[levels[0]]
+        for level, counts, level_children in zip(levels, groups, levels[1:]):
+            before = np.cumsum(self.size[level_children]) - self.size[level_children]
+            group_starts = np.cumsum(counts) - counts
+            offsets = before - np.repeat(before[group_starts[counts > 0]], counts[counts > 0])
+            self.pre[level_children] = np.repeat(self.pre[level], counts) + 1 + offsets
+        self.end = self.pre + self.size - 1
+        self.depth = np.full(count, -1, dtype=np.int64)
+        for depth, level in enumerate(levels):
+            self.depth[level] = depth
+        self.order = np.empty(placed.sum(), dtype=np.int64)
+        self.order[self.pre[placed]] = np.flatnonzero(placed)
+    
+    def _codes(self, nodes):
+        """Get the positions of nodes, with -1 for unknown or unlabeled nodes."""
+        codes = self.labels.get_indexer(np.asarray(nodes))
+        codes[codes >= 0] = np.where(self.pre[codes[codes >= 0]] >= 0, codes[codes >= 0], -1)
+        return codes
+    
+    def is_ancestor(self, ancestor, descendant):
+        """Check whether a node is a proper ancestor of another.
+        
+        Args:
+            ancestor: Possible ancestor
+            descendant: Possible descendant
+            
+        Returns:
+            bool: True if ``ancestor`` lies above ``descendant``
+        """
+        return bool(self.is_ancestor_many([ancestor], [descendant])[0])
+    
+    def is_ancestor_many(self, ancestors, descendants):
+        """Check many (ancestor, descendant) pairs at once.
+        
+        Args:
+            ancestors: Array of possible ancestors
+            descendants: Array of possible descendants, aligned with ``ancestors``
+            
+        Returns:
+            ndarray: Boolean array, True where the ancestor lies above the descendant
+        """
+        first, second = self._codes(ancestors), self._codes(descendants)
+        known = (first >= 0) & (second >= 0)
+        first_pre, second_pre = self.pre[first], self.pre[second]
+        return known & (first_pre < second_pre) & (second_pre <= self.end[first])
+    
+    def subtree(self, node):
+        """Get a node and its descendants in pre-order.
+        
+        Args:
+            node: Root of the subtree
+            
+        Returns:
+            ndarray: Labels of the subtree nodes, empty if the node is unknown
+        """
+        code = self._codes([node])[0]
+        if code < 0:
+            return self.labels[:0].to_numpy()
+        return self.labels[self.order[self.pre[code]:self.end[code] + 1]].to_numpy()
+    
+    def sizes(self, nodes):
+        """Get the number of nodes in the subtrees of many nodes.
+        
+        Args:
+            nodes: Array of subtree roots
+            
+        Returns:
+            ndarray: Subtree sizes including the roots, 0 for unknown nodes
+        """
+        codes = self._codes(nodes)
+        return np.where(codes >= 0, self.size[codes], 0)
+
+
+class ChangeSet:
+    """Names of the nodes affected by closure table mutations.
+    
+    Built from a table's journal, it lists the nodes that were added,
+    deleted, moved (whole subtrees for deletes and moves) or updated, so a
+    dependent table can be synchronized by touching only those nodes.
+    """
+    
+    def __init__(self):
+        """Initialize an empty ChangeSet."""
+        self.added = set()
+        self.deleted = set()
+        self.moved = set()
+        self.updated = set()
+    
+    def __bool__(self):
+        return bool(self.added or self.deleted or self.moved or self.updated)
+    
+    def nodes(self):
+        """Get the names of all affected nodes.
+        
+        Returns:
+            set: Names of added, deleted, moved and updated nodes
+        """
+        return self.added | self.deleted | self.moved | self.updated
+    
+    def update(self, other):
+        """Merge another ChangeSet into this one.
+        
+        Args:
+            other: ChangeSet to merge
+        """
+        self.added |= other.added
+        self.deleted |= other.deleted
+        self.moved |= other.moved
+        self.updated |= other.updated
+
+
+class ClosureSnapshot:
+    """Read-only view of a closure table as it was when the snapshot was taken.
+    
+    A snapshot shares the table's row buffer, node dictionary and node table
+    instead of copying them; the table keeps appending and stamping deletions
+    around it, so a snapshot costs O(1) memory plus whatever the later
+    mutations add.
+    """
+    
+    def __init__(self, table):
+        """Capture the current state of a closure table.
+        
+        Args:
+            table: ClosureTable instance
+        """
+        self.version = table.version
+        self.nodes = table.nodes
+        self.node_table = table.node_table.share(len(table.nodes))
+        self._closure_depth = table.closure_depth
+        self._buffer = table._buffer
+        self._size = table._buffer.size
+        self._generation = table._buffer.generation
+        self._node_count = len(table.nodes)
+        self._table = None
+    
+    def rows(self):
+        """Get the closure paths of the snapshot.
+        
+        Returns:
+            DataFrame: Paths keyed by node IDs, indexed by their labels
+        """
+        return self._buffer.take(self._buffer.live_labels(self._size, self._generation))
+    
+    def table(self):
+        """Materialize the snapshot as a ClosureTable for readers.
+        
+        The table is built on first use and cached; it must not be mutated.
+        
+        Returns:
+            ClosureTable: Table with the snapshot's contents and version
+        """
+        if self._table is None:
+            self._table = ClosureTable._from_encoded(
+                self.rows(), self.nodes.copy(), self.node_table.copy(), self._closure_depth
+            )
+            self._table.version = self.version
+        return self._table
+
+
 class ClosureTable:
-    """Class for managing a closure table representation of a hierarchical structure."""
+    """Class for managing a closure table representation of a hierarchical structure.
+    
+    Node names are interned into a NodeDictionary and the ``ancestor`` and
+    ``descendant`` columns of ``df`` hold int32 node IDs. Public methods take
+    and return node names; ``to_dataframe()`` translates the rows back to names.
+    
+    Node properties live in a NodeTable with one row per node, so ``df`` only
+    holds the slim (ancestor, descendant, depth) paths. ``to_dataframe()``
+    joins the properties of each row's descendant back on for export.
+    
+    Rows live in a ClosureBuffer and every row has a stable integer label.
+    Two hash indexes map node IDs to the labels of the rows where the node is
+    the ancestor or the descendant, so lookups cost O(k) in the number of
+    matching rows. ``df`` is materialized from the buffer only when read.
+    
+    Every mutation bumps ``version`` and appends an entry to ``journal``
+    with the operation, its arguments and the IDs of the affected nodes.
+    ``pop_changes()`` summarizes the journal since the last call for
+    ``synchronize_with``, and derived views can be cached by ``version``.
+    
+    Several mutations can be grouped with ``with table.batch():``; they are
+    rolled back together if any of them raises. ``snapshot()`` captures the
+    current state without copying it and ``restore()`` returns to it.
+    
+    Derived views such as ``get_all_nodes()`` are cached until the version
+    changes; ``cache_stats`` counts cache hits and misses.
+    
+    With ``closure_depth`` set, only paths up to that depth are stored, which
+    keeps the parent links (depth 1) and bounds the table at O(n * closure_depth)
+    rows for deep trees. Longer paths are stitched together from the stored
+    segments on demand, and ``to_dataframe()`` still exports the full closure.
+    """
+    
+    def __init__(self, df=None, closure_depth=None):
+        """Initialize a ClosureTable with optional DataFrame.
+        
+        Args:
+            df: Optional DataFrame with closure table data keyed by node names
+            closure_depth: Optional maximum depth of the stored paths; None
+                stores the full closure
+            
+        Raises:
+            ValueError: If closure_depth is smaller than 1
+        """
+        if closure_depth is not None and closure_depth < 1:
+            raise ValueError("Hĺbka uloženej closure tabuľky musí byť aspoň 1.")
+        self.closure_depth = closure_depth
+        self.nodes = NodeDictionary()
+        self.node_table = NodeTable()
+        self.version = next(_versions)
+        self.journal = []
+        self._popped_version = self.version
+        self._batch_depth = 0
+        self._cache = {}
+        self._cache_version = None
+        self.cache_stats = {'hits': 0, 'misses': 0}
+        if df is not None:
+            df, _ = normalize_closure_schema(df)
+            df['ancestor'] = self.nodes.intern_many(df['ancestor'])
+            df['descendant'] = self.nodes.intern_many(df['descendant'])
+            
+            # Every row repeats its descendant's properties; keep one row per node
+            first_rows = df.drop_duplicates('descendant')
+            self.node_table.set(first_rows['descendant'].to_numpy(), {
+                name: first_rows[name].to_numpy(dtype=object) if name == 'node_type' else first_rows[name].to_numpy()
+                for name in NODE_COLUMNS
+            })
+            if closure_depth is not None:
+                df = df[df['depth'] <= closure_depth]
+            self._buffer = ClosureBuffer.from_frame(df)
+        else:
+            self._buffer = ClosureBuffer()
+        self._build_indexes()
+    
+    @classmethod
+    def from_chunks(cls, chunks, closure_depth=None, require_complete=False):
+        """Build a closure table from closure rows arriving in chunks.
+        
+        Each chunk is interned and appended to the buffer and the indexes as
+        it arrives, so only one chunk of named rows is held at a time. A node's
+        properties come from the first row it is the descendant of.
+        
+        Args:
+            chunks: Iterable of DataFrames as returned by normalize_closure_schema
+            closure_depth: Optional maximum depth of the stored paths; None
+                stores the full closure
+            require_complete: Whether every node, including every ancestor,
+                must have its own depth 0 row
+                
+        Returns:
+            ClosureTable: New closure table
+            
+        Raises:
+            ValueError: If closure_depth is smaller than 1, or a node has no
+                depth 0 row while require_complete is set
+        """
+        table = cls(closure_depth=closure_depth)
+        described = np.zeros(0, dtype=bool)
+        has_self_row = np.zeros(0, dtype=bool)
+        for df in chunks:
+            ancestors = table.nodes.intern_many(df['ancestor'])
+            descendants = table.nodes.intern_many(df['descendant'])
+            grown = len(table.nodes) - len(described)
+            described = np.append(described, np.zeros(grown, dtype=bool))
+            has_self_row = np.append(has_self_row, np.zeros(grown, dtype=bool))
+            
+            # Keep the properties of each node's first row across all chunks
+            first = np.unique(descendants, return_index=True)[1]
+            first = first[~described[descendants[first]]]
+            table.node_table.set(descendants[first], {
+                name: df[name].to_numpy(dtype=object)[first] if name == 'node_type' else df[name].to_numpy()[first]
+                for name in NODE_COLUMNS
+            })
+            described[descendants[first]] = True
+            
+            depths = df['depth'].to_numpy()
+            has_self_row[descendants[depths == 0]] = True
+            kept = slice(None) if closure_depth is None else depths <= closure_depth
+            table._append_rows({
+                'ancestor': ancestors[kept],
+                'descendant': descendants[kept],
+                'depth': depths[kept]
+            }, len(depths[kept]))
+        
+        if require_complete and not has_self_row.all():
+            name = table.nodes.get_name(int(np.flatnonzero(~has_self_row)[0]))
+            raise ValueError(f"Uzol '{name}' nemá vlastný riadok s hĺbkou 0.")
+        return table
+    
+    @classmethod
+    def _from_encoded(cls, df, nodes, node_table, closure_depth=None):
+        """Create a ClosureTable from paths already keyed by node IDs.
+        
+        Args:
+            df: DataFrame with ancestor, descendant and depth columns, holding
+                no paths deeper than closure_depth
+            nodes: NodeDictionary the IDs refer to
+            node_table: NodeTable with the properties of the nodes
+            closure_depth: Optional maximum depth of the stored paths
+            
+        Returns:
+            ClosureTable: New closure table owning the given dictionary and node table
+        """
+        table = cls(closure_depth=closure_depth)
+        table.nodes = nodes
+        table.node_table = node_table
+        table._buffer = ClosureBuffer.from_frame(df)
+        table._build_indexes()
+        return table
+    
+    @property
+    def df(self):
+        """Closure paths keyed by node IDs, materialized from the buffer on demand."""
+        if self._df is None:
+            self._df = self._buffer.to_frame()
+        return self._df
+    
+    def _invalidate(self):
+        """Discard the materialized DataFrame after a mutation."""
+        self._df = None
+    
+    def _decode(self, df):
+        """Translate the node ID columns of a DataFrame back to node names.
+        
+        Args:
+            df: DataFrame with ancestor and/or descendant ID columns
+            
+        Returns:
+            DataFrame: Copy of the DataFrame with node names
+        """
+        df = df.copy()
+        for column in ('ancestor', 'descendant'):
+            if column in df.columns:
+                df[column] = self.nodes.names(df[column].to_numpy())
+        return df
+    
+    def _with_properties(self, df):
+        """Join the properties of each row's descendant onto closure paths.
+        
+        Args:
+            df: DataFrame with a descendant ID column
+            
+        Returns:
+            DataFrame: Copy of the DataFrame with the node property columns added
+        """
+        properties = self.node_table.take(df['descendant'].to_numpy())
+        properties.index = df.index
+        return pd.concat([df, properties], axis=1)
+    
+    @staticmethod
+    def _encode_rows(table, nodes, max_depth=None):
+        """Get the paths of a closure table re-keyed to another node dictionary.
+        
+        Args:
+            table: ClosureTable instance
+            nodes: NodeDictionary to translate the node IDs into
+            max_depth: Optional maximum depth of the paths to return
+            
+        Returns:
+            DataFrame: Copy of the table's paths using the given node IDs
+        """
+        rows = table._paths(max_depth).copy()
+        if table.nodes is not nodes:
+            lookup = nodes.translate(table.nodes)
+            rows['ancestor'] = lookup[rows['ancestor'].to_numpy()]
+            rows['descendant'] = lookup[rows['descendant'].to_numpy()]
+        return rows
+    
+    @staticmethod
+    def _copy_properties(source, target, nodes, ids=None):
+        """Copy node properties from a table into a node table keyed by another dictionary.
+        
+        Args:
+            source: ClosureTable to copy the properties from
+            target: NodeTable to copy the properties into
+            nodes: NodeDictionary the target's IDs refer to
+            ids: Optional array of source node IDs to copy; defaults to all
+                nodes present in the source's closure
+        """
+        if ids is None:
+            ids = np.fromiter(source._by_descendant, dtype=np.int32)
+        lookup = nodes.translate(source.nodes)
+        properties = source.node_table.take(ids)
+        target.set(lookup[ids], {name: properties[name].to_numpy() for name in NODE_COLUMNS})
+    
+    def _build_indexes(self):
+        """Rebuild the ancestor and descendant indexes from the buffer."""
+        self._df = None
+        self._by_ancestor = {}
+        self._by_descendant = {}
+        labels = self._buffer.live_labels()
+        columns = self._buffer.columns
+        self._index_rows(labels, columns['ancestor'][labels], columns['descendant'][labels])
+    
+    def _index_rows(self, labels, ancestors, descendants):
+        """Register rows in the ancestor and descendant indexes.
+        
+        Args:
+            labels: Row labels
+            ancestors: Ancestor ID of each row
+            descendants: Descendant ID of each row
+        """
+        for index, keys in ((self._by_ancestor, ancestors), (self._by_descendant, descendants)):
+            if len(labels) < 1024:
+                for label, key in zip(labels.tolist(), keys.tolist()):
+                    index.setdefault(key, set()).add(label)
+            else:
+                # Group large batches by sorting instead of touching the index row by row
+                order = np.argsort(keys, kind='stable')
+                sorted_keys = keys[order]
+                boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+                groups = np.split(labels[order], boundaries)
+                for key, group in zip(sorted_keys[np.r_[0, boundaries]].tolist(), groups):
+                    index.setdefault(key, set()).update(group.tolist())
+    
+    def _unindex_rows(self, labels):
+        """Remove rows from the ancestor and descendant indexes.
+        
+        Args:
+            labels: Labels of live rows
+        """
+        columns = self._buffer.columns
+        for index, column in ((self._by_ancestor, 'ancestor'), (self._by_descendant, 'descendant')):
+            for label, key in zip(labels.tolist(), columns[column][labels].tolist()):
+                bucket = index[key]
+                bucket.discard(label)
+                if not bucket:
+                    del index[key]
+    
+    @staticmethod
+    def _labels(labels):
+        """Convert an iterable of row labels to a sorted label array."""
+        return np.sort(np.fromiter(labels, dtype=np.int64))
+    
+    def _rows(self, labels):
+        """Get closure rows by label.
+        
+        Args:
+            labels: Iterable of row labels
+            
+        Returns:
+            DataFrame: Matching rows in label order
+        """
+        return self._buffer.take(self._labels(labels))
+    
+    def _rows_with_ancestor(self, node_id):
+        """Get the closure rows where the node is the ancestor (its subtree)."""
+        return self._rows(self._by_ancestor.get(node_id, ()))
+    
+    def _rows_with_descendant(self, node_id):
+        """Get the closure rows where the node is the descendant (its ancestors)."""
+        return self._rows(self._by_descendant.get(node_id, ()))
+    
+    def _stitch(self, index, node_id, max_depth=None):
+        """Follow the stored path segments from a node up or down the tree.
+        
+        With partial storage a node only stores paths up to ``closure_depth``.
+        The nodes at exactly that distance store the next segment, so longer
+        paths are found by repeating the lookup from them.
+        
+        Args:
+            index: ``_by_descendant`` to walk up, ``_by_ancestor`` to walk down
+            node_id: Node ID
+            max_depth: Optional maximum distance from the node
+            
+        Returns:
+            tuple: (node IDs, depths) of the nodes reached, including the node
+                itself at depth 0
+        """
+        ancestors, descendants, depth = self._rows_for(index, np.array([node_id]))
+        reached = ancestors if index is self._by_descendant else descendants
+        parts = [(reached, depth.astype(np.int64))]
+        step, offset = self.closure_depth, 0
+        while step is not None and (max_depth is None or offset + step < max_depth):
+            frontier = reached[depth == step]
+            if not len(frontier):
+                break
+            offset += step
+            ancestors, descendants, depth = self._rows_for(index, frontier)
+            reached = ancestors if index is self._by_descendant else descendants
+            keep = depth > 0
+            reached, depth = reached[keep], depth[keep]
+            parts.append((reached, depth.astype(np.int64) + offset))
+        
+        nodes = np.concatenate([part[0] for part in parts])
+        depths = np.concatenate([part[1] for part in parts])
+        if max_depth is not None:
+            nodes, depths = nodes[depths <= max_depth], depths[depths <= max_depth]
+        return nodes, depths
+    
+    def _ancestor_paths(self, node_id, max_depth=None):
+        """Get the ancestors of a node and their distances, including the node itself."""
+        return self._stitch(self._by_descendant, node_id, max_depth)
+    
+    def _subtree_paths(self, node_id, max_depth=None):
+        """Get the descendants of a node and their distances, including the node itself."""
+        return self._stitch(self._by_ancestor, node_id, max_depth)
+    
+    @_memoized
+    def _full_paths(self):
+        """Get the full closure, stitching the stored segments if storage is partial.
+        
+        Returns:
+            DataFrame: All (ancestor, descendant, depth) paths keyed by node IDs
+        """
+        if self.closure_depth is None:
+            return self.df
+        rows = self.df
+        ancestors, descendants = rows['ancestor'].to_numpy(), rows['descendant'].to_numpy()
+        depths = rows['depth'].to_numpy().astype(np.int64)
+        
+        # Paths of length 1..closure_depth, sorted by their lower end for binary search
+        hops = np.flatnonzero(depths > 0)
+        hops = hops[np.argsort(descendants[hops], kind='stable')]
+        hop_ancestors, hop_descendants, hop_depths = ancestors[hops], descendants[hops], depths[hops]
+        
+        # Extend every path that reaches a segment boundary by the segment above it
+        parts = [(ancestors, descendants, depths)]
+        frontier = depths == self.closure_depth
+        ancestors, descendants, depths = ancestors[frontier], descendants[frontier], depths[frontier]
+        while len(ancestors):
+            starts = np.searchsorted(hop_descendants, ancestors, side='left')
+            counts = np.searchsorted(hop_descendants, ancestors, side='right') - starts
+            extension = _segments(starts, counts)
+            ancestors = hop_ancestors[extension]
+            descendants = np.repeat(descendants, counts)
+            depths = np.repeat(depths, counts) + hop_depths[extension]
+            parts.append((ancestors, descendants, depths))
+            frontier = hop_depths[extension] == self.closure_depth
+            ancestors, descendants, depths = ancestors[frontier], descendants[frontier], depths[frontier]
+        
+        return pd.DataFrame({
+            'ancestor': np.concatenate([part[0] for part in parts]),
+            'descendant': np.concatenate([part[1] for part in parts]),
+            'depth': np.concatenate([part[2] for part in parts]).astype(np.int32)
+        })
+    
+    def _paths(self, max_depth=None):
+        """Get the closure paths up to a depth, stitching stored segments when needed.
+        
+        Args:
+            max_depth: Optional maximum depth; None returns the full closure
+            
+        Returns:
+            DataFrame: Paths keyed by node IDs
+        """
+        if self.closure_depth is None or (max_depth is not None and max_depth <= self.closure_depth):
+            rows = self.df
+        else:
+            rows = self._full_paths()
+        return rows if max_depth is None else rows[rows['depth'] <= max_depth]
+    
+    def _append_rows(self, values, count):
+        """Append rows to the buffer and index them.
+        
+        Args:
+            values: Dictionary mapping column names to arrays or scalars
+            count: Number of rows to append
+        """
+        labels = self._buffer.append(values, count)
+        columns = self._buffer.columns
+        self._index_rows(labels, columns['ancestor'][labels], columns['descendant'][labels])
+        self._invalidate()
+    
+    def _drop_rows(self, labels):
+        """Remove rows from the buffer and the indexes.
+        
+        Args:
+            labels: Iterable of row labels
+        """
+        labels = self._labels(labels)
+        self._unindex_rows(labels)
+        self._buffer.kill(labels)
+        self._invalidate()
+        if not self._batch_depth:
+            self._compact_if_sparse()
+    
+    def _compact_if_sparse(self):
+        """Compact the buffer once most of it is dead so scans stay proportional to live rows."""
+        if self._buffer.dead > max(len(self._buffer), 1024):
+            self._buffer = self._buffer.compact()
+            self._build_indexes()
+    
+    @contextlib.contextmanager
+    def batch(self):
+        """Group several mutations into one transaction.
+        
+        Inside the block the buffer is not compacted, and if any step raises,
+        the rows, nodes, properties and journal are restored to their state
+        before the block and the exception is re-raised. Since the journal
+        covers the whole batch, a single ``pop_changes()`` after the block lets
+        a dependent table be synchronized once. Nested batches join the
+        outermost one.
+        
+        Yields:
+            ClosureTable: This table
+        """
+        if self._batch_depth:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+            return
+        
+        checkpoint = self._buffer.checkpoint()
+        nodes = self.nodes.copy()
+        node_table = self.node_table.copy()
+        journal_length = len(self.journal)
+        version, popped_version = self.version, self._popped_version
+        self._batch_depth = 1
+        try:
+            yield self
+        except BaseException:
+            self._buffer.rollback(checkpoint)
+            self.nodes = nodes
+            self.node_table = node_table
+            del self.journal[journal_length:]
+            self.version, self._popped_version = version, popped_version
+            self._build_indexes()
+            raise
+        finally:
+            self._batch_depth = 0
+        self._compact_if_sparse()
+    
+    @classmethod
+    def create_default_admin_table(cls):
+        """Create a default admin closure table with initial data."""
+        return cls(pd.DataFrame([
+            {'ancestor': 'Zem', 'descendant': 'Zem', 'depth': 0, 'is_descendant_koko': True, 'is_user_defined': False, 'node_type': 'Koncept alebo doménová téma', 'attributes': '{}'},
+            {'ancestor': 'Zem', 'descendant': 'Živé', 'depth': 1, 'is_descendant_koko': True, 'is_user_defined': False, 'node_type': 'Koncept alebo doménová téma', 'attributes': '{}'},
+            {'ancestor': 'Živé', 'descendant': 'Živé', 'depth': 0, 'is_descendant_koko': True, 'is_user_defined': False, 'node_type': 'Koncept alebo doménová téma', 'attributes': '{}'},
+        ]))
+    
+    @classmethod
+    def create_empty_user_table(cls):
+        """Create an empty user closure table."""
+        return cls()
+    
+    @classmethod
+    def from_edges(cls, edges, is_descendant_koko=False, is_user_defined=True, closure_depth=None):
+        """Build a closure table from a parent/child edge list in one pass.
+        
+        The closure is computed level by level: the rows of each level are
+        derived from the rows of the level above with a single merge, so the
+        cost is proportional to the size of the resulting closure table.
+        
+        Args:
+            edges: DataFrame with 'parent' and 'child' columns and optional
+                'node_type', 'attributes', 'is_descendant_koko' and
+                'is_user_defined' columns, or an iterable of
+                (parent, child, node_type, attributes) tuples or of dicts.
+                Root nodes have an empty parent (None or NaN).
+            is_descendant_koko: Default KoKo flag for edges without one
+            is_user_defined: Default user-defined flag for edges without one
+            closure_depth: Optional maximum depth of the stored paths; None
+                stores the full closure
+            
+        Returns:
+            ClosureTable: New closure table
+            
+        Raises:
+            ValueError: If a node has several parents, a parent is missing
+                from the edge list, the edges contain a cycle, or
+                closure_depth is smaller than 1
+        """
+        if closure_depth is not None and closure_depth < 1:
+            raise ValueError("Hĺbka uloženej closure tabuľky musí byť aspoň 1.")
+        if not isinstance(edges, pd.DataFrame):
+            edges = list(edges)
+            if edges and not isinstance(edges[0], dict):
+                edges = [dict(zip(('parent', 'child', 'node_type', 'attributes'), edge)) for edge in edges]
+            edges = pd.DataFrame(edges, columns=None if edges else ['parent', 'child'])
+        edges = edges.reset_index(drop=True)
+        
+        defaults = {
+            'is_descendant_koko': is_descendant_koko,
+            'is_user_defined': is_user_defined,
+            'node_type': None,
+            'attributes': '{}'
+        }
+        for column, default in defaults.items():
+            if column not in edges.columns:
+                edges[column] = default
+        edges['attributes'] = edges['attributes'].map(_attributes_to_json)
+        for column in ('is_descendant_koko', 'is_user_defined'):
+            edges[column] = _to_bool(edges[column])
+        
+        # Each node must appear exactly once as a child
+        duplicated = edges['child'][edges['child'].duplicated()]
+        if not duplicated.empty:
+            raise ValueError(f"Uzol '{duplicated.iloc[0]}' má viac ako jedného rodiča.")
+        
+        is_root = edges['parent'].isna().to_numpy()
+        orphans = edges[~is_root & ~edges['parent'].isin(edges['child'])]
+        if not orphans.empty:
+            orphan = orphans.iloc[0]
+            raise ValueError(f"Rodič '{orphan['parent']}' uzla '{orphan['child']}' neexistuje.")
+        
+        # Node IDs follow the order of the edge list, so ID == edge position
+        nodes = NodeDictionary(edges['child'])
+        child_ids = np.arange(len(edges), dtype=np.int32)
+        parent_ids = np.full(len(edges), -1, dtype=np.int32)
+        parent_ids[~is_root] = nodes.intern_many(edges['parent'][~is_root])
+        
+        # Group children by parent so each level's children are found by binary search
+        order = np.argsort(parent_ids, kind='stable')
+        sorted_parents = parent_ids[order]
+        
+        # Start with the self-references of the roots and descend one level at a time.
+        # A level's rows are generated grouped by descendant, in the order of `level`.
+        level = child_ids[is_root]
+        ancestors, descendants, depths = level, level, np.zeros(len(level), dtype=np.int64)
+        levels = [(ancestors, descendants, depths)]
+        placed = np.zeros(len(edges), dtype=bool)
+        placed[level] = True
+        while len(level):
+            starts = np.searchsorted(sorted_parents, level, side='left')
+            counts = np.searchsorted(sorted_parents, level, side='right') - starts
+            children = order[_segments(starts, counts)].astype(np.int32)
+            
+            # Each child inherits its parent's ancestor rows one level deeper
+            row_starts = np.searchsorted(descendants, level, side='left')
+            row_counts = np.searchsorted(descendants, level, side='right') - row_starts
+            inherited = _segments(np.repeat(row_starts, counts), np.repeat(row_counts, counts))
+            per_child = np.repeat(row_counts, counts) + 1
+            
+            # Lay out each child's inherited rows followed by its self-reference
+            self_rows = np.cumsum(per_child) - 1
+            is_inherited = np.ones(per_child.sum(), dtype=bool)
+            is_inherited[self_rows] = False
+            next_ancestors = np.repeat(children, per_child)
+            next_ancestors[is_inherited] = ancestors[inherited]
+            next_depths = np.zeros(len(next_ancestors), dtype=np.int64)
+            next_depths[is_inherited] = depths[inherited] + 1
+            
+            # Keep the rows sorted by descendant for the next level's binary search
+            ancestors, descendants, depths = next_ancestors, np.repeat(children, per_child), next_depths
+            by_descendant = np.argsort(descendants, kind='stable')
+            ancestors, descendants, depths = ancestors[by_descendant], descendants[by_descendant], depths[by_descendant]
+            if closure_depth is not None:
+                kept = depths <= closure_depth
+                ancestors, descendants, depths = ancestors[kept], descendants[kept], depths[kept]
+            levels.append((ancestors, descendants, depths))
+            placed[children] = True
+            level = np.sort(children)
+        
+        # Nodes that were never reached from a root sit on a cycle
+        if not placed.all():
+            raise ValueError(f"Uzol '{edges['child'][~placed].iloc[0]}' je súčasťou cyklu.")
+        
+        df = pd.DataFrame({
+            'ancestor': np.concatenate([rows[0] for rows in levels]).astype(np.int32),
+            'descendant': np.concatenate([rows[1] for rows in levels]).astype(np.int32),
+            'depth': np.concatenate([rows[2] for rows in levels])
+        })
+        node_table = NodeTable(len(edges))
+        node_table.set(child_ids, {name: edges[name].to_numpy() for name in NODE_COLUMNS})
+        return cls._from_encoded(df, nodes, node_table, closure_depth)
+    
+    def add_node(self, parent, new_node, is_descendant_koko=False, is_user_defined=True, node_type=None, attributes=None):
+        """Add a new node to the closure table.
+        
+        Args:
+            parent: Parent node name
+            new_node: New node name
+            is_descendant_koko: Whether the node is a KoKo descendant
+            is_user_defined: Whether the node is user-defined
+            node_type: Type of the node (Osoba, Miesto, Koncept, Digitálny obsah, Iné)
+            attributes: Dictionary of node attributes
+            
+        Returns:
+            ClosureTable: Updated closure table
+        """
+        # Convert attributes to JSON string if provided
+        attributes_json = '{}'
+        if attributes:
+            try:
+                attributes_json = json.dumps(attributes, ensure_ascii=False)
+            except Exception as e:
+                st.error(f"Error converting attributes to JSON: {e}")
+        
+        parent_id = self.nodes.get_id(parent)
+        new_id = self.nodes.intern(new_node)
+        ancestors = self._labels(self._by_descendant.get(parent_id, ()))
+        columns = self._buffer.columns
+        if self.closure_depth is not None:
+            ancestors = ancestors[columns['depth'][ancestors] < self.closure_depth]
+        
+        self.node_table.set([new_id], {
+            'is_descendant_koko': is_descendant_koko,
+            'is_user_defined': is_user_defined,
+            'node_type': node_type,
+            'attributes': attributes_json
+        })
+        
+        # One path per ancestor of the parent plus the self-reference
+        self._append_rows({
+            'ancestor': np.append(columns['ancestor'][ancestors], new_id),
+            'descendant': new_id,
+            'depth': np.append(columns['depth'][ancestors] + 1, 0)
+        }, len(ancestors) + 1)
+        self._record('add_node', {'parent': parent, 'node': new_node}, [new_id])
+        return self
+    
+    def delete_node(self, node_to_delete):
+        """Delete a node and all its descendants from the closure table.
+        
+        Args:
+            node_to_delete: Node to delete
+            
+        Returns:
+            ClosureTable: Updated closure table
+        """
+        node_id = self.nodes.get_id(node_to_delete)
+        if node_id is None:
+            return self
+        # Every row touching the subtree has one of its nodes as ancestor or descendant
+        index = self._fresh('_interval_index')
+        if index is not None:
+            subtree = np.sort(index.subtree(node_id))
+        else:
+            subtree = np.unique(self._subtree_paths(node_id)[0])
+        doomed = set()
+        for descendant in subtree.tolist():
+            doomed.update(self._by_ancestor.get(descendant, ()))
+            doomed.update(self._by_descendant.get(descendant, ()))
+        self._drop_rows(doomed)
+        self._record('delete_node', {'node': node_to_delete}, subtree)
+        return self
+    
+    def move_node(self, node_to_move, new_parent):
+        """Move a node to a new parent in the closure table.
+        
+        Args:
+            node_to_move: Node to move
+            new_parent: New parent node
+            
+        Returns:
+            ClosureTable: Updated closure table
+            
+        Raises:
+            ValueError: If the move operation is invalid
+        """
+        node_id = self.nodes.get_id(node_to_move)
+        parent_id = self.nodes.get_id(new_parent)
+        
+        # Get the subtree rooted at node_to_move and all ancestors of node_to_move
+        descendants, depths = self._subtree_paths(node_id)
+        subtree = pd.DataFrame({'ancestor': node_id, 'descendant': descendants, 'depth': depths})
+        ancestor_rows = self._rows_with_descendant(node_id)
+        
+        # Check if node is a root node that can't be moved
+        is_root = (subtree['depth'] == 0).sum() == 1
+        has_no_ancestors = not (ancestor_rows['depth'] > 0).any()
+        
+        if is_root and has_no_ancestors:
+            raise ValueError(f"Uzol '{node_to_move}' je root uzol a nemôže byť presunutý.")
+
+        # Check if trying to move a node under its own descendant
+        index = self._fresh('_interval_index')
+        if index is not None:
+            under_itself = parent_id is not None and (parent_id == node_id or index.is_ancestor(node_id, parent_id))
+        else:
+            under_itself = parent_id is not None and (subtree['descendant'] == parent_id).any()
+        if under_itself:
+            raise ValueError(f"Uzol '{node_to_move}' nemôže byť presunutý pod svojho potomka '{new_parent}'!")
+
+        # Remove all paths connecting the ancestors of node_to_move to its subtree.
+        # Paths inside the subtree (including self-references) stay as they are.
+        ancestors = ancestor_rows.loc[ancestor_rows['depth'] > 0, 'ancestor'].unique()
+        doomed = set()
+        for descendant in subtree['descendant'].unique().tolist():
+            doomed.update(self._by_descendant.get(descendant, ()))
+        doomed_rows = self._rows(doomed)
+        self._drop_rows(doomed_rows.index[doomed_rows['ancestor'].isin(ancestors)])
+
+        # Connect each ancestor of new_parent (including itself) to each node in
+        # the subtree with a cross join; the new paths can't duplicate existing rows
+        new_ancestors = self._rows_with_descendant(parent_id)[['ancestor', 'depth']]
+        moved = subtree
+        if self.closure_depth is not None:
+            # Only paths that stay within the stored depth are needed
+            moved = subtree[subtree['depth'] < self.closure_depth]
+        new_paths = new_ancestors.merge(
+            moved.drop(columns='ancestor'), how='cross', suffixes=('_above', '')
+        )
+        new_paths['depth'] = new_paths['depth_above'] + 1 + new_paths['depth']
+        if self.closure_depth is not None:
+            new_paths = new_paths[new_paths['depth'] <= self.closure_depth]
+        self._append_rows({name: new_paths[name].to_numpy() for name in PATH_COLUMNS}, len(new_paths))
+        self._record('move_node', {'node': node_to_move, 'parent': new_parent}, subtree['descendant'].unique())
+        return self
+    
+    @_memoized
+    def get_unique_nodes(self):
+        """Get all unique nodes in the closure table.
+        
+        Returns:
+            DataFrame: DataFrame with unique nodes and their properties
+        """
+        ids = self.df['descendant'].unique()
+        nodes = self.node_table.take(ids)[['is_descendant_koko', 'node_type', 'attributes']]
+        nodes.insert(0, 'descendant', self.nodes.names(ids))
+        return nodes
+    
+    @_memoized
+    def get_direct_edges(self):
+        """Get all direct edges (parent-child relationships) in the closure table.
+        
+        Returns:
+            DataFrame: DataFrame with direct edges
+        """
+        return self._decode(self.df[self.df['depth'] == 1])
+    
+    @_memoized
+    def get_all_nodes(self):
+        """Get all unique node names in the closure table.
+        
+        Returns:
+            array: Array of unique node names
+        """
+        return self.nodes.names(self.df['descendant'].unique())
+    
+    @_memoized
+    def get_user_defined_nodes(self):
+        """Get all user-defined nodes in the closure table.
+        
+        Returns:
+            array: Array of user-defined node names
+        """
+        return self.nodes.names(self._user_defined_ids())
+    
+    @_memoized
+    def _user_defined_ids(self):
+        """Get the IDs of all user-defined nodes in the closure table."""
+        ids = self.df['descendant'].unique()
+        return ids[self.node_table.columns['is_user_defined'][ids]]
+    
+    def get_node(self, node):
+        """Get the properties of a single node.
+        
+        Args:
+            node: Node name
+            
+        Returns:
+            Series: Name and properties of the node, or None if the node doesn't exist
+        """
+        node_id = self.nodes.get_id(node)
+        if node_id not in self._by_descendant:
+            return None
+        return pd.Series({'descendant': node, **self.node_table.get(node_id)})
+    
+    def get_nodes(self, nodes):
+        """Get the properties of many nodes at once.
+        
+        Args:
+            nodes: Iterable of node names
+            
+        Returns:
+            DataFrame: Name and properties of each node that exists, in the given order
+        """
+        names = pd.Series(list(nodes), dtype=object)
+        ids = self.nodes.get_ids(names)
+        held = np.fromiter((node_id in self._by_descendant for node_id in ids.tolist()), dtype=bool, count=len(ids))
+        properties = self.node_table.take(ids[held])
+        properties.insert(0, 'descendant', names[held].to_numpy())
+        return properties
+    
+    @_memoized
+    def _children_index(self):
+        """Map each node ID to the IDs of its children.
+        
+        Returns:
+            dict: Parent ID to an int32 array of child IDs
+        """
+        edges = self.df[self.df['depth'] == 1]
+        parents = edges['ancestor'].to_numpy()
+        order = np.argsort(parents, kind='stable')
+        parents, children = parents[order], edges['descendant'].to_numpy()[order]
+        boundaries = np.flatnonzero(parents[1:] != parents[:-1]) + 1
+        return dict(zip(parents[np.r_[0, boundaries]].tolist(), np.split(children, boundaries))) if len(parents) else {}
+    
+    @_memoized
+    def _interval_index(self):
+        """Label the hierarchy with pre-order intervals.
+        
+        Returns:
+            IntervalIndex: Index over node IDs, or None if the parent links
+                don't form a forest matching the stored paths
+        """
+        ancestors, descendants, depths = self._path_arrays(self._buffer.live_labels())
+        edges = depths == 1
+        index = IntervalIndex(ancestors[edges], descendants[edges], nodes=descendants[depths == 0])
+        if not index.is_forest:
+            return None
+        # A consistent table stores one row per node and stored ancestor
+        stored = index.depth if self.closure_depth is None else np.minimum(index.depth, self.closure_depth)
+        return index if int((stored + 1).sum()) == len(depths) else None
+    
+    def _fresh(self, name):
+        """Get a memoized query result only if it is still valid, without computing it."""
+        if self._cache_version != self.version:
+            return None
+        return self._cache.get(name)
+    
+    def _path_arrays(self, labels):
+        """Get the ancestor, descendant and depth columns of rows as arrays."""
+        labels = self._labels(labels)
+        columns = self._buffer.columns
+        return columns['ancestor'][labels], columns['descendant'][labels], columns['depth'][labels]
+    
+    def ancestors(self, node, max_depth=None):
+        """Get the ancestors of a node, nearest first.
+        
+        Args:
+            node: Node name
+            max_depth: Optional maximum distance from the node
+            
+        Returns:
+            ndarray: Names of the ancestors, not including the node itself
+        """
+        ancestors, depth = self._ancestor_paths(self.nodes.get_id(node), max_depth)
+        keep = depth > 0
+        order = np.argsort(depth[keep], kind='stable')
+        return self.nodes.names(ancestors[keep][order])
+    
+    def subtree(self, node, max_depth=None):
+        """Get the subtree rooted at a node, level by level.
+        
+        With ``max_depth`` the subtree is expanded through the children index
+        one level at a time, so only the requested levels are visited.
+        
+        Args:
+            node: Node name
+            max_depth: Optional maximum distance from the node
+            
+        Returns:
+            ndarray: Names of the node and its descendants, ordered by depth
+        """
+        node_id = self.nodes.get_id(node)
+        if node_id not in self._by_descendant:
+            return self.nodes.names([])
+        if max_depth is None:
+            descendants, depth = self._subtree_paths(node_id)
+            return self.nodes.names(descendants[np.argsort(depth, kind='stable')])
+        
+        children = self._children_index()
+        levels = [np.array([node_id], dtype=np.int32)]
+        for _ in range(max_depth):
+            level = [children[parent] for parent in levels[-1].tolist() if parent in children]
+            if not level:
+                break
+            levels.append(np.concatenate(level))
+        return self.nodes.names(np.concatenate(levels))
+    
+    def children(self, node):
+        """Get the direct children of a node.
+        
+        Args:
+            node: Node name
+            
+        Returns:
+            ndarray: Names of the children
+        """
+        return self.nodes.names(self._children_index().get(self.nodes.get_id(node), []))
+    
+    @_memoized
+    def roots(self):
+        """Get the nodes without a parent.
+        
+        Returns:
+            ndarray: Names of the root nodes, sorted
+        """
+        ids = self.df['descendant'].unique()
+        with_parent = self.df.loc[self.df['depth'] == 1, 'descendant'].to_numpy()
+        return np.sort(self.nodes.names(ids[~np.isin(ids, with_parent)]))
+    
+    def parent(self, node):
+        """Get the direct parent of a node.
+        
+        Args:
+            node: Node name
+            
+        Returns:
+            str: Name of the parent, or None for roots and unknown nodes
+        """
+        parents = self.ancestors(node, max_depth=1)
+        return parents[0] if len(parents) else None
+    
+    def siblings(self, node):
+        """Get the other children of a node's parent.
+        
+        Args:
+            node: Node name
+            
+        Returns:
+            ndarray: Names of the siblings, not including the node itself
+        """
+        parent = self.parent(node)
+        if parent is None:
+            return self.nodes.names([])
+        children = self.children(parent)
+        return children[children != node]
+    
+    def path(self, node):
+        """Get the path from the root of a node's tree down to the node.
+        
+        Args:
+            node: Node name
+            
+        Returns:
+            ndarray: Names of the nodes on the path, root first, or an empty
+                array if the node doesn't exist
+        """
+        if self.nodes.get_id(node) not in self._by_descendant:
+            return self.nodes.names([])
+        return np.append(self.ancestors(node)[::-1], node)
+    
+    def is_ancestor(self, ancestor, descendant):
+        """Check whether a node is a proper ancestor of another.
+        
+        Args:
+            ancestor: Name of the possible ancestor
+            descendant: Name of the possible descendant
+            
+        Returns:
+            bool: True if ``ancestor`` lies above ``descendant``
+        """
+        index = self._fresh('_interval_index')
+        if index is not None:
+            return index.is_ancestor(self.nodes.get_id(ancestor), self.nodes.get_id(descendant))
+        ancestors, depth = self._ancestor_paths(self.nodes.get_id(descendant))
+        return bool(((ancestors == self.nodes.get_id(ancestor)) & (depth > 0)).any())
+    
+    def lowest_common_ancestor(self, first, second):
+        """Get the deepest node that is an ancestor of (or equal to) both nodes.
+        
+        Args:
+            first: Name of the first node
+            second: Name of the second node
+            
+        Returns:
+            str: Name of the lowest common ancestor, or None if the nodes don't
+                share a tree
+        """
+        first_ancestors, _ = self._ancestor_paths(self.nodes.get_id(first))
+        second_ancestors, second_depth = self._ancestor_paths(self.nodes.get_id(second))
+        common = np.isin(second_ancestors, first_ancestors)
+        if not common.any():
+            return None
+        return self.nodes.get_name(int(second_ancestors[common][np.argmin(second_depth[common])]))
+    
+    def _rows_for(self, index, node_ids):
+        """Get the rows of many nodes from one of the indexes as ID arrays."""
+        labels = set()
+        for node_id in node_ids.tolist():
+            labels.update(index.get(node_id, ()))
+        return self._path_arrays(labels)
+    
+    def _paths_for(self, index, node_ids, max_depth=None):
+        """Get the paths of many nodes up or down the tree as ID arrays.
+        
+        Args:
+            index: ``_by_descendant`` to walk up, ``_by_ancestor`` to walk down
+            node_ids: Array of node IDs
+            max_depth: Optional maximum path length
+            
+        Returns:
+            tuple: (ancestors, descendants, depths) arrays
+        """
+        if self.closure_depth is None:
+            ancestors, descendants, depths = self._rows_for(index, node_ids)
+        else:
+            # Partial storage: stitch the segments of each node separately
+            parts = []
+            for node_id in np.unique(node_ids).tolist():
+                reached, depth = self._stitch(index, node_id, max_depth)
+                start = np.full(len(reached), node_id, dtype=np.int32)
+                parts.append((reached, start, depth) if index is self._by_descendant else (start, reached, depth))
+            parts.append((np.empty(0, dtype=np.int32),) * 2 + (np.empty(0, dtype=np.int64),))
+            ancestors, descendants, depths = (np.concatenate(column) for column in zip(*parts))
+        if max_depth is not None:
+            keep = depths <= max_depth
+            ancestors, descendants, depths = ancestors[keep], descendants[keep], depths[keep]
+        return ancestors, descendants, depths
+    
+    def ancestors_many(self, nodes, max_depth=None):
+        """Get the ancestors of many nodes at once.
+        
+        Args:
+            nodes: Iterable of node names
+            max_depth: Optional maximum distance from each node
+            
+        Returns:
+            DataFrame: One (descendant, ancestor, depth) row per node and
+                ancestor, nearest ancestors first
+        """
+        ancestors, descendants, depth = self._paths_for(self._by_descendant, self.nodes.get_ids(nodes), max_depth)
+        keep = depth > 0
+        rows = pd.DataFrame({'descendant': descendants[keep], 'ancestor': ancestors[keep], 'depth': depth[keep]})
+        return self._decode(rows.sort_values(['descendant', 'depth'], kind='stable', ignore_index=True))
+    
+    def subtree_many(self, nodes, max_depth=None):
+        """Get the subtrees rooted at many nodes at once.
+        
+        Args:
+            nodes: Iterable of node names
+            max_depth: Optional maximum distance from each root
+            
+        Returns:
+            DataFrame: One (ancestor, descendant, depth) row per root and
+                subtree node, including each root itself at depth 0
+        """
+        ancestors, descendants, depth = self._paths_for(self._by_ancestor, self.nodes.get_ids(nodes), max_depth)
+        rows = pd.DataFrame({'ancestor': ancestors, 'descendant': descendants, 'depth': depth})
+        return self._decode(rows.sort_values(['ancestor', 'depth'], kind='stable', ignore_index=True))
     
-    def __init__(self, df=None):
-        """Initialize a ClosureTable with optional DataFrame.
+    def children_many(self, nodes):
+        """Get the direct children of many nodes at once.
         
         Args:
-            df: Optional DataFrame with closure table data
+            nodes: Iterable of node names
+            
+        Returns:
+            DataFrame: One (ancestor, descendant) row per parent and child
         """
-        if df is not None:
-            # Add node_type column if it doesn't exist
-            if 'node_type' not in df.columns:
-                df['node_type'] = None
-            # Add attributes column if it doesn't exist
-            if 'attributes' not in df.columns:
-                df['attributes'] = None
-            self.df = df
-        else:
-            self.df = pd.DataFrame(
-                columns=['ancestor', 'descendant', 'depth', 'is_descendant_koko', 'is_user_defined', 'node_type', 'attributes']
-            )
+        children = self._children_index()
+        parents = [node_id for node_id in self.nodes.get_ids(nodes).tolist() if node_id in children]
+        rows = pd.DataFrame({
+            'ancestor': np.repeat(np.array(parents, dtype=np.int32), [len(children[parent]) for parent in parents]),
+            'descendant': np.concatenate([children[parent] for parent in parents] or [np.empty(0, dtype=np.int32)])
+        })
+        return self._decode(rows)
     
-    @classmethod
-    def create_default_admin_table(cls):
-        """Create a default admin closure table with initial data."""
-        return cls(pd.DataFrame([
-            {'ancestor': 'Zem', 'descendant': 'Zem', 'depth': 0, 'is_descendant_koko': True, 'is_user_defined': False, 'node_type': 'Koncept alebo doménová téma', 'attributes': '{}'},
-            {'ancestor': 'Zem', 'descendant': 'Živé', 'depth': 1, 'is_descendant_koko': True, 'is_user_defined': False, 'node_type': 'Koncept alebo doménová téma', 'attributes': '{}'},
-            {'ancestor': 'Živé', 'descendant': 'Živé', 'depth': 0, 'is_descendant_koko': True, 'is_user_defined': False, 'node_type': 'Koncept alebo doménová téma', 'attributes': '{}'},
-        ]))
+    def is_ancestor_many(self, ancestors, descendants):
+        """Check many (ancestor, descendant) pairs at once.
+        
+        Args:
+            ancestors: Iterable of names of possible ancestors
+            descendants: Iterable of names of possible descendants, aligned
+                with ``ancestors``
+            
+        Returns:
+            ndarray: Boolean array, True where the ancestor lies above the descendant
+        """
+        pairs = pd.DataFrame({
+            'ancestor': self.nodes.get_ids(ancestors),
+            'descendant': self.nodes.get_ids(descendants)
+        })
+        index = self._interval_index()
+        if index is not None:
+            return index.is_ancestor_many(pairs['ancestor'].to_numpy(), pairs['descendant'].to_numpy())
+        ancestor_ids, descendant_ids, depth = self._paths_for(self._by_descendant, pairs['descendant'].unique())
+        paths = pd.DataFrame({'ancestor': ancestor_ids, 'descendant': descendant_ids})[depth > 0]
+        found = pairs.merge(paths.drop_duplicates(), how='left', indicator=True)['_merge'] == 'both'
+        return found.to_numpy()
     
-    @classmethod
-    def create_empty_user_table(cls):
-        """Create an empty user closure table."""
-        return cls()
+    def update_node(self, node, **properties):
+        """Update the properties of a node in place.
+        
+        Args:
+            node: Node name
+            **properties: New values for is_descendant_koko, is_user_defined,
+                node_type or attributes (a dictionary or JSON string)
+                
+        Returns:
+            ClosureTable: Updated closure table
+            
+        Raises:
+            ValueError: If the node doesn't exist or a property is unknown
+        """
+        node_id = self.nodes.get_id(node)
+        if node_id not in self._by_descendant:
+            raise ValueError(f"Uzol '{node}' neexistuje.")
+        unknown = set(properties) - set(NODE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Neznáme vlastnosti uzla: {', '.join(sorted(unknown))}")
+        if 'attributes' in properties:
+            properties['attributes'] = _attributes_to_json(properties['attributes'])
+        for flag in ('is_descendant_koko', 'is_user_defined'):
+            if flag in properties:
+                properties[flag] = bool(properties[flag])
+        self.node_table.set([node_id], properties)
+        self._record('update_node', {'node': node, **properties}, [node_id])
+        return self
     
-    def add_node(self, parent, new_node, is_descendant_koko=False, is_user_defined=True, node_type=None, attributes=None):
-        """Add a new node to the closure table.
+    def _record(self, operation, arguments, node_ids):
+        """Bump the version and append an applied operation to the journal.
         
         Args:
-            parent: Parent node name
-            new_node: New node name
-            is_descendant_koko: Whether the node is a KoKo descendant
-            is_user_defined: Whether the node is user-defined
-            node_type: Type of the node (Osoba, Miesto, Koncept, Digitálny obsah, Iné)
-            attributes: Dictionary of node attributes
+            operation: Name of the operation
+            arguments: Dictionary with the operation's arguments
+            node_ids: IDs of the nodes the operation affected
+        """
+        self.version = next(_versions)
+        self.journal.append({
+            'version': self.version,
+            'operation': operation,
+            'arguments': arguments,
+            'nodes': np.asarray(node_ids, dtype=np.int32)
+        })
+    
+    def journal_since(self, version):
+        """Get the journal entries applied after a version.
+        
+        Args:
+            version: Version stamp previously read from this table
             
         Returns:
-            ClosureTable: Updated closure table
+            list: Journal entries newer than the version, oldest first
         """
-        # Convert attributes to JSON string if provided
-        attributes_json = '{}'
-        if attributes:
-            try:
-                attributes_json = json.dumps(attributes, ensure_ascii=False)
-            except Exception as e:
-                st.error(f"Error converting attributes to JSON: {e}")
+        start = bisect.bisect_right(self.journal, version, key=lambda entry: entry['version'])
+        return self.journal[start:]
+    
+    def changes_since(self, version):
+        """Summarize the journal entries applied after a version.
         
-        new_entries = []
-        ancestors = self.df[self.df['descendant'] == parent]
-        
-        for _, ancestor_row in ancestors.iterrows():
-            new_entries.append({
-                'ancestor': ancestor_row['ancestor'],
-                'descendant': new_node,
-                'depth': ancestor_row['depth'] + 1,
-                'is_descendant_koko': is_descendant_koko,
-                'is_user_defined': is_user_defined,
-                'node_type': node_type,
-                'attributes': attributes_json
-            })
+        Args:
+            version: Version stamp previously read from this table
+            
+        Returns:
+            ChangeSet: Names of the nodes affected since the version
+        """
+        changes = ChangeSet()
+        targets = {
+            'add_node': changes.added,
+            'delete_node': changes.deleted,
+            'move_node': changes.moved,
+        }
+        for entry in self.journal_since(version):
+            targets.get(entry['operation'], changes.updated).update(self.nodes.names(entry['nodes']).tolist())
+        return changes
+    
+    def pop_changes(self):
+        """Take the changes applied since the last call.
         
-        new_entries.append({
-            'ancestor': new_node,
-            'descendant': new_node,
-            'depth': 0,
-            'is_descendant_koko': is_descendant_koko,
-            'is_user_defined': is_user_defined,
-            'node_type': node_type,
-            'attributes': attributes_json
-        })
+        Returns:
+            ChangeSet: Nodes added, deleted, moved and updated since the last call
+        """
+        changes = self.changes_since(self._popped_version)
+        self._popped_version = self.version
+        return changes
+    
+    def merge(self, other_table):
+        """Merge this closure table with another closure table.
         
-        self.df = pd.concat([self.df, pd.DataFrame(new_entries)], ignore_index=True)
-        return self
+        Args:
+            other_table: Another ClosureTable instance
+            
+        Returns:
+            ClosureTable: New merged closure table
+        """
+        nodes = self.nodes.copy()
+        node_table = self.node_table.copy()
+        other_df = self._encode_rows(other_table, nodes, self.closure_depth)
+        merged_df = pd.concat([self.df, other_df]).drop_duplicates()
+        
+        # Nodes present in both tables keep this table's properties
+        other_ids = other_table.df['descendant'].unique()
+        new_ids = other_ids[~np.isin(other_df['descendant'].unique(), list(self._by_descendant))]
+        self._copy_properties(other_table, node_table, nodes, new_ids)
+        return ClosureTable._from_encoded(merged_df, nodes, node_table, self.closure_depth)
     
-    def delete_node(self, node_to_delete):
-        """Delete a node and all its descendants from the closure table.
+    def synchronize_with(self, admin_table, changes=None):
+        """Synchronize this user table with changes in the admin table.
+        
+        This method updates the user table to reflect changes in the admin table:
+        - If a node in the admin table is moved, the same node in the user table is moved
+        - If a node in the admin table is deleted, the same node in the user table is deleted
+        - User-defined nodes (is_user_defined=True) are preserved
+        
+        Without a change set a new table is rebuilt from the admin table in one
+        pass. With one, this table is updated in place and returned, and only
+        the affected nodes are visited, so the cost is proportional to the
+        changed subtrees.
         
         Args:
-            node_to_delete: Node to delete
+            admin_table: The admin ClosureTable to synchronize with
+            changes: Optional ChangeSet from admin_table.pop_changes()
             
         Returns:
-            ClosureTable: Updated closure table
+            ClosureTable: Updated user table; this table if a change set was given
+        """
+        if changes is not None:
+            return self._apply_changes(admin_table, changes)
+        
+        nodes = self.nodes.copy()
+        node_table = self.node_table.copy()
+        admin_df = self._encode_rows(admin_table, nodes, self.closure_depth)
+        user_df = self.df
+        
+        # Get all nodes in both tables
+        admin_nodes = admin_df['descendant'].unique()
+        user_nodes = user_df['descendant'].unique()
+        user_defined_nodes = self._user_defined_ids()
+        
+        # Nodes that exist in both tables take all their relationships from the
+        # admin table, except for relationships to user-defined descendants
+        common_nodes = np.setdiff1d(np.intersect1d(admin_nodes, user_nodes), user_defined_nodes)
+        
+        # Admin nodes below a common node are new to this table and come along
+        # with all their paths too; with partial storage the stored paths span
+        # at most closure_depth levels, so follow them until nothing is added
+        admin_paths = admin_df[admin_df['depth'] > 0]
+        while True:
+            below = admin_paths.loc[admin_paths['ancestor'].isin(common_nodes), 'descendant'].unique()
+            tracked = np.setdiff1d(np.union1d(common_nodes, below), user_defined_nodes)
+            if len(tracked) == len(common_nodes):
+                break
+            common_nodes = tracked
+        
+        def involves_common(df):
+            return ((df['ancestor'].isin(common_nodes) | df['descendant'].isin(common_nodes)) &
+                    ~df['descendant'].isin(user_defined_nodes))
+        
+        admin_node_relations = admin_df[involves_common(admin_df)]
+        new_df = pd.concat([user_df[~involves_common(user_df)], admin_node_relations], ignore_index=True)
+        
+        # Nodes inherited from the admin table take its properties, with
+        # the is_user_defined flag preserved as False
+        inherited = admin_node_relations['descendant'].unique()
+        if len(inherited):
+            to_admin = np.empty(len(nodes), dtype=np.int32)
+            to_admin[nodes.translate(admin_table.nodes)] = np.arange(len(admin_table.nodes), dtype=np.int32)
+            self._copy_properties(admin_table, node_table, nodes, to_admin[inherited])
+            node_table.set(inherited, {'is_user_defined': False})
+        
+        # Remove any nodes that exist in the user table but not in the admin table
+        # (they might have been deleted from the admin table), unless they are user-defined
+        removed_nodes = np.setdiff1d(np.setdiff1d(user_nodes, admin_nodes), user_defined_nodes)
+        new_df = new_df[~(new_df['ancestor'].isin(removed_nodes) | new_df['descendant'].isin(removed_nodes))]
+        
+        return ClosureTable._from_encoded(new_df.drop_duplicates(), nodes, node_table, self.closure_depth)
+    
+    def _apply_changes(self, admin_table, changes):
+        """Synchronize the nodes named in a change set with the admin table in place.
+        
+        Each affected node that the user table tracks (it holds an admin copy
+        of the node or of one of its admin ancestors) gets its ancestor paths
+        and properties replaced by the admin table's. Affected nodes that no
+        longer exist in the admin table are removed. User-defined nodes are
+        left untouched. All affected nodes are handled together, so the cost
+        is proportional to their paths; a change set covering a large share
+        of the tables is applied by a full synchronization whose result this
+        table takes over.
+        
+        Args:
+            admin_table: The admin ClosureTable to synchronize with
+            changes: ChangeSet with the nodes affected in the admin table
+            
+        Returns:
+            ClosureTable: This table, updated
         """
-        descendants = self.df[self.df['ancestor'] == node_to_delete]['descendant'].tolist()
-        self.df = self.df[~self.df['descendant'].isin(descendants) & ~self.df['ancestor'].isin(descendants)]
+        names = pd.Series(list(changes.nodes()), dtype=object)
+        if len(names) > DELTA_SYNC_SHARE * (len(admin_table._by_descendant) + len(self._by_descendant)):
+            # Rebuilding beats patching most of the table; take over the result
+            synchronized = self.synchronize_with(admin_table)
+            self.nodes = synchronized.nodes
+            self.node_table = synchronized.node_table
+            self._buffer = synchronized._buffer
+            self._build_indexes()
+            node_ids = self.nodes.get_ids(names)
+            self._record('synchronize', {'changes': changes}, node_ids[node_ids >= 0])
+            return self
+        
+        user_defined = self.node_table.columns['is_user_defined']
+        
+        def is_tracked(node_id):
+            return node_id in self._by_descendant and not user_defined[node_id]
+        
+        # Deleted from the admin table: remove the tracked nodes and all their paths
+        admin_ids = admin_table.nodes.get_ids(names)
+        present = np.fromiter((admin_id in admin_table._by_descendant for admin_id in admin_ids.tolist()), dtype=bool, count=len(names))
+        dropped = set()
+        removed = [node_id for node_id in self.nodes.get_ids(names[~present]).tolist() if is_tracked(node_id)]
+        for node_id in removed:
+            dropped |= self._by_ancestor.get(node_id, set()) | self._by_descendant[node_id]
+        
+        # Admin paths of the remaining nodes, over the distinct nodes they touch
+        admin_ancestors, admin_descendants, depths = admin_table._paths_for(admin_table._by_descendant, admin_ids[present])
+        path_nodes = np.unique(admin_ancestors)
+        user_ids = self.nodes.intern_many(admin_table.nodes.names(path_nodes))
+        row_ancestors = np.searchsorted(path_nodes, admin_ancestors)
+        row_descendants = np.searchsorted(path_nodes, admin_descendants)
+        changed = np.zeros(len(path_nodes), dtype=bool)
+        changed[row_descendants] = True
+        held = np.fromiter((node_id in self._by_descendant for node_id in user_ids.tolist()), dtype=bool, count=len(user_ids))
+        tracked = held.copy()
+        tracked[held] = ~self.node_table.columns['is_user_defined'][user_ids[held]]
+        
+        # Tracked nodes are synchronized; a node new to this table only under a
+        # tracked or synchronized ancestor, which may itself be new, so repeat
+        synchronized = changed & tracked
+        while True:
+            reached = np.bincount(row_descendants, weights=(tracked | synchronized)[row_ancestors], minlength=len(path_nodes)) > 0
+            inherited = synchronized | (changed & ~held & reached)
+            if (inherited == synchronized).all():
+                break
+            synchronized = inherited
+        
+        if not synchronized.any() and not removed:
+            return self
+        for node_id in user_ids[synchronized & held].tolist():
+            dropped.update(self._by_descendant[node_id])
+        kept = synchronized[row_descendants]
+        if self.closure_depth is not None:
+            kept &= depths <= self.closure_depth
+        
+        self._drop_rows(dropped)
+        self._append_rows({
+            'ancestor': user_ids[row_ancestors[kept]],
+            'descendant': user_ids[row_descendants[kept]],
+            'depth': depths[kept]
+        }, int(kept.sum()))
+        properties = admin_table.node_table.take(path_nodes[synchronized])
+        user_ids = user_ids[synchronized]
+        self.node_table.set(user_ids, {
+            **{name: properties[name].to_numpy() for name in NODE_COLUMNS},
+            'is_user_defined': False
+        })
+        
+        synchronized = removed + user_ids.tolist()
+        if synchronized:
+            self._record('synchronize', {'changes': changes}, synchronized)
         return self
     
-    def move_node(self, node_to_move, new_parent):
-        """Move a node to a new parent in the closure table.
+    def to_dataframe(self):
+        """Convert the closure table to a DataFrame.
+        
+        Returns:
+            DataFrame: The closure table as a DataFrame keyed by node names
+        """
+        return self._decode(self._with_properties(self._paths()))
+    
+    def to_edges(self):
+        """Convert the closure table to an edge list with one row per node.
+        
+        Only the parent links and the node properties are kept, which is
+        O(n) rows instead of O(n * depth); ``from_edges`` rebuilds the closure.
+        
+        Returns:
+            DataFrame: parent, child and node property columns; roots have
+                an empty parent
+        """
+        ids = self.df['descendant'].unique()
+        edges = self.df[self.df['depth'] == 1]
+        parents = np.full(len(self.nodes), -1, dtype=np.int64)
+        parents[edges['descendant'].to_numpy()] = edges['ancestor'].to_numpy()
+        parents = parents[ids]
+        
+        parent_names = np.full(len(ids), None, dtype=object)
+        parent_names[parents >= 0] = self.nodes.names(parents[parents >= 0])
+        properties = self.node_table.take(ids)
+        properties.insert(0, 'child', self.nodes.names(ids))
+        properties.insert(0, 'parent', pd.Series(parent_names, dtype=object))
+        return properties
+    
+    def snapshot(self):
+        """Capture the current state of the table.
+        
+        Returns:
+            ClosureSnapshot: Snapshot sharing the table's storage
+            
+        Raises:
+            ValueError: If called inside a batch
+        """
+        # A rolled back batch reuses buffer rows, which a snapshot taken inside it could see
+        if self._batch_depth:
+            raise ValueError("Počas dávkovej úpravy nie je možné vytvoriť snímku.")
+        return ClosureSnapshot(self)
+    
+    def restore(self, snapshot):
+        """Return the table to the state captured by a snapshot.
+        
+        Rows are never rewritten, so when the snapshot shares the table's
+        buffer only the rows appended since the snapshot are killed and the
+        rows killed since it are appended again. The history of a table thus
+        keeps a single buffer that grows with the size of the undone and
+        redone changes. The nodes whose properties may differ are read from
+        the journal entries since the snapshot; a snapshot of older storage,
+        such as one taken before a compaction, has all its rows copied in.
+        The restore is journaled with the affected nodes, so dependent tables
+        can be synchronized incrementally.
         
         Args:
-            node_to_move: Node to move
-            new_parent: New parent node
+            snapshot: ClosureSnapshot taken from this table
             
         Returns:
-            ClosureTable: Updated closure table
+            ClosureTable: This table, restored
             
         Raises:
-            ValueError: If the move operation is invalid
+            ValueError: If called inside a batch
         """
-        # Check if node is a root node that can't be moved
-        is_root = self.df[(self.df['ancestor'] == node_to_move) & (self.df['depth'] == 0)].shape[0] == 1
-        has_no_ancestors = self.df[(self.df['descendant'] == node_to_move) & (self.df['depth'] > 0)].empty
+        if self._batch_depth:
+            raise ValueError("Počas dávkovej úpravy nie je možné obnoviť snímku.")
+        buffer = self._buffer
+        if snapshot._buffer is buffer:
+            stamps = buffer.deleted_at[:buffer.size]
+            added = np.flatnonzero(stamps[snapshot._size:] == buffer.ALIVE) + snapshot._size
+            before = stamps[:snapshot._size]
+            removed = np.flatnonzero((before > snapshot._generation) & (before != buffer.ALIVE))
+            candidates = [entry['nodes'] for entry in self.journal_since(snapshot.version)]
+        else:
+            added = buffer.live_labels()
+            removed = snapshot._buffer.live_labels(snapshot._size, snapshot._generation)
+            candidates = [np.arange(snapshot._node_count)]
+        restored = {name: snapshot._buffer.columns[name][removed] for name in PATH_COLUMNS}
+        moved = np.concatenate([buffer.columns['descendant'][added], restored['descendant']])
         
-        if is_root and has_no_ancestors:
-            raise ValueError(f"Uzol '{node_to_move}' je root uzol a nemôže byť presunutý.")
+        # Only nodes the snapshot knows can have properties to bring back
+        ids = np.unique(np.concatenate([moved, *candidates]).astype(np.int32))
+        ids = ids[ids < snapshot._node_count]
+        current, previous = self.node_table.take(ids), snapshot.node_table.take(ids)
+        differs = ~((current == previous) | (current.isna() & previous.isna())).all(axis=1).to_numpy()
+        if differs.any():
+            self.node_table.set(ids[differs], {name: previous[name].to_numpy()[differs] for name in NODE_COLUMNS})
+        
+        self._drop_rows(added)
+        self._append_rows(restored, len(removed))
+        self._record('restore', {'version': snapshot.version}, np.union1d(moved, ids[differs]))
+        return self
 
-        # Check if trying to move a node under its own descendant
-        descendants_of_node = self.df[self.df['ancestor'] == node_to_move]['descendant'].tolist()
-        if new_parent in descendants_of_node:
-            raise ValueError(f"Uzol '{node_to_move}' nemôže byť presunutý pod svojho potomka '{new_parent}'!")
 
-        # Get the subtree rooted at node_to_move
-        subtree = self.df[self.df['ancestor'] == node_to_move].copy()
-        subtree_descendants = subtree['descendant'].unique().tolist()
-        
-        # Get all ancestors of node_to_move
-        ancestors = self.df[self.df['descendant'] == node_to_move]['ancestor'].unique().tolist()
-
-        # Remove all paths connecting ancestors of node_to_move to descendants of node_to_move
-        # except for self-references (where ancestor == descendant)
-        self.df = self.df[~(
-            self.df['ancestor'].isin(ancestors) &
-            self.df['descendant'].isin(subtree_descendants) &
-            (self.df['ancestor'] != self.df['descendant'])
-        )]
-
-        # Get all ancestors of the new parent
-        new_ancestors = self.df[self.df['descendant'] == new_parent].copy()
-
-        # Create new paths from each ancestor of new_parent to each node in the subtree
-        new_paths = []
-        for _, ancestor_row in new_ancestors.iterrows():
-            for _, sub_row in subtree.iterrows():
-                new_paths.append({
-                    'ancestor': ancestor_row['ancestor'],
-                    'descendant': sub_row['descendant'],
-                    'depth': ancestor_row['depth'] + 1 + sub_row['depth'],
-                    'is_descendant_koko': sub_row.get('is_descendant_koko', False),
-                    'is_user_defined': sub_row.get('is_user_defined', False),
-                    'node_type': sub_row.get('node_type', None),
-                    'attributes': sub_row.get('attributes', '{}')
-                })
-
-        # Add the subtree and the new paths to the DataFrame
-        new_paths_df = pd.DataFrame(new_paths)
-        subtree_df = pd.DataFrame(subtree.to_dict('records'))
-        self.df = pd.concat([self.df, new_paths_df, subtree_df], ignore_index=True)
-        
-        # Remove any duplicates that might have been created
-        self.df = self.df.drop_duplicates()
-        return self
+class ClosureHistory:
+    """Undo and redo stacks of closure table snapshots.
+    
+    Snapshots share storage with the table, so the history grows with the
+    size of the recorded changes rather than with the size of the table.
+    """
+    
+    def __init__(self, limit=50):
+        """Initialize an empty ClosureHistory.
+        
+        Args:
+            limit: Maximum number of undo steps to keep
+        """
+        self.limit = limit
+        self._undo = []
+        self._redo = []
+    
+    @contextlib.contextmanager
+    def track(self, table):
+        """Record the mutations made inside the block as one undo step.
+        
+        Nothing is recorded if the block raises.
+        
+        Args:
+            table: ClosureTable about to be mutated
+            
+        Yields:
+            ClosureTable: The table
+        """
+        snapshot = table.snapshot()
+        yield table
+        self._undo.append(snapshot)
+        del self._undo[:-self.limit]
+        self._redo.clear()
+    
+    def can_undo(self):
+        """Check whether there is a step to undo."""
+        return bool(self._undo)
+    
+    def can_redo(self):
+        """Check whether there is an undone step to redo."""
+        return bool(self._redo)
+    
+    def undo(self, table):
+        """Undo the last recorded step.
+        
+        Args:
+            table: ClosureTable the step was recorded on
+            
+        Returns:
+            ClosureTable: The table, restored to the state before the step
+        """
+        self._redo.append(table.snapshot())
+        return table.restore(self._undo.pop())
+    
+    def redo(self, table):
+        """Redo the last undone step.
+        
+        Args:
+            table: ClosureTable the step was undone on
+            
+        Returns:
+            ClosureTable: The table, restored to the state after the step
+        """
+        self._undo.append(table.snapshot())
+        return table.restore(self._redo.pop())
+
+
+class ClosureOverlay:
+    """Read-only view presenting an admin and a user closure table as one.
+    
+    Read queries are answered like on ``admin_table.merge(user_table)``, but
+    without copying either table: the admin table is consulted as it is and
+    only the user rows it doesn't already hold are collected, at a cost
+    proportional to the user table. Nodes present in both tables show the
+    admin table's properties. Results are cached per pair of table versions.
+    """
+    
+    def __init__(self, admin_table, user_table):
+        """Initialize a ClosureOverlay over two closure tables.
+        
+        Args:
+            admin_table: The admin ClosureTable
+            user_table: The user ClosureTable
+        """
+        self.admin_table = admin_table
+        self.user_table = user_table
+        self._cache = {}
+        self._cache_version = None
+        self.cache_stats = {'hits': 0, 'misses': 0}
+    
+    @property
+    def version(self):
+        """Version stamp of the overlay, changing whenever either table changes."""
+        return self.admin_table.version, self.user_table.version
+    
+    @_memoized
+    def _user_layer(self):
+        """Get the user rows missing from the admin table.
+        
+        Returns:
+            tuple: (rows, admin_ids, user_only) where rows are the user table's
+                paths absent from the admin table keyed by user node IDs,
+                admin_ids maps user node IDs to admin node IDs (-1 for nodes
+                the admin table doesn't hold) and user_only lists the IDs of
+                the nodes only the user table holds, in order of appearance
+        """
+        admin, user = self.admin_table, self.user_table
+        rows = user._paths()
+        
+        admin_ids = admin.nodes.get_ids(user.nodes.names(np.arange(len(user.nodes))))
+        held = np.fromiter(admin._by_descendant, dtype=np.int32)
+        admin_ids[~np.isin(admin_ids, held)] = -1
+        
+        # Compare the user rows against the admin rows of the shared descendants only
+        shared = np.unique(admin_ids[rows['descendant'].to_numpy()])
+        shared = shared[shared >= 0]
+        ancestors, descendants, depths = admin._paths_for(admin._by_descendant, shared)
+        admin_rows = pd.DataFrame({'ancestor': ancestors, 'descendant': descendants, 'depth': depths})
+        keys = pd.DataFrame({
+            'ancestor': admin_ids[rows['ancestor'].to_numpy()],
+            'descendant': admin_ids[rows['descendant'].to_numpy()],
+            'depth': rows['depth'].to_numpy()
+        })
+        present = keys.merge(admin_rows.drop_duplicates(), how='left', indicator=True)['_merge'] == 'both'
+        rows = rows[~present.to_numpy()]
+        
+        descendants = rows['descendant'].unique()
+        user_only = descendants[admin_ids[descendants] < 0]
+        return rows, admin_ids, user_only
     
+    @_memoized
     def get_unique_nodes(self):
-        """Get all unique nodes in the closure table.
+        """Get all unique nodes in both tables.
         
         Returns:
             DataFrame: DataFrame with unique nodes and their properties
         """
-        return self.df[['descendant', 'is_descendant_koko', 'node_type', 'attributes']].drop_duplicates()
+        _, _, user_only = self._user_layer()
+        nodes = self.user_table.node_table.take(user_only)[['is_descendant_koko', 'node_type', 'attributes']]
+        nodes.insert(0, 'descendant', self.user_table.nodes.names(user_only))
+        return pd.concat([self.admin_table.get_unique_nodes(), nodes], ignore_index=True)
     
+    @_memoized
     def get_direct_edges(self):
-        """Get all direct edges (parent-child relationships) in the closure table.
+        """Get all direct edges (parent-child relationships) in both tables.
         
         Returns:
             DataFrame: DataFrame with direct edges
         """
-        return self.df[self.df['depth'] == 1]
+        rows, _, _ = self._user_layer()
+        edges = self.user_table._decode(rows[rows['depth'] == 1])
+        return pd.concat([self.admin_table.get_direct_edges(), edges], ignore_index=True)
     
+    @_memoized
     def get_all_nodes(self):
-        """Get all unique node names in the closure table.
+        """Get all unique node names in both tables.
         
         Returns:
             array: Array of unique node names
         """
-        return self.df['descendant'].unique()
+        _, _, user_only = self._user_layer()
+        return np.concatenate([self.admin_table.get_all_nodes(), self.user_table.nodes.names(user_only)])
     
+    @_memoized
     def get_user_defined_nodes(self):
-        """Get all user-defined nodes in the closure table.
+        """Get all user-defined nodes in both tables.
         
         Returns:
             array: Array of user-defined node names
         """
-        return self.df[self.df['is_user_defined'] == True]['descendant'].unique()
+        _, _, user_only = self._user_layer()
+        user_defined = user_only[self.user_table.node_table.columns['is_user_defined'][user_only]]
+        return np.concatenate([self.admin_table.get_user_defined_nodes(), self.user_table.nodes.names(user_defined)])
     
-    def merge(self, other_table):
-        """Merge this closure table with another closure table.
+    def _user_paths(self, column, node):
+        """Get the decoded user-layer rows where a node is in the given column."""
+        rows, _, _ = self._user_layer()
+        node_id = self.user_table.nodes.get_id(node)
+        return self.user_table._decode(rows[rows[column].to_numpy() == (-1 if node_id is None else node_id)])
+    
+    def ancestors(self, node, max_depth=None):
+        """Get the ancestors of a node in either table, nearest first.
         
         Args:
-            other_table: Another ClosureTable instance
+            node: Node name
+            max_depth: Optional maximum distance from the node
             
         Returns:
-            ClosureTable: New merged closure table
+            ndarray: Names of the ancestors, not including the node itself
         """
-        merged_df = pd.concat([self.df, other_table.df]).drop_duplicates()
-        return ClosureTable(merged_df)
+        rows = self._user_paths('descendant', node)
+        rows = rows[(rows['depth'] > 0) & (rows['depth'] <= (max_depth if max_depth is not None else np.inf))]
+        return pd.unique(np.concatenate([
+            self.admin_table.ancestors(node, max_depth),
+            rows.sort_values('depth', kind='stable')['ancestor'].to_numpy()
+        ]))
     
-    def synchronize_with(self, admin_table):
-        """Synchronize this user table with changes in the admin table.
+    def subtree(self, node, max_depth=None):
+        """Get the subtree rooted at a node across both tables.
         
-        This method updates the user table to reflect changes in the admin table:
-        - If a node in the admin table is moved, the same node in the user table is moved
-        - If a node in the admin table is deleted, the same node in the user table is deleted
-        - User-defined nodes (is_user_defined=True) are preserved
+        Args:
+            node: Node name
+            max_depth: Optional maximum distance from the node
+            
+        Returns:
+            ndarray: Names of the node and its descendants
+        """
+        rows = self._user_paths('ancestor', node)
+        rows = rows[rows['depth'] <= (max_depth if max_depth is not None else np.inf)]
+        return pd.unique(np.concatenate([
+            self.admin_table.subtree(node, max_depth),
+            rows.sort_values('depth', kind='stable')['descendant'].to_numpy()
+        ]))
+    
+    def children(self, node):
+        """Get the direct children of a node across both tables.
         
         Args:
-            admin_table: The admin ClosureTable to synchronize with
+            node: Node name
             
         Returns:
-            ClosureTable: Updated user table
+            ndarray: Names of the children
         """
-        # Get all nodes in both tables
-        admin_nodes = set(admin_table.get_all_nodes())
-        user_nodes = set(self.get_all_nodes())
+        rows = self._user_paths('ancestor', node)
+        return pd.unique(np.concatenate([
+            self.admin_table.children(node),
+            rows.loc[rows['depth'] == 1, 'descendant'].to_numpy()
+        ]))
+    
+    def subtree_many(self, nodes, max_depth=None):
+        """Get the subtrees rooted at many nodes at once across both tables.
+        
+        Args:
+            nodes: Iterable of node names
+            max_depth: Optional maximum distance from each root
+            
+        Returns:
+            DataFrame: One (ancestor, descendant, depth) row per root and
+                subtree node, including each root itself at depth 0
+        """
+        nodes = list(nodes)
+        rows, _, _ = self._user_layer()
+        node_ids = self.user_table.nodes.get_ids(nodes)
+        keep = np.isin(rows['ancestor'].to_numpy(), node_ids)
+        if max_depth is not None:
+            keep &= (rows['depth'] <= max_depth).to_numpy()
+        user_rows = self.user_table._decode(rows.loc[keep, ['ancestor', 'descendant', 'depth']])
+        rows = pd.concat([self.admin_table.subtree_many(nodes, max_depth), user_rows], ignore_index=True)
+        return rows.drop_duplicates(['ancestor', 'descendant'], ignore_index=True)
+    
+    def children_many(self, nodes):
+        """Get the direct children of many nodes at once across both tables.
         
-        # Find nodes that exist in both tables
-        common_nodes = admin_nodes.intersection(user_nodes)
+        Args:
+            nodes: Iterable of node names
+            
+        Returns:
+            DataFrame: One (ancestor, descendant) row per parent and child
+        """
+        nodes = list(nodes)
+        rows, _, _ = self._user_layer()
+        node_ids = self.user_table.nodes.get_ids(nodes)
+        rows = rows[(rows['depth'] == 1).to_numpy() & np.isin(rows['ancestor'].to_numpy(), node_ids)]
+        edges = self.user_table._decode(rows[['ancestor', 'descendant']])
+        return pd.concat([self.admin_table.children_many(nodes), edges], ignore_index=True).drop_duplicates(ignore_index=True)
+    
+    @_memoized
+    def roots(self):
+        """Get the nodes without a parent in either table.
         
-        # Create a new DataFrame for the updated user table
-        new_df = self.df.copy()
+        Returns:
+            ndarray: Names of the root nodes, sorted
+        """
+        rows, _, user_only = self._user_layer()
+        with_parent = set(rows.loc[rows['depth'] == 1, 'descendant'].tolist())
         
-        # Get user-defined nodes
-        user_defined_nodes = set(self.get_user_defined_nodes())
+        # Admin roots stay roots unless the user layer gives them a parent
+        adopted = set(self.user_table.nodes.names(list(with_parent)).tolist())
+        roots = [root for root in self.admin_table.roots().tolist() if root not in adopted]
+        roots += self.user_table.nodes.names([node_id for node_id in user_only.tolist() if node_id not in with_parent]).tolist()
+        return np.sort(np.array(roots, dtype=object))
+    
+    def get_node(self, node):
+        """Get the properties of a single node, preferring the admin table's.
         
-        # For each common node, update its relationships in the user table
-        # based on its relationships in the admin table
-        for node in common_nodes:
-            # Skip user-defined nodes - we want to preserve these
-            if node in user_defined_nodes:
-                continue
-                
-            # Get all ancestors and descendants of the node in the admin table
-            admin_ancestors = admin_table.df[admin_table.df['descendant'] == node]['ancestor'].tolist()
-            admin_descendants = admin_table.df[admin_table.df['ancestor'] == node]['descendant'].tolist()
-            
-            # Remove all relationships involving this node from the user table
-            # but only if it's not a user-defined node
-            new_df = new_df[~(((new_df['ancestor'] == node) | (new_df['descendant'] == node)) & 
-                             ~new_df['descendant'].isin(user_defined_nodes))]
-            
-            # Add the relationships from the admin table to the user table
-            admin_node_relations = admin_table.df[(admin_table.df['ancestor'] == node) | 
-                                                 (admin_table.df['descendant'] == node)].copy()
-            
-            # Preserve the is_user_defined flag as False for admin-inherited nodes
-            admin_node_relations['is_user_defined'] = False
+        Args:
+            node: Node name
             
-            # Filter out any relationships where the descendant is a user-defined node
-            # as we want to preserve the user's relationships for these nodes
-            admin_node_relations = admin_node_relations[~admin_node_relations['descendant'].isin(user_defined_nodes)]
+        Returns:
+            Series: Name and properties of the node, or None if neither table has it
+        """
+        node_info = self.admin_table.get_node(node)
+        if node_info is None:
+            node_info = self.user_table.get_node(node)
+        return node_info
+    
+    def get_nodes(self, nodes):
+        """Get the properties of many nodes at once, preferring the admin table's.
+        
+        Args:
+            nodes: Iterable of node names
             
-            new_df = pd.concat([new_df, admin_node_relations], ignore_index=True)
+        Returns:
+            DataFrame: Name and properties of each node either table has
+        """
+        nodes = list(nodes)
+        admin_nodes = self.admin_table.get_nodes(nodes)
+        held = set(admin_nodes['descendant'].tolist())
+        user_nodes = self.user_table.get_nodes([node for node in nodes if node not in held])
+        return pd.concat([admin_nodes, user_nodes], ignore_index=True)
+    
+    def to_dataframe(self):
+        """Convert both tables to a single DataFrame.
         
-        # Remove any nodes that exist in the user table but not in the admin table
-        # (they might have been deleted from the admin table)
-        user_only_nodes = user_nodes - admin_nodes
-        for node in user_only_nodes:
-            # Skip user-defined nodes - we want to preserve these
-            if node in user_defined_nodes:
-                continue
-                
-            if not self.df[self.df['descendant'] == node]['is_user_defined'].any():
-                # If this is not a user-defined node, remove it
-                new_df = new_df[~((new_df['ancestor'] == node) | (new_df['descendant'] == node))]
+        Returns:
+            DataFrame: The combined closure rows keyed by node names
+        """
+        rows, admin_ids, _ = self._user_layer()
+        properties = self.user_table.node_table.take(rows['descendant'].to_numpy())
         
-        return ClosureTable(new_df.drop_duplicates())
+        # Descendants the admin table holds show its properties
+        in_admin = admin_ids[rows['descendant'].to_numpy()]
+        mask = in_admin >= 0
+        if mask.any():
+            admin_properties = self.admin_table.node_table.take(in_admin[mask])
+            for name in NODE_COLUMNS:
+                values = properties[name].to_numpy(copy=True)
+                values[mask] = admin_properties[name].to_numpy()
+                properties[name] = pd.Series(values, dtype=values.dtype)
+        properties.index = rows.index
+        user_rows = self.user_table._decode(pd.concat([rows, properties], axis=1))
+        return pd.concat([self.admin_table.to_dataframe(), user_rows], ignore_index=True)
     
-    def to_dataframe(self):
-        """Convert the closure table to a DataFrame.
+    def materialize(self):
+        """Merge both tables into a new, mutable closure table.
         
         Returns:
-            DataFrame: The closure table as a DataFrame
+            ClosureTable: Same as ``admin_table.merge(user_table)``
         """
-        return self.df
+        return self.admin_table.merge(self.user_table)
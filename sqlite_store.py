@@ -0,0 +1,754 @@
+import contextlib
+import json
+import os
+import re
+import sqlite3
+import uuid
+import numpy as np
+import pandas as pd
+
+from models import (
+    ChangeSet, ClosureTable, NODE_COLUMNS, _attributes_to_json, _memoized, normalize_closure_schema
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    is_descendant_koko INTEGER NOT NULL DEFAULT 0,
+    is_user_defined INTEGER NOT NULL DEFAULT 1,
+    node_type TEXT,
+    attributes TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS closure (
+    ancestor INTEGER NOT NULL,
+    descendant INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor, descendant)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS journal (
+    version INTEGER NOT NULL,
+    operation TEXT NOT NULL,
+    node TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS journal_version ON journal (version);
+CREATE TABLE IF NOT EXISTS meta (
+    database_id TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+"""
+# Secondary indexes of the closure table, by name
+CLOSURE_INDEXES = {
+    'closure_ancestor_depth': 'closure (ancestor, depth)',
+    'closure_descendant_depth': 'closure (descendant, depth)'
+}
+
+# Databases opened from the app live in this directory, named by file name only
+DATA_DIRECTORY = os.environ.get("CLOSURE_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+DATABASE_NAME = re.compile(r"[\w-][\w.-]*\.db")
+
+
+def resolve_database_path(name, directory=None):
+    """Resolve a database file name inside the data directory.
+    
+    Args:
+        name: File name of the database, without any directory part
+        directory: Optional directory to use instead of ``DATA_DIRECTORY``
+    
+    Returns:
+        str: Path of the database file; the directory is created if missing
+    
+    Raises:
+        ValueError: If the name is not a plain ``.db`` file name
+    """
+    if not DATABASE_NAME.fullmatch(name or ""):
+        raise ValueError(f"Neplatný názov databázy '{name}'. Použite názov súboru s príponou .db bez adresára.")
+    directory = DATA_DIRECTORY if directory is None else directory
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+
+def _json_names(nodes):
+    """Encode node names as a JSON array for ``json_each``."""
+    return json.dumps([str(node) for node in nodes])
+
+
+class SQLiteClosureTable:
+    """Closure table stored in a SQLite database file.
+    
+    Offers the mutations and the read queries of ClosureTable, but the rows
+    stay on disk: nodes and their properties live in a ``nodes`` table and
+    the paths in a ``closure`` table indexed by (ancestor, depth) and
+    (descendant, depth). Mutations are single set-based SQL statements and
+    the queries behind the lazy tree and the level-of-detail graph (roots,
+    children, subtrees and node properties of given nodes) read only the
+    rows they return. In WAL mode several sessions or processes can read the
+    same database while one of them writes.
+    
+    The version is kept in the database, so every connection sees the
+    changes made by the others; the journal is stored alongside it for
+    ``pop_changes()``. Snapshots, undo, merging and synchronization are not
+    offered; they work on in-memory tables, which ``to_closure_table()``
+    loads. The app uses the database to save and load the admin table.
+    """
+    
+    closure_depth = None
+    
+    def __init__(self, path, df=None):
+        """Open or create a closure table database.
+        
+        Args:
+            path: Path of the SQLite database file
+            df: Optional DataFrame with closure table data keyed by node
+                names, replacing the contents of the database
+        """
+        self.database_path = path
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._create_indexes()
+        if self._connection.execute("SELECT COUNT(*) FROM meta").fetchone()[0] == 0:
+            self._connection.execute("INSERT INTO meta VALUES (?, 0)", (uuid.uuid4().hex,))
+        self._database_id = self._connection.execute("SELECT database_id FROM meta").fetchone()[0]
+        self._batch_depth = 0
+        self._cache = {}
+        self._cache_version = None
+        self.cache_stats = {'hits': 0, 'misses': 0}
+        if df is not None:
+            self._load(df)
+        self._popped_version = self._version_number()
+    
+    @classmethod
+    def from_closure_table(cls, path, closure_table):
+        """Store an in-memory closure table in a database file.
+        
+        Args:
+            path: Path of the SQLite database file
+            closure_table: ClosureTable to store
+        
+        Returns:
+            SQLiteClosureTable: Table backed by the database, replacing its contents
+        """
+        return cls(path, closure_table.to_dataframe())
+    
+    def to_closure_table(self):
+        """Load the whole table into memory.
+        
+        Returns:
+            ClosureTable: In-memory copy of the table
+        """
+        return ClosureTable(self.to_dataframe())
+    
+    def close(self):
+        """Close the database connection."""
+        self._connection.close()
+    
+    def _load(self, df):
+        """Replace the contents of the database with a DataFrame's rows."""
+        df, _ = normalize_closure_schema(df)
+        names = pd.unique(pd.concat([df['ancestor'], df['descendant']], ignore_index=True).astype(object))
+        ids = pd.Series(np.arange(1, len(names) + 1), index=names)
+        
+        # Every row repeats its descendant's properties; keep one row per node
+        first_rows = df.drop_duplicates('descendant')
+        properties = pd.DataFrame(
+            {name: first_rows[name].to_numpy(dtype=object) for name in NODE_COLUMNS},
+            index=first_rows['descendant'].astype(object)
+        ).reindex(names)
+        nodes = pd.DataFrame({
+            'id': ids.to_numpy(),
+            'name': names,
+            'is_descendant_koko': properties['is_descendant_koko'].fillna(False).astype(bool).to_numpy(),
+            'is_user_defined': properties['is_user_defined'].fillna(True).astype(bool).to_numpy(),
+            'node_type': pd.Series(properties['node_type'].to_numpy(dtype=object), dtype=object),
+            'attributes': properties['attributes'].fillna('{}').to_numpy(dtype=object)
+        })
+        nodes['node_type'] = nodes['node_type'].where(nodes['node_type'].notna(), None)
+        # Sorted by the primary key, the rows are appended to the B-tree in order
+        paths = pd.DataFrame({
+            'ancestor': ids.index.get_indexer(df['ancestor'].astype(object)) + 1,
+            'descendant': ids.index.get_indexer(df['descendant'].astype(object)) + 1,
+            'depth': df['depth'].astype(np.int64)
+        }).sort_values(['ancestor', 'descendant'])
+        with self.batch():
+            for table in ('closure', 'nodes', 'journal'):
+                self._connection.execute(f"DELETE FROM {table}")
+            # Building the secondary indexes once after the insert is cheaper than maintaining them
+            for index in CLOSURE_INDEXES:
+                self._connection.execute(f"DROP INDEX IF EXISTS {index}")
+            self._connection.executemany(
+                "INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?)", nodes.itertuples(index=False, name=None)
+            )
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO closure VALUES (?, ?, ?)", paths.itertuples(index=False, name=None)
+            )
+            self._create_indexes()
+            self._bump()
+    
+    def _create_indexes(self):
+        """Create the secondary indexes of the closure table if they are missing."""
+        for index, columns in CLOSURE_INDEXES.items():
+            self._connection.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {columns}")
+    
+    @contextlib.contextmanager
+    def batch(self):
+        """Group several mutations into one transaction.
+        
+        If any step raises, the database is rolled back to its state before
+        the block and the exception is re-raised. Nested batches become
+        savepoints inside the outermost transaction.
+        
+        Yields:
+            SQLiteClosureTable: This table
+        """
+        savepoint = f"batch_{self._batch_depth}"
+        self._connection.execute(f"SAVEPOINT {savepoint}")
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._connection.execute(f"ROLLBACK TO {savepoint}")
+            self._connection.execute(f"RELEASE {savepoint}")
+            raise
+        else:
+            self._connection.execute(f"RELEASE {savepoint}")
+        finally:
+            self._batch_depth -= 1
+    
+    def _version_number(self):
+        """Read the mutation counter stored in the database."""
+        return self._connection.execute("SELECT version FROM meta").fetchone()[0]
+    
+    @property
+    def version(self):
+        """Version stamp of the table, unique across databases and in-memory tables."""
+        return ('sqlite', self._database_id, self._version_number())
+    
+    def _bump(self):
+        """Increment the stored version and return the new number."""
+        self._connection.execute("UPDATE meta SET version = version + 1")
+        return self._version_number()
+    
+    def _record(self, operation, node_query, parameters=()):
+        """Bump the version and journal the nodes an operation affects.
+        
+        Args:
+            operation: Name of the operation
+            node_query: SQL query selecting the names of the affected nodes
+            parameters: Parameters of the query
+        """
+        version = self._bump()
+        self._connection.execute(
+            f"INSERT INTO journal SELECT ?, ?, name FROM ({node_query})", (version, operation, *parameters)
+        )
+    
+    def _node_id(self, name):
+        """Get the ID of a node name, or None if it is unknown."""
+        row = self._connection.execute("SELECT id FROM nodes WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+    
+    def _names(self, query, parameters=()):
+        """Run a query selecting node names and return them as an array."""
+        rows = self._connection.execute(query, parameters).fetchall()
+        return np.array([row[0] for row in rows], dtype=object)
+    
+    def add_node(self, parent, new_node, is_descendant_koko=False, is_user_defined=True, node_type=None, attributes=None):
+        """Add a new node to the closure table.
+        
+        Args:
+            parent: Parent node name
+            new_node: New node name
+            is_descendant_koko: Whether the node is a KoKo descendant
+            is_user_defined: Whether the node is user-defined
+            node_type: Type of the node (Osoba, Miesto, Koncept, Digitálny obsah, Iné)
+            attributes: Dictionary of node attributes
+        
+        Returns:
+            SQLiteClosureTable: Updated closure table
+        """
+        with self.batch():
+            new_id = self._connection.execute(
+                """
+                INSERT INTO nodes (name, is_descendant_koko, is_user_defined, node_type, attributes)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    is_descendant_koko = excluded.is_descendant_koko,
+                    is_user_defined = excluded.is_user_defined,
+                    node_type = excluded.node_type,
+                    attributes = excluded.attributes
+                RETURNING id
+                """,
+                (new_node, bool(is_descendant_koko), bool(is_user_defined), node_type, _attributes_to_json(attributes))
+            ).fetchone()[0]
+            
+            # One path per ancestor of the parent plus the self-reference
+            self._connection.execute(
+                """
+                INSERT OR IGNORE INTO closure (ancestor, descendant, depth)
+                SELECT ancestor, ?, depth + 1 FROM closure
+                WHERE descendant = (SELECT id FROM nodes WHERE name = ?)
+                UNION ALL SELECT ?, ?, 0
+                """,
+                (new_id, parent, new_id, new_id)
+            )
+            self._record('add_node', "SELECT ? AS name", (new_node,))
+        return self
+    
+    def delete_node(self, node_to_delete):
+        """Delete a node and all its descendants from the closure table.
+        
+        Args:
+            node_to_delete: Node to delete
+        
+        Returns:
+            SQLiteClosureTable: Updated closure table
+        """
+        node_id = self._node_id(node_to_delete)
+        if node_id is None:
+            return self
+        subtree = "SELECT descendant FROM closure WHERE ancestor = ?"
+        with self.batch():
+            self._record('delete_node', f"SELECT name FROM nodes WHERE id IN ({subtree})", (node_id,))
+            # Every path touching the subtree ends in it
+            self._connection.execute(f"DELETE FROM nodes WHERE id IN ({subtree})", (node_id,))
+            self._connection.execute(f"DELETE FROM closure WHERE descendant IN ({subtree})", (node_id,))
+        return self
+    
+    def move_node(self, node_to_move, new_parent):
+        """Move a node to a new parent in the closure table.
+        
+        Args:
+            node_to_move: Node to move
+            new_parent: New parent node
+        
+        Returns:
+            SQLiteClosureTable: Updated closure table
+        
+        Raises:
+            ValueError: If the move operation is invalid
+        """
+        node_id = self._node_id(node_to_move)
+        parent_id = self._node_id(new_parent)
+        if node_id is None:
+            return self
+        
+        has_ancestors = self._connection.execute(
+            "SELECT 1 FROM closure WHERE descendant = ? AND depth > 0 LIMIT 1", (node_id,)
+        ).fetchone()
+        if not has_ancestors:
+            raise ValueError(f"Uzol '{node_to_move}' je root uzol a nemôže byť presunutý.")
+        
+        under_itself = self._connection.execute(
+            "SELECT 1 FROM closure WHERE ancestor = ? AND descendant = ?", (node_id, parent_id)
+        ).fetchone()
+        if under_itself:
+            raise ValueError(f"Uzol '{node_to_move}' nemôže byť presunutý pod svojho potomka '{new_parent}'!")
+        
+        with self.batch():
+            # Remove all paths connecting the ancestors of node_to_move to its subtree
+            self._connection.execute(
+                """
+                DELETE FROM closure
+                WHERE descendant IN (SELECT descendant FROM closure WHERE ancestor = :node)
+                AND ancestor IN (SELECT ancestor FROM closure WHERE descendant = :node AND depth > 0)
+                """,
+                {'node': node_id}
+            )
+            # Connect each ancestor of new_parent (including itself) to each node in the subtree
+            self._connection.execute(
+                """
+                INSERT OR IGNORE INTO closure (ancestor, descendant, depth)
+                SELECT above.ancestor, below.descendant, above.depth + below.depth + 1
+                FROM closure AS above CROSS JOIN closure AS below
+                WHERE above.descendant = :parent AND below.ancestor = :node
+                """,
+                {'node': node_id, 'parent': parent_id}
+            )
+            self._record(
+                'move_node',
+                "SELECT name FROM nodes WHERE id IN (SELECT descendant FROM closure WHERE ancestor = ?)",
+                (node_id,)
+            )
+        return self
+    
+    def update_node(self, node, **properties):
+        """Update the properties of a node in place.
+        
+        Args:
+            node: Node name
+            **properties: New values for is_descendant_koko, is_user_defined,
+                node_type or attributes (a dictionary or JSON string)
+        
+        Returns:
+            SQLiteClosureTable: Updated closure table
+        
+        Raises:
+            ValueError: If the node doesn't exist or a property is unknown
+        """
+        node_id = self._node_id(node)
+        if node_id is None:
+            raise ValueError(f"Uzol '{node}' neexistuje.")
+        unknown = set(properties) - set(NODE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Neznáme vlastnosti uzla: {', '.join(sorted(unknown))}")
+        if 'attributes' in properties:
+            properties['attributes'] = _attributes_to_json(properties['attributes'])
+        for flag in ('is_descendant_koko', 'is_user_defined'):
+            if flag in properties:
+                properties[flag] = bool(properties[flag])
+        if not properties:
+            return self
+        assignments = ', '.join(f"{name} = :{name}" for name in properties)
+        with self.batch():
+            self._connection.execute(f"UPDATE nodes SET {assignments} WHERE id = :id", {**properties, 'id': node_id})
+            self._record('update_node', "SELECT ? AS name", (node,))
+        return self
+    
+    def _node_frame(self, where="", parameters=()):
+        """Read nodes and their properties into a DataFrame."""
+        nodes = pd.read_sql_query(
+            f"""
+            SELECT name AS descendant, {', '.join(NODE_COLUMNS)} FROM nodes
+            WHERE EXISTS (SELECT 1 FROM closure WHERE descendant = nodes.id) {where}
+            ORDER BY id
+            """,
+            self._connection,
+            params=parameters
+        )
+        for flag in ('is_descendant_koko', 'is_user_defined'):
+            nodes[flag] = nodes[flag].astype(bool)
+        nodes['node_type'] = pd.Series(nodes['node_type'].to_numpy(dtype=object), dtype=object)
+        nodes['node_type'] = nodes['node_type'].where(nodes['node_type'].notna(), None)
+        nodes['descendant'] = nodes['descendant'].astype(object)
+        nodes['attributes'] = nodes['attributes'].astype(object)
+        return nodes
+    
+    @_memoized
+    def get_unique_nodes(self):
+        """Get all unique nodes in the closure table.
+        
+        Returns:
+            DataFrame: DataFrame with unique nodes and their properties
+        """
+        return self._node_frame()[['descendant', 'is_descendant_koko', 'node_type', 'attributes']]
+    
+    @_memoized
+    def get_direct_edges(self):
+        """Get all direct edges (parent-child relationships) in the closure table.
+        
+        Returns:
+            DataFrame: DataFrame with direct edges
+        """
+        edges = pd.read_sql_query(
+            """
+            SELECT above.name AS ancestor, below.name AS descendant, closure.depth
+            FROM closure
+            JOIN nodes AS above ON above.id = closure.ancestor
+            JOIN nodes AS below ON below.id = closure.descendant
+            WHERE closure.depth = 1
+            """,
+            self._connection
+        )
+        edges['depth'] = edges['depth'].astype(np.int16)
+        return edges
+    
+    @_memoized
+    def get_all_nodes(self):
+        """Get all unique node names in the closure table.
+        
+        Returns:
+            array: Array of unique node names
+        """
+        return self._node_frame()['descendant'].to_numpy()
+    
+    @_memoized
+    def get_user_defined_nodes(self):
+        """Get all user-defined nodes in the closure table.
+        
+        Returns:
+            array: Array of user-defined node names
+        """
+        return self._node_frame("AND is_user_defined")['descendant'].to_numpy()
+    
+    def get_node(self, node):
+        """Get the properties of a single node.
+        
+        Args:
+            node: Node name
+        
+        Returns:
+            Series: Name and properties of the node, or None if the node doesn't exist
+        """
+        row = self._connection.execute(
+            f"""
+            SELECT {', '.join(NODE_COLUMNS)} FROM nodes
+            WHERE name = ? AND EXISTS (SELECT 1 FROM closure WHERE descendant = nodes.id)
+            """,
+            (node,)
+        ).fetchone()
+        if row is None:
+            return None
+        properties = dict(zip(NODE_COLUMNS, row))
+        for flag in ('is_descendant_koko', 'is_user_defined'):
+            properties[flag] = bool(properties[flag])
+        return pd.Series({'descendant': node, **properties})
+    
+    def get_nodes(self, nodes):
+        """Get the properties of many nodes at once.
+        
+        Args:
+            nodes: Iterable of node names
+        
+        Returns:
+            DataFrame: Name and properties of each node that exists
+        """
+        return self._node_frame("AND name IN (SELECT value FROM json_each(?))", (_json_names(nodes),))
+    
+    @_memoized
+    def roots(self):
+        """Get the nodes without a parent.
+        
+        Returns:
+            ndarray: Names of the root nodes, sorted
+        """
+        return self._names(
+            """
+            SELECT name FROM nodes
+            WHERE EXISTS (SELECT 1 FROM closure WHERE descendant = nodes.id)
+            AND NOT EXISTS (SELECT 1 FROM closure WHERE descendant = nodes.id AND depth = 1)
+            ORDER BY name
+            """
+        )
+    
+    def ancestors(self, node, max_depth=None):
+        """Get the ancestors of a node, nearest first.
+        
+        Args:
+            node: Node name
+            max_depth: Optional maximum distance from the node
+        
+        Returns:
+            ndarray: Names of the ancestors, not including the node itself
+        """
+        return self._names(
+            """
+            SELECT nodes.name FROM closure JOIN nodes ON nodes.id = closure.ancestor
+            WHERE closure.descendant = (SELECT id FROM nodes WHERE name = ?)
+            AND closure.depth > 0 AND (? IS NULL OR closure.depth <= ?)
+            ORDER BY closure.depth
+            """,
+            (node, max_depth, max_depth)
+        )
+    
+    def subtree(self, node, max_depth=None):
+        """Get the subtree rooted at a node, level by level.
+        
+        Args:
+            node: Node name
+            max_depth: Optional maximum distance from the node
+        
+        Returns:
+            ndarray: Names of the node and its descendants, ordered by depth
+        """
+        return self._names(
+            """
+            SELECT nodes.name FROM closure JOIN nodes ON nodes.id = closure.descendant
+            WHERE closure.ancestor = (SELECT id FROM nodes WHERE name = ?)
+            AND (? IS NULL OR closure.depth <= ?)
+            ORDER BY closure.depth
+            """,
+            (node, max_depth, max_depth)
+        )
+    
+    def children(self, node):
+        """Get the direct children of a node.
+        
+        Args:
+            node: Node name
+        
+        Returns:
+            ndarray: Names of the children
+        """
+        return self._names(
+            """
+            SELECT nodes.name FROM closure JOIN nodes ON nodes.id = closure.descendant
+            WHERE closure.ancestor = (SELECT id FROM nodes WHERE name = ?) AND closure.depth = 1
+            """,
+            (node,)
+        )
+    
+    def children_many(self, nodes):
+        """Get the direct children of many nodes at once.
+        
+        Args:
+            nodes: Iterable of node names
+        
+        Returns:
+            DataFrame: One (ancestor, descendant) row per parent and child
+        """
+        return self._paths_of(nodes, "AND closure.depth = 1")[['ancestor', 'descendant']]
+    
+    def subtree_many(self, nodes, max_depth=None):
+        """Get the subtrees rooted at many nodes at once.
+        
+        Args:
+            nodes: Iterable of node names
+            max_depth: Optional maximum distance from each root
+        
+        Returns:
+            DataFrame: One (ancestor, descendant, depth) row per root and
+                subtree node, including each root itself at depth 0
+        """
+        rows = self._paths_of(nodes, "AND (:max_depth IS NULL OR closure.depth <= :max_depth)", max_depth)
+        return rows.sort_values(['ancestor', 'depth'], kind='stable', ignore_index=True)
+    
+    def _paths_of(self, nodes, where, max_depth=None):
+        """Read the decoded paths starting at the given nodes through the (ancestor, depth) index."""
+        rows = pd.read_sql_query(
+            f"""
+            SELECT above.name AS ancestor, below.name AS descendant, closure.depth
+            FROM nodes AS above
+            JOIN closure ON closure.ancestor = above.id
+            JOIN nodes AS below ON below.id = closure.descendant
+            WHERE above.name IN (SELECT value FROM json_each(:names)) {where}
+            """,
+            self._connection,
+            params={'names': _json_names(nodes), 'max_depth': max_depth}
+        )
+        for column in ('ancestor', 'descendant'):
+            rows[column] = rows[column].astype(object)
+        return rows
+    
+    def parent(self, node):
+        """Get the direct parent of a node.
+        
+        Args:
+            node: Node name
+        
+        Returns:
+            str: Name of the parent, or None for roots and unknown nodes
+        """
+        parents = self.ancestors(node, max_depth=1)
+        return parents[0] if len(parents) else None
+    
+    def siblings(self, node):
+        """Get the other children of a node's parent.
+        
+        Args:
+            node: Node name
+        
+        Returns:
+            ndarray: Names of the siblings, not including the node itself
+        """
+        parent = self.parent(node)
+        if parent is None:
+            return np.array([], dtype=object)
+        children = self.children(parent)
+        return children[children != node]
+    
+    def path(self, node):
+        """Get the path from the root of a node's tree down to the node.
+        
+        Args:
+            node: Node name
+        
+        Returns:
+            ndarray: Names of the nodes on the path, root first, or an empty
+                array if the node doesn't exist
+        """
+        if self.get_node(node) is None:
+            return np.array([], dtype=object)
+        return np.append(self.ancestors(node)[::-1], node)
+    
+    def is_ancestor(self, ancestor, descendant):
+        """Check whether a node is a proper ancestor of another.
+        
+        Args:
+            ancestor: Name of the possible ancestor
+            descendant: Name of the possible descendant
+        
+        Returns:
+            bool: True if ``ancestor`` lies above ``descendant``
+        """
+        row = self._connection.execute(
+            """
+            SELECT 1 FROM closure
+            WHERE ancestor = (SELECT id FROM nodes WHERE name = ?)
+            AND descendant = (SELECT id FROM nodes WHERE name = ?) AND depth > 0
+            """,
+            (ancestor, descendant)
+        ).fetchone()
+        return row is not None
+    
+    def changes_since(self, version):
+        """Summarize the journal entries applied after a version.
+        
+        Args:
+            version: Version stamp previously read from this table
+        
+        Returns:
+            ChangeSet: Names of the nodes affected since the version
+        """
+        changes = ChangeSet()
+        targets = {
+            'add_node': changes.added,
+            'delete_node': changes.deleted,
+            'move_node': changes.moved,
+        }
+        number = version[-1] if isinstance(version, tuple) else version
+        rows = self._connection.execute(
+            "SELECT operation, node FROM journal WHERE version > ? ORDER BY version", (number,)
+        )
+        for operation, node in rows:
+            targets.get(operation, changes.updated).add(node)
+        return changes
+    
+    def pop_changes(self):
+        """Take the changes applied since the last call on this connection.
+        
+        Returns:
+            ChangeSet: Nodes added, deleted, moved and updated since the last call
+        """
+        version = self._version_number()
+        changes = self.changes_since(self._popped_version)
+        self._popped_version = version
+        return changes
+    
+    def to_edges(self):
+        """Convert the closure table to an edge list with one row per node.
+        
+        Returns:
+            DataFrame: parent, child and node property columns; roots have
+                an empty parent
+        """
+        nodes = self._node_frame()
+        edges = self.get_direct_edges()
+        parents = pd.Series(edges['ancestor'].to_numpy(dtype=object), index=edges['descendant'].to_numpy(dtype=object))
+        nodes.insert(0, 'parent', pd.Series(parents.reindex(nodes['descendant']).to_numpy(), dtype=object))
+        nodes['parent'] = nodes['parent'].where(nodes['parent'].notna(), None)
+        return nodes.rename(columns={'descendant': 'child'})
+    
+    def to_dataframe(self):
+        """Convert the closure table to a DataFrame.
+        
+        Returns:
+            DataFrame: The closure table as a DataFrame keyed by node names
+        """
+        df = pd.read_sql_query(
+            f"""
+            SELECT above.name AS ancestor, below.name AS descendant, closure.depth,
+                {', '.join(f'below.{name}' for name in NODE_COLUMNS)}
+            FROM closure
+            JOIN nodes AS above ON above.id = closure.ancestor
+            JOIN nodes AS below ON below.id = closure.descendant
+            """,
+            self._connection
+        )
+        df['depth'] = df['depth'].astype(np.int16)
+        for flag in ('is_descendant_koko', 'is_user_defined'):
+            df[flag] = df[flag].astype(bool)
+        df['node_type'] = pd.Series(df['node_type'].to_numpy(dtype=object), dtype=object)
+        df['node_type'] = df['node_type'].where(df['node_type'].notna(), None)
+        df['attributes'] = df['attributes'].astype(object)
+        return df
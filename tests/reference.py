@@ -0,0 +1,253 @@
+"""Naive reference model of a closure table and helpers shared by the tests.
+
+The reference keeps nothing but parent links and node properties; every
+path is derived by walking up from the descendant, so it is slow but
+obviously correct.
+"""
+
+import json
+
+import pandas as pd
+
+
+class ReferenceTree:
+    """Forest held as parent links, with the closure derived on demand."""
+    
+    def __init__(self):
+        """Initialize an empty ReferenceTree."""
+        self.parents = {}
+        self.properties = {}
+    
+    @classmethod
+    def from_table(cls, table):
+        """Copy the parent links and node properties of a table.
+        
+        Args:
+            table: ClosureTable or ClosureOverlay
+        
+        Returns:
+            ReferenceTree: Reference holding the same forest
+        """
+        tree = cls()
+        for node in table.get_all_nodes():
+            info = table.get_node(node)
+            tree.properties[node] = node_properties(info)
+            parent = table.ancestors(node, max_depth=1)
+            tree.parents[node] = parent[0] if len(parent) else None
+        return tree
+    
+    def add(self, parent, node, is_descendant_koko=False, is_user_defined=True, node_type=None, attributes=None):
+        """Add a node under a parent, mirroring ``ClosureTable.add_node``."""
+        self.parents[node] = parent
+        self.properties[node] = (
+            bool(is_descendant_koko), bool(is_user_defined), node_type,
+            json.dumps(attributes, ensure_ascii=False) if attributes else '{}'
+        )
+    
+    def delete(self, node):
+        """Delete a node and its subtree, mirroring ``ClosureTable.delete_node``."""
+        for descendant in self.subtree(node):
+            del self.parents[descendant]
+            del self.properties[descendant]
+    
+    def move(self, node, parent):
+        """Move a node under a new parent, mirroring ``ClosureTable.move_node``.
+        
+        Raises:
+            ValueError: If the node is a root or the parent lies in its subtree
+        """
+        if self.parents[node] is None:
+            raise ValueError(f"Uzol '{node}' je root uzol a nemôže byť presunutý.")
+        if parent in self.subtree(node):
+            raise ValueError(f"Uzol '{node}' nemôže byť presunutý pod svojho potomka '{parent}'!")
+        self.parents[node] = parent
+    
+    def update(self, node, **properties):
+        """Change node properties, mirroring ``ClosureTable.update_node``."""
+        koko, user, node_type, attributes = self.properties[node]
+        self.properties[node] = (
+            bool(properties.get('is_descendant_koko', koko)),
+            bool(properties.get('is_user_defined', user)),
+            properties.get('node_type', node_type),
+            attributes
+        )
+    
+    def ancestors(self, node):
+        """Get the ancestors of a node, nearest first."""
+        ancestors = []
+        parent = self.parents.get(node)
+        while parent is not None:
+            ancestors.append(parent)
+            parent = self.parents.get(parent)
+        return ancestors
+    
+    def subtree(self, node):
+        """Get the node and all its descendants."""
+        if node not in self.parents:
+            return set()
+        return {other for other in self.parents if other == node or node in self.ancestors(other)}
+    
+    def children(self, node):
+        """Get the direct children of a node."""
+        return {other for other, parent in self.parents.items() if parent == node}
+    
+    def roots(self):
+        """Get the nodes without a parent, sorted."""
+        return sorted(node for node, parent in self.parents.items() if parent is None)
+    
+    def closure(self):
+        """Get every (ancestor, descendant, depth) path of the forest."""
+        return {
+            (ancestor, node, depth)
+            for node in self.parents
+            for depth, ancestor in enumerate([node] + self.ancestors(node))
+        }
+
+
+def node_properties(info):
+    """Normalize the properties of a node for comparison.
+    
+    Args:
+        info: Series or row with the node's properties
+    
+    Returns:
+        tuple: (is_descendant_koko, is_user_defined, node_type, attributes)
+    """
+    node_type = info['node_type']
+    return (
+        bool(info['is_descendant_koko']),
+        bool(info['is_user_defined']),
+        None if pd.isna(node_type) else node_type,
+        info['attributes']
+    )
+
+
+def closure_rows(df):
+    """Normalize closure rows into a set of plain tuples.
+    
+    Args:
+        df: DataFrame in the closure table schema
+    
+    Returns:
+        set: (ancestor, descendant, depth, is_descendant_koko, is_user_defined,
+            node_type, attributes) tuples
+    """
+    return {
+        (row.ancestor, row.descendant, int(row.depth)) + node_properties(row._asdict())
+        for row in df.itertuples(index=False)
+    }
+
+
+def paths(df):
+    """Reduce closure rows to a set of (ancestor, descendant, depth) tuples."""
+    return set(zip(df['ancestor'].tolist(), df['descendant'].tolist(), df['depth'].astype(int).tolist()))
+
+
+def assert_matches_reference(table, tree):
+    """Check a table's paths and node properties against a reference.
+    
+    Args:
+        table: ClosureTable or ClosureOverlay
+        tree: ReferenceTree expected to hold the same forest
+    """
+    df = table.to_dataframe()
+    assert paths(df) == tree.closure()
+    for row in df.drop_duplicates('descendant').itertuples(index=False):
+        assert node_properties(row._asdict()) == tree.properties[row.descendant], row.descendant
+
+
+def assert_indexes_consistent(table):
+    """Check a table's hash indexes against a scan of its rows."""
+    df = table.df
+    for column, index in (('ancestor', table._by_ancestor), ('descendant', table._by_descendant)):
+        expected = {}
+        for label, node_id in zip(df.index.tolist(), df[column].tolist()):
+            expected.setdefault(node_id, set()).add(label)
+        assert {node_id: set(labels) for node_id, labels in index.items()} == expected, column
+
+
+def random_operation(table, rnd, counter, prefix='n', is_descendant_koko=True, is_user_defined=False):
+    """Apply one random add, delete, move or update to a table.
+    
+    Args:
+        table: ClosureTable to mutate
+        rnd: random.Random driving the choice
+        counter: Number used to name an added node
+        prefix: Prefix of added node names
+        is_descendant_koko: KoKo flag of added nodes
+        is_user_defined: User-defined flag of added nodes
+    
+    Returns:
+        tuple: (operation, arguments) as applied, ready to replay on a
+            ReferenceTree or another table; moves that the table rejects are
+            returned with the error as their last argument
+    """
+    nodes = list(table.get_all_nodes())
+    choice = rnd.random()
+    if choice < 0.45 or len(nodes) < 3:
+        # Favour chains so that the trees get deep as well as wide
+        parent = nodes[-1] if rnd.random() < 0.3 else rnd.choice(nodes)
+        arguments = (parent, f"{prefix}{counter}", is_descendant_koko, is_user_defined,
+                     rnd.choice(['X', 'Y', None]), {'n': counter})
+        table.add_node(*arguments)
+        return 'add', arguments
+    roots = set(table.roots())
+    if choice < 0.6:
+        node = rnd.choice([node for node in nodes if node not in roots])
+        table.delete_node(node)
+        return 'delete', (node,)
+    if choice < 0.85:
+        node, parent = rnd.choice(nodes), rnd.choice(nodes)
+        try:
+            table.move_node(node, parent)
+        except ValueError as error:
+            return 'move', (node, parent, error)
+        return 'move', (node, parent, None)
+    node = rnd.choice(nodes)
+    properties = {'node_type': rnd.choice(['X', 'Q']), 'is_descendant_koko': rnd.random() < 0.5}
+    table.update_node(node, **properties)
+    return 'update', (node, properties)
+
+
+def replay(tree, operation, arguments):
+    """Apply an operation returned by ``random_operation`` to a ReferenceTree.
+    
+    Returns:
+        bool: Whether the reference accepted the operation
+    """
+    if operation == 'add':
+        tree.add(*arguments)
+    elif operation == 'delete':
+        tree.delete(*arguments)
+    elif operation == 'move':
+        node, parent, _ = arguments
+        try:
+            tree.move(node, parent)
+        except ValueError:
+            return False
+    else:
+        node, properties = arguments
+        tree.update(node, **properties)
+    return True
+
+
+def replay_on_table(table, operation, arguments):
+    """Apply an operation returned by ``random_operation`` to another table.
+    
+    Returns:
+        bool: Whether the table accepted the operation
+    """
+    if operation == 'add':
+        table.add_node(*arguments)
+    elif operation == 'delete':
+        table.delete_node(*arguments)
+    elif operation == 'move':
+        node, parent, _ = arguments
+        try:
+            table.move_node(node, parent)
+        except ValueError:
+            return False
+    else:
+        node, properties = arguments
+        table.update_node(node, **properties)
+    return True
@@ -0,0 +1,98 @@
+"""ClosureTable mutations and queries compared against the naive reference."""
+
+import random
+
+import pandas as pd
+import pytest
+
+from models import ClosureTable
+from reference import (
+    ReferenceTree, assert_indexes_consistent, assert_matches_reference, closure_rows, random_operation, replay
+)
+
+
+def assert_queries_match(table, tree, rnd):
+    """Check the single-node and batched queries against the reference."""
+    nodes = list(tree.parents)
+    for node in nodes + ['missing']:
+        assert list(table.ancestors(node)) == tree.ancestors(node), node
+        assert list(table.ancestors(node, max_depth=1)) == tree.ancestors(node)[:1], node
+        assert set(table.subtree(node)) == tree.subtree(node), node
+        assert len(table.subtree(node)) == len(tree.subtree(node)), node
+        assert set(table.children(node)) == tree.children(node), node
+        other = rnd.choice(nodes)
+        assert table.is_ancestor(other, node) == (other in tree.ancestors(node)), (other, node)
+    assert list(table.roots()) == tree.roots()
+    
+    sample = rnd.sample(nodes, min(6, len(nodes)))
+    subtrees = table.subtree_many(sample)
+    assert set(zip(subtrees['ancestor'], subtrees['descendant'])) == {
+        (node, descendant) for node in sample for descendant in tree.subtree(node)
+    }
+    children = table.children_many(sample + ['missing'])
+    assert set(zip(children['ancestor'], children['descendant'])) == {
+        (node, child) for node in sample for child in tree.children(node)
+    }
+    assert list(table.is_ancestor_many(sample, sample[::-1])) == [
+        ancestor in tree.ancestors(descendant) for ancestor, descendant in zip(sample, sample[::-1])
+    ]
+    found = table.get_nodes(sample + ['missing'])
+    assert found['descendant'].tolist() == sample
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_random_operations_match_reference(seed):
+    rnd = random.Random(seed)
+    table = ClosureTable.create_default_admin_table()
+    tree = ReferenceTree.from_table(table)
+    for counter in range(80):
+        operation, arguments = random_operation(table, rnd, counter)
+        accepted = replay(tree, operation, arguments)
+        if operation == 'move':
+            assert accepted == (arguments[-1] is None), arguments
+        assert_matches_reference(table, tree)
+        assert_indexes_consistent(table)
+        if counter % 10 == 9:
+            assert_queries_match(table, tree, rnd)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_from_edges_matches_reference(seed):
+    rnd = random.Random(seed)
+    tree = ReferenceTree()
+    tree.add(None, 'root', False, True)
+    for counter in range(60):
+        tree.add(rnd.choice(list(tree.parents)), f"n{counter}", False, True)
+    edges = pd.DataFrame(
+        [(parent, node) for node, parent in tree.parents.items()],
+        columns=['parent', 'child']
+    )
+    
+    table = ClosureTable.from_edges(edges)
+    assert_matches_reference(table, tree)
+    assert_indexes_consistent(table)
+    assert_queries_match(table, tree, rnd)
+
+
+def test_batch_rolls_back_all_steps():
+    rnd = random.Random(0)
+    table = ClosureTable.create_default_admin_table()
+    for counter in range(30):
+        random_operation(table, rnd, counter)
+    before = closure_rows(table.to_dataframe())
+    version, journal_length = table.version, len(table.journal)
+    
+    with pytest.raises(ValueError):
+        with table.batch():
+            for counter in range(30, 50):
+                random_operation(table, rnd, counter)
+            table.move_node('Zem', 'Živé')
+    
+    assert closure_rows(table.to_dataframe()) == before
+    assert (table.version, len(table.journal)) == (version, journal_length)
+    assert_indexes_consistent(table)
+    # The table keeps working after the rollback
+    tree = ReferenceTree.from_table(table)
+    for counter in range(50, 70):
+        replay(tree, *random_operation(table, rnd, counter))
+        assert_matches_reference(table, tree)
@@ -0,0 +1,59 @@
+"""Incremental completion scores compared against scores computed from scratch."""
+
+import random
+
+import pytest
+
+from models import ClosureOverlay, ClosureTable
+from reference import ReferenceTree, random_operation
+from utils import CompletionScore, compute_completion_score
+
+
+def reference_score(tree, root=None):
+    """Score a ReferenceTree, or one of its subtrees, node by node."""
+    nodes = tree.parents if root is None else tree.subtree(root)
+    is_koko = {node: properties[0] for node, properties in tree.properties.items()}
+    end_nodes = [
+        node for node in nodes
+        if is_koko[node] and not any(is_koko[child] for child in tree.children(node))
+    ]
+    return len(end_nodes), sum(bool(tree.children(node)) for node in end_nodes)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_score_matches_recomputed(seed):
+    rnd = random.Random(seed)
+    admin = ClosureTable.create_default_admin_table()
+    user = admin.merge(ClosureTable.create_empty_user_table())
+    overlay = ClosureOverlay(admin, user)
+    score = CompletionScore(overlay)
+    admin_version, user_version = admin.version, user.version
+    for counter in range(100):
+        choice = rnd.random()
+        if choice < 0.6:
+            random_operation(admin, rnd, counter, is_descendant_koko=rnd.random() < 0.6)
+        elif choice < 0.9:
+            parent = rnd.choice(list(overlay.get_all_nodes()))
+            user.add_node(parent, f"u{counter}", is_descendant_koko=rnd.random() < 0.2)
+        elif len(user.get_user_defined_nodes()):
+            user.delete_node(rnd.choice(list(user.get_user_defined_nodes())))
+        # The breakdown is checked once the user table has caught up, so that
+        # every node has a single parent
+        checked = counter % 20 == 19
+        if checked or rnd.random() < 0.5:
+            user.synchronize_with(admin, admin.pop_changes())
+        
+        changes = admin.changes_since(admin_version)
+        changes.update(user.changes_since(user_version))
+        admin_version, user_version = admin.version, user.version
+        score.update(overlay, changes)
+        
+        fresh = CompletionScore(overlay)
+        expected = compute_completion_score(overlay.to_dataframe())
+        assert (score.total, score.completed) == (fresh.total, fresh.completed) == expected, counter
+        if checked:
+            tree = ReferenceTree.from_table(overlay)
+            assert (score.total, score.completed) == reference_score(tree)
+            for node in overlay.get_all_nodes():
+                assert score.subtree(node) == fresh.subtree(node) == reference_score(tree, node), (counter, node)
+    assert score.subtree('missing') == (0, 0)
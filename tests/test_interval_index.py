@@ -0,0 +1,36 @@
+"""IntervalIndex labels compared against the naive reference."""
+
+import random
+
+import pytest
+
+from models import IntervalIndex
+from reference import ReferenceTree
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_interval_index_matches_reference(seed):
+    rnd = random.Random(seed)
+    tree = ReferenceTree()
+    for counter in range(80):
+        # A few separate trees, each grown under random nodes
+        parent = rnd.choice([None] + list(tree.parents)) if counter % 20 else None
+        tree.add(parent, f"n{counter}")
+    edges = [(parent, node) for node, parent in tree.parents.items() if parent is not None]
+    
+    index = IntervalIndex(*zip(*edges), nodes=list(tree.parents))
+    assert index.is_forest
+    nodes = list(tree.parents)
+    for node in nodes:
+        subtree = list(index.subtree(node))
+        assert subtree[0] == node and set(subtree) == tree.subtree(node)
+        assert index.depth[index.labels.get_loc(node)] == len(tree.ancestors(node))
+    firsts, seconds = rnd.choices(nodes, k=200), rnd.choices(nodes, k=200)
+    assert list(index.is_ancestor_many(firsts, seconds)) == [
+        first in tree.ancestors(second) for first, second in zip(firsts, seconds)
+    ]
+    assert list(index.sizes(nodes + ['missing'])) == [len(tree.subtree(node)) for node in nodes] + [0]
+    
+    # A node with two parents or a cycle is not a forest
+    assert not IntervalIndex(['a', 'b'], ['c', 'c']).is_forest
+    assert not IntervalIndex(['a', 'b'], ['b', 'a']).is_forest
@@ -0,0 +1,93 @@
+"""ClosureOverlay queries compared against the merged table they stand in for."""
+
+import random
+
+import pytest
+
+from models import ClosureOverlay, ClosureTable
+from reference import closure_rows, node_properties, random_operation
+
+
+def pairs(df, columns=('ancestor', 'descendant')):
+    """Reduce query rows to a set of tuples."""
+    return set(zip(*(df[column].tolist() for column in columns)))
+
+
+def assert_overlay_matches(overlay, merged, rnd):
+    """Check the overlay's export and queries against ``merge``."""
+    assert closure_rows(overlay.to_dataframe()) == closure_rows(merged.to_dataframe())
+    assert list(overlay.get_all_nodes()) == list(merged.get_all_nodes())
+    assert sorted(overlay.get_user_defined_nodes()) == sorted(merged.get_user_defined_nodes())
+    assert pairs(overlay.get_direct_edges()) == pairs(merged.get_direct_edges())
+    assert list(overlay.roots()) == list(merged.roots())
+    
+    # Depth-limited queries read the stored paths, which may still hold the
+    # old depths of nodes below ones moved or deleted since the last sync
+    df = merged.to_dataframe()
+    nodes = list(merged.get_all_nodes())
+    sample = rnd.sample(nodes, min(8, len(nodes))) + ['missing']
+    for node in sample:
+        assert set(overlay.ancestors(node)) == set(merged.ancestors(node)), node
+        assert set(overlay.ancestors(node, 1)) == set(merged.ancestors(node, 1)), node
+        assert set(overlay.subtree(node)) == set(merged.subtree(node)), node
+        assert set(overlay.subtree(node, 2)) == set(df.loc[(df['ancestor'] == node) & (df['depth'] <= 2), 'descendant']), node
+        assert set(overlay.children(node)) == set(merged.children(node)), node
+    for node in sample[:-1]:
+        assert node_properties(overlay.get_node(node)) == node_properties(merged.get_node(node)), node
+    assert overlay.get_node('missing') is None
+    
+    assert pairs(overlay.children_many(sample)) == pairs(merged.children_many(sample))
+    assert pairs(overlay.subtree_many(sample)) == pairs(merged.subtree_many(sample))
+    assert pairs(overlay.subtree_many(sample, 1)) == pairs(df[df['ancestor'].isin(sample) & (df['depth'] <= 1)])
+    found, expected = (
+        {row['descendant']: node_properties(row) for row in table.get_nodes(sample).to_dict('records')}
+        for table in (overlay, merged)
+    )
+    assert found == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_overlay_matches_merge(seed):
+    rnd = random.Random(seed)
+    admin = ClosureTable.create_default_admin_table()
+    user = ClosureTable.create_empty_user_table()
+    for counter in range(60):
+        if rnd.random() < 0.65:
+            random_operation(admin, rnd, counter)
+        else:
+            parent = rnd.choice(list(admin.merge(user).get_all_nodes()))
+            user = admin.merge(user).add_node(parent, f"u{counter}", False, True, 'Z', {'u': counter})
+        # The overlay must also hold while the user table lags behind the admin table
+        if rnd.random() < 0.6:
+            user = user.synchronize_with(admin, admin.pop_changes())
+        if counter % 3 == 2:
+            assert_overlay_matches(ClosureOverlay(admin, user), admin.merge(user), rnd)
+
+
+def test_overlay_follows_later_mutations():
+    admin = ClosureTable.create_default_admin_table()
+    user = admin.merge(ClosureTable.create_empty_user_table()).add_node('Živé', 'Mačka', False, True)
+    overlay = ClosureOverlay(admin, user)
+    assert list(overlay.children('Živé')) == ['Mačka']
+    
+    admin.add_node('Živé', 'Pes', True, False)
+    user.add_node('Mačka', 'Mourek', False, True)
+    
+    assert set(overlay.children('Živé')) == {'Mačka', 'Pes'}
+    assert list(overlay.ancestors('Mourek')) == ['Mačka', 'Živé', 'Zem']
+    assert closure_rows(overlay.to_dataframe()) == closure_rows(overlay.materialize().to_dataframe())
+
+
+def test_overlay_caches_results_until_a_table_changes():
+    admin = ClosureTable.create_default_admin_table()
+    user = admin.merge(ClosureTable.create_empty_user_table()).add_node('Živé', 'Mačka', False, True)
+    overlay = ClosureOverlay(admin, user)
+    
+    roots = overlay.roots()
+    misses = overlay.cache_stats['misses']
+    assert list(overlay.roots()) == list(roots)
+    assert overlay.cache_stats['misses'] == misses
+    
+    user.add_node('Zem', 'Iné', False, True)
+    assert set(overlay.roots()) == {'Zem'}
+    assert overlay.cache_stats['misses'] > misses
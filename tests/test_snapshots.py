@@ -0,0 +1,74 @@
+"""Snapshots and undo/redo history compared against the recorded states."""
+
+import random
+
+from models import ClosureHistory, ClosureTable
+from reference import assert_indexes_consistent, closure_rows, paths, random_operation
+
+
+def test_snapshots_and_history_restore_earlier_states():
+    rnd = random.Random(1)
+    table = ClosureTable.create_default_admin_table()
+    history = ClosureHistory()
+    states = [closure_rows(table.to_dataframe())]
+    for step in range(15):
+        with history.track(table):
+            for counter in range(3):
+                random_operation(table, rnd, step * 3 + counter)
+        states.append(closure_rows(table.to_dataframe()))
+    
+    for state in reversed(states[:-1]):
+        history.undo(table)
+        assert closure_rows(table.to_dataframe()) == state
+        assert_indexes_consistent(table)
+    assert not history.can_undo()
+    for state in states[1:]:
+        history.redo(table)
+        assert closure_rows(table.to_dataframe()) == state
+    
+    snapshot = table.snapshot()
+    for counter in range(100, 120):
+        random_operation(table, rnd, counter)
+    table.restore(snapshot)
+    assert closure_rows(table.to_dataframe()) == states[-1]
+    assert_indexes_consistent(table)
+
+
+def test_history_shares_one_buffer_across_undo_and_redo():
+    rnd = random.Random(2)
+    table = ClosureTable.create_default_admin_table()
+    for counter in range(2000):
+        table.add_node(rnd.choice(list(table.get_all_nodes()[-50:])), f"n{counter}")
+    history = ClosureHistory()
+    size = table._buffer.size
+    
+    for step in range(10):
+        before = paths(table.df)
+        with history.track(table):
+            table.add_node('Živé', f"x{step}")
+            table.move_node(f"n{step}", 'Zem')
+        after = paths(table.df)
+        assert paths(history.undo(table).df) == before
+        assert paths(history.redo(table).df) == after
+    
+    snapshots = history._undo + history._redo
+    assert {id(snapshot._buffer) for snapshot in snapshots} == {id(table._buffer)}
+    # Ten rounds together append fewer rows than one copy of the table holds
+    assert table._buffer.size - size < len(table.df) // 2
+    assert_indexes_consistent(table)
+
+
+def test_restore_after_compaction_copies_the_snapshot_rows():
+    table = ClosureTable.create_default_admin_table()
+    for counter in range(300):
+        table.add_node(f"n{counter - 1}" if counter else 'Živé', f"n{counter}")
+    state = closure_rows(table.to_dataframe())
+    snapshot = table.snapshot()
+    
+    table.delete_node('n0')
+    assert table._buffer is not snapshot._buffer
+    table.restore(snapshot)
+    
+    assert closure_rows(table.to_dataframe()) == state
+    assert_indexes_consistent(table)
+    assert table.changes_since(snapshot.version).updated >= {'n0', 'n299'}
@@ -0,0 +1,77 @@
+"""Delta synchronization from change sets compared against a full synchronization."""
+
+import random
+
+import pytest
+
+import models
+from models import ClosureHistory, ClosureTable
+from reference import assert_indexes_consistent, closure_rows, random_operation
+
+
+@pytest.mark.parametrize('share', [float('inf'), models.DELTA_SYNC_SHARE, 0])
+@pytest.mark.parametrize('seed', range(5))
+def test_delta_synchronization_matches_full(monkeypatch, seed, share):
+    monkeypatch.setattr(models, 'DELTA_SYNC_SHARE', share)
+    rnd = random.Random(seed)
+    admin = ClosureTable.create_default_admin_table()
+    history = ClosureHistory()
+    delta = ClosureTable.create_empty_user_table()
+    full = ClosureTable.create_empty_user_table()
+    for counter in range(80):
+        choice = rnd.random()
+        if choice < 0.7:
+            with history.track(admin):
+                random_operation(admin, rnd, counter)
+        elif choice < 0.8 and history.can_undo():
+            history.undo(admin)
+        else:
+            # A user adds a node of their own under any node they see
+            parent = rnd.choice(list(admin.get_all_nodes()))
+            arguments = (parent, f"u{counter}", False, True, 'Z', {'u': counter})
+            delta = admin.merge(delta).add_node(*arguments)
+            full = admin.merge(full).add_node(*arguments)
+        
+        # Users synchronize at irregular intervals, so change sets pile up
+        if rnd.random() < 0.6:
+            delta = delta.synchronize_with(admin, admin.pop_changes())
+            full = full.synchronize_with(admin)
+            assert closure_rows(delta.to_dataframe()) == closure_rows(full.to_dataframe()), counter
+            assert_indexes_consistent(delta)
+    
+    # One full synchronization converges: a second one changes nothing
+    delta = delta.synchronize_with(admin, admin.pop_changes())
+    full = full.synchronize_with(admin)
+    assert closure_rows(full.synchronize_with(admin).to_dataframe()) == closure_rows(full.to_dataframe())
+    assert closure_rows(full.to_dataframe()) == closure_rows(delta.to_dataframe())
+
+
+@pytest.mark.parametrize('share', [float('inf'), 0])
+def test_synchronization_with_changes_updates_the_table_in_place(monkeypatch, share):
+    monkeypatch.setattr(models, 'DELTA_SYNC_SHARE', share)
+    admin = ClosureTable.create_default_admin_table()
+    user = admin.merge(ClosureTable.create_empty_user_table())
+    admin.add_node('Živé', 'Rastliny', True, False)
+    admin.add_node('Rastliny', 'Stromy', True, False)
+    version = user.version
+    
+    assert user.synchronize_with(admin, admin.pop_changes()) is user
+    
+    changes = user.changes_since(version)
+    assert {'Rastliny', 'Stromy'} <= changes.updated
+    assert list(user.ancestors('Stromy')) == ['Rastliny', 'Živé', 'Zem']
+    assert not user.get_node('Stromy')['is_user_defined']
+
+
+def test_full_synchronization_brings_new_admin_nodes_in_one_pass():
+    admin = ClosureTable.create_default_admin_table()
+    user = admin.merge(ClosureTable.create_empty_user_table()).add_node('Živé', 'Mačka', False, True)
+    admin.add_node('Živé', 'Rastliny', True, False)
+    admin.add_node('Rastliny', 'Stromy', True, False)
+    admin.add_node('Stromy', 'Dub', True, False)
+    
+    synchronized = user.synchronize_with(admin)
+    
+    rows = closure_rows(synchronized.to_dataframe())
+    assert rows == closure_rows(admin.merge(user).to_dataframe())
+    assert rows == closure_rows(synchronized.synchronize_with(admin).to_dataframe())
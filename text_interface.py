@@ -224,8 +224,7 @@ class TextInterface:
         Returns:
             str: String representation of the tree
         """
-        df = self.admin_table.to_dataframe()
-        direct_edges = df[df['depth'] == 1]
+        direct_edges = self.admin_table.get_direct_edges()
         
         tree_str = ""
         for _, row in direct_edges.iterrows():
@@ -362,18 +361,21 @@ class TextInterface:
             attributes['uuid'] = str(uuid.uuid4())
             
             # Add the node
-            self.admin_table.add_node(
-                parent,
-                node,
-                is_descendant_koko=True,
-                is_user_defined=False,
-                node_type=node_type,
-                attributes=attributes
-            )
+            with st.session_state.admin_history.track(self.admin_table):
+                self.admin_table.add_node(
+                    parent,
+                    node,
+                    is_descendant_koko=True,
+                    is_user_defined=False,
+                    node_type=node_type,
+                    attributes=attributes
+                )
             
             # Synchronize user table with admin table
             if 'user_closure_table' in st.session_state:
-                st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(self.admin_table)
+                st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(
+                    self.admin_table, self.admin_table.pop_changes()
+                )
             
             return {
                 "success": True,
@@ -398,11 +400,14 @@ class TextInterface:
                 }
                 
             # Delete the node
-            self.admin_table.delete_node(node)
+            with st.session_state.admin_history.track(self.admin_table):
+                self.admin_table.delete_node(node)
             
             # Synchronize user table with admin table
             if 'user_closure_table' in st.session_state:
-                st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(self.admin_table)
+                st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(
+                    self.admin_table, self.admin_table.pop_changes()
+                )
             
             return {
                 "success": True,
@@ -436,11 +441,14 @@ class TextInterface:
                 
             try:
                 # Move the node
-                self.admin_table.move_node(node, parent)
+                with st.session_state.admin_history.track(self.admin_table):
+                    self.admin_table.move_node(node, parent)
                 
                 # Synchronize user table with admin table
                 if 'user_closure_table' in st.session_state:
-                    st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(self.admin_table)
+                    st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(
+                        self.admin_table, self.admin_table.pop_changes()
+                    )
                 
                 return {
                     "success": True,
@@ -1,9 +1,26 @@
 import hashlib
+import importlib.util
+import io
 import json
 import os
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from models import CLOSURE_COLUMNS, IntervalIndex, _segments, normalize_closure_schema, validate_closure_chunk
+
+# File extensions read by ClosureFileReader; all but CSV need pyarrow
+COLUMNAR_EXTENSIONS = ['parquet', 'arrow', 'feather']
+
+# Columns that mark a file as an edge list rather than closure rows
+EDGE_COLUMNS = ['parent', 'child']
+
+# Text columns are read as strings, so names like '007' stay as written; depth is validated after parsing
+CSV_DTYPES = {
+    'ancestor': str, 'descendant': str, 'parent': str, 'child': str, 'is_descendant_koko': str,
+    'is_user_defined': str, 'node_type': str, 'attributes': str
+}
+
 def get_file_id(uploaded_file):
     """Compute a unique file identifier for an uploaded file."""
     return hashlib.md5(f"{uploaded_file.name}{uploaded_file.size}".encode()).hexdigest()
@@ -13,6 +30,225 @@ def convert_df_to_csv(df):
     """Convert a DataFrame to CSV format for download."""
     return df.to_csv(index=False).encode('utf-8')
 
+@st.cache_data(max_entries=8)
+def _convert_table_to_csv(version, _closure_table):
+    # The version stamp is the cache key, the table itself is not hashed
+    return _closure_table.to_dataframe().to_csv(index=False).encode('utf-8')
+
+def convert_table_to_csv(closure_table):
+    """Convert a ClosureTable to CSV format for download, cached by its version."""
+    return _convert_table_to_csv(closure_table.version, closure_table)
+
+def columnar_formats_available():
+    """Check whether pyarrow is installed for Parquet and Arrow files."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+def _import_pyarrow():
+    """Import pyarrow on first use, since it is an optional dependency.
+    
+    Returns:
+        module: The pyarrow module
+        
+    Raises:
+        ImportError: If pyarrow is not installed
+    """
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Súbory Parquet a Arrow vyžadujú balík pyarrow (pip install pyarrow).") from e
+    return pyarrow
+
+def _closure_arrow_schema(pa):
+    """Get the typed Arrow schema of an exported closure table."""
+    names = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('ancestor', names),
+        ('descendant', names),
+        ('depth', pa.int16()),
+        ('is_descendant_koko', pa.bool_()),
+        ('is_user_defined', pa.bool_()),
+        ('node_type', pa.dictionary(pa.int32(), pa.string())),
+        ('attributes', pa.string())
+    ])
+
+def _file_extension(source, name=None):
+    """Get the lower-case extension of a path or an uploaded file's name."""
+    name = name or getattr(source, 'name', source)
+    return os.path.splitext(str(name))[1].lower().lstrip('.')
+
+def _arrow_source(pa, source):
+    """Memory-map a path or wrap an uploaded file's buffer without copying it."""
+    if isinstance(source, (str, os.PathLike)):
+        return pa.memory_map(os.fspath(source))
+    return pa.BufferReader(source.getvalue())
+
+def _read_columns(source, extension):
+    """Read the column names of a file from its header or schema."""
+    if extension == 'csv':
+        if isinstance(source, (str, os.PathLike)):
+            return list(pd.read_csv(source, nrows=0).columns)
+        source.seek(0)
+        columns = list(pd.read_csv(source, nrows=0).columns)
+        source.seek(0)
+        return columns
+    pa = _import_pyarrow()
+    if extension == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(_arrow_source(pa, source)).names
+    return pa.ipc.open_file(_arrow_source(pa, source)).schema.names
+
+def is_edge_list(source, name=None):
+    """Check from its header whether a file holds an edge list rather than closure rows.
+    
+    Args:
+        source: Path or file-like object such as a Streamlit upload
+        name: Optional file name deciding the format, by default the
+            source's name
+        
+    Returns:
+        bool: True if the file has parent and child columns
+    """
+    return set(EDGE_COLUMNS) <= set(_read_columns(source, _file_extension(source, name)))
+
+def read_edge_list(source, name=None):
+    """Read an edge list written by ``convert_table_to_edges_csv`` or a columnar equivalent.
+    
+    Args:
+        source: Path or file-like object such as a Streamlit upload
+        name: Optional file name deciding the format, by default the
+            source's name
+        
+    Returns:
+        DataFrame: One row per node for ``ClosureTable.from_edges``
+        
+    Raises:
+        ImportError: If a columnar file is read without pyarrow installed
+    """
+    extension = _file_extension(source, name)
+    if extension == 'csv':
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+        return pd.read_csv(source, dtype=CSV_DTYPES)
+    pa = _import_pyarrow()
+    if extension == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(_arrow_source(pa, source)).to_pandas()
+    return pa.ipc.open_file(_arrow_source(pa, source)).read_all().to_pandas()
+
+class ClosureFileReader:
+    """Read a closure table file chunk by chunk.
+    
+    CSV files are parsed ``chunksize`` rows at a time with explicit dtypes and
+    Parquet and Arrow files one record batch at a time, so only one chunk is
+    held in memory besides the table being built. Each chunk is validated and
+    normalized before it is yielded, so a broken file fails on its first bad
+    chunk. Feed the reader to ``ClosureTable.from_chunks``.
+    """
+    
+    def __init__(self, source, name=None, chunksize=100_000, progress=None):
+        """Initialize a ClosureFileReader.
+        
+        Args:
+            source: Path or file-like object such as a Streamlit upload
+            name: Optional file name deciding the format, by default the
+                source's name
+            chunksize: Number of CSV rows per chunk
+            progress: Optional callback receiving the fraction of the file read
+            
+        Raises:
+            ValueError: If the file format is not supported
+        """
+        self.source = source
+        self.extension = _file_extension(source, name)
+        if self.extension != 'csv' and self.extension not in COLUMNAR_EXTENSIONS:
+            raise ValueError(f"Nepodporovaný formát súboru '{self.extension}'.")
+        self.chunksize = chunksize
+        self.progress = progress
+        self.rows = 0
+        self.memory_saved = 0
+    
+    def __iter__(self):
+        """Yield the validated and normalized chunks of the file.
+        
+        Yields:
+            DataFrame: Next chunk of closure table data keyed by node names
+            
+        Raises:
+            ValueError: If a chunk fails validation
+            ImportError: If a columnar file is read without pyarrow installed
+        """
+        self.rows = 0
+        self.memory_saved = 0
+        chunks = self._csv_chunks() if self.extension == 'csv' else self._columnar_chunks()
+        for chunk, fraction in chunks:
+            validate_closure_chunk(chunk, self.rows)
+            self.rows += len(chunk)
+            chunk, saved = normalize_closure_schema(chunk)
+            self.memory_saved += saved
+            if self.progress is not None:
+                self.progress(min(fraction, 1.0))
+            yield chunk
+    
+    def _csv_chunks(self):
+        """Yield CSV chunks with the fraction of the file read after each."""
+        if isinstance(self.source, (str, os.PathLike)):
+            with open(self.source, 'rb') as source:
+                yield from self._read_csv(source)
+        else:
+            self.source.seek(0)
+            yield from self._read_csv(self.source)
+    
+    def _read_csv(self, source):
+        """Parse an open CSV file in chunks, measuring progress by the read position."""
+        size = max(source.seek(0, os.SEEK_END), 1)
+        source.seek(0)
+        with pd.read_csv(source, dtype=CSV_DTYPES, chunksize=self.chunksize) as reader:
+            for chunk in reader:
+                yield chunk, source.tell() / size
+    
+    def _columnar_chunks(self):
+        """Yield the record batches of a Parquet or Arrow file with the fraction read after each."""
+        pa = _import_pyarrow()
+        source = _arrow_source(pa, self.source)
+        if self.extension == 'parquet':
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(source)
+            total = max(parquet_file.metadata.num_rows, 1)
+            batches = parquet_file.iter_batches(batch_size=self.chunksize)
+        else:
+            ipc_file = pa.ipc.open_file(source)
+            for i in range(ipc_file.num_record_batches):
+                yield ipc_file.get_batch(i).to_pandas(), (i + 1) / ipc_file.num_record_batches
+            return
+        read = 0
+        for batch in batches:
+            read += batch.num_rows
+            yield batch.to_pandas(), read / total
+
+@st.cache_data(max_entries=8)
+def _convert_table_to_parquet(version, _closure_table):
+    # The version stamp is the cache key, the table itself is not hashed
+    pa = _import_pyarrow()
+    import pyarrow.parquet as pq
+    df = _closure_table.to_dataframe()[CLOSURE_COLUMNS]
+    table = pa.Table.from_pandas(df, preserve_index=False).cast(_closure_arrow_schema(pa))
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression='zstd')
+    return buffer.getvalue()
+
+def convert_table_to_parquet(closure_table):
+    """Convert a ClosureTable to a compressed Parquet file, cached by its version."""
+    return _convert_table_to_parquet(closure_table.version, closure_table)
+
+@st.cache_data(max_entries=8)
+def _convert_table_to_edges_csv(version, _closure_table):
+    # The version stamp is the cache key, the table itself is not hashed
+    return _closure_table.to_edges().to_csv(index=False).encode('utf-8')
+
+def convert_table_to_edges_csv(closure_table):
+    """Convert a ClosureTable to an edge list CSV for download, cached by its version."""
+    return _convert_table_to_edges_csv(closure_table.version, closure_table)
+
 def compute_completion_score(df):
     """Compute the completion score for the tree.
     
@@ -22,14 +258,130 @@ def compute_completion_score(df):
     """
     koko_nodes = df[df['is_descendant_koko'] == True]['descendant'].unique()
     koko_parents = df[(df['is_descendant_koko'] == True) & (df['depth'] == 1) & (df['ancestor'].isin(koko_nodes))]['ancestor'].unique()
-    end_nodes = [n for n in koko_nodes if n not in koko_parents]
-    total = len(end_nodes)
-    completed = 0
-    for node in end_nodes:
-        has_descendant = not df[(df['ancestor'] == node) & (df['depth'] == 1)].empty
-        if has_descendant:
-            completed += 1
-    return total, completed
+    end_nodes = koko_nodes[~pd.Series(koko_nodes).isin(koko_parents).to_numpy()]
+    # An end node is completed if it is the parent in any edge
+    parents = df.loc[df['depth'] == 1, 'ancestor'].unique()
+    completed = int(pd.Series(end_nodes).isin(parents).sum())
+    return len(end_nodes), completed
+
+class CompletionScore:
+    """Completion score of a tree, kept up to date from change sets.
+    
+    A KoKo end node is a KoKo node without KoKo children; it is completed
+    once it has any child. The score is computed with one grouped pass over
+    the direct edges, and ``update()`` applies a ChangeSet by revisiting
+    only the changed nodes and their parents, using per-node child counts.
+    ``subtree()`` breaks the score down for any subtree from prefix sums in
+    pre-order, built once per change.
+    """
+    
+    def __init__(self, table):
+        """Compute the score of a tree.
+        
+        Args:
+            table: ClosureTable or ClosureOverlay
+        """
+        nodes = table.get_unique_nodes()
+        edges = table.get_direct_edges()
+        self._koko = dict(zip(nodes['descendant'].tolist(), nodes['is_descendant_koko'].astype(bool).tolist()))
+        self._parents = {}
+        for child, parent in zip(edges['descendant'].tolist(), edges['ancestor'].tolist()):
+            self._parents[child] = self._parents.get(child, ()) + (parent,)
+        is_koko_child = edges['descendant'].map(self._koko).fillna(False).astype(bool)
+        self._children = edges['ancestor'].value_counts().to_dict()
+        self._koko_children = edges.loc[is_koko_child, 'ancestor'].value_counts().to_dict()
+        self._breakdown = None
+        
+        koko = nodes.loc[nodes['is_descendant_koko'].astype(bool), 'descendant']
+        end_nodes = koko[~koko.isin(self._koko_children)]
+        self.total = len(end_nodes)
+        self.completed = int(end_nodes.isin(self._children).sum())
+    
+    def _status(self, node):
+        """Get whether a node is an end node and whether it is completed."""
+        is_end = self._koko.get(node, False) and not self._koko_children.get(node, 0)
+        return is_end, is_end and self._children.get(node, 0) > 0
+    
+    def _link(self, node, parents, step):
+        """Add (step 1) or remove (step -1) a node's edges from its parents' child counts."""
+        for parent in parents:
+            self._children[parent] = self._children.get(parent, 0) + step
+            if self._koko.get(node, False):
+                self._koko_children[parent] = self._koko_children.get(parent, 0) + step
+    
+    def update(self, table, changes):
+        """Bring the score up to date with a change set.
+        
+        Args:
+            table: The table the score was computed from, after the changes
+            changes: ChangeSet with the nodes affected since the score was
+                computed or last updated
+                
+        Returns:
+            CompletionScore: This score, updated
+        """
+        before = {}
+        
+        def touch(nodes):
+            for node in nodes:
+                if node not in before:
+                    before[node] = self._status(node)
+        
+        changed = changes.nodes()
+        # Detach the changed nodes with their old parents and flags
+        for node in changed:
+            parents = self._parents.pop(node, ())
+            touch([node, *parents])
+            self._link(node, parents, -1)
+            self._koko.pop(node, None)
+        
+        # Attach them again as the table holds them now
+        for node in changed:
+            node_info = table.get_node(node)
+            if node_info is None:
+                continue
+            parents = tuple(table.ancestors(node, max_depth=1).tolist())
+            touch(parents)
+            self._koko[node] = bool(node_info['is_descendant_koko'])
+            if parents:
+                self._parents[node] = parents
+            self._link(node, parents, 1)
+        
+        for node, (was_end, was_completed) in before.items():
+            is_end, is_completed = self._status(node)
+            self.total += int(is_end) - int(was_end)
+            self.completed += int(is_completed) - int(was_completed)
+        if before:
+            self._breakdown = None
+        return self
+    
+    def subtree(self, node):
+        """Get the score of the subtree rooted at a node.
+        
+        Args:
+            node: Name of the subtree's root
+            
+        Returns:
+            tuple: (total, completed) counted over the end nodes in the subtree
+        """
+        if self._breakdown is None:
+            children = list(self._parents)
+            parents = [parents[0] for parents in self._parents.values()]
+            index = IntervalIndex(
+                np.array(parents, dtype=object), np.array(children, dtype=object), np.array(list(self._koko), dtype=object)
+            )
+            statuses = np.array([self._status(label) for label in index.labels], dtype=bool).reshape(-1, 2)
+            # Prefix sums in pre-order turn every subtree into a difference of two entries
+            ordered = statuses[index.order]
+            counts = np.vstack([np.zeros((1, 2), dtype=np.int64), np.cumsum(ordered, axis=0)])
+            self._breakdown = (index, counts)
+        
+        index, counts = self._breakdown
+        code = index.labels.get_indexer([node])[0]
+        if code < 0 or index.pre[code] < 0:
+            return 0, 0
+        total, completed = counts[index.end[code] + 1] - counts[index.pre[code]]
+        return int(total), int(completed)
 
 def build_tree(df):
     """Build a tree structure from a closure table.
@@ -75,78 +427,385 @@ def render_tree_sorted(tree, node, level=0, visited=None):
     for child in children:
         render_tree_sorted(tree, child, level + 1, visited)
 
+def _tree_item(node, is_user_defined, node_type, attributes):
+    """Build one streamlit_tree_select item, without children."""
+    # Create label with visual indicators for user_defined status
+    if is_user_defined:
+        label = f"🟢 {node}"  # Green circle for user-defined nodes
+    else:
+        label = f"🔴 {node}"  # Red circle for non-user-defined nodes
+    
+    # Add node type if available
+    if node_type:
+        label = f"{label} [Typ: {node_type}]"
+    
+    return {
+        "label": label,
+        "value": node,
+        "children": [],
+        "is_user_defined": is_user_defined,
+        "node_type": node_type,
+        "attributes": attributes
+    }
+
+# Marks the end of a children iterator in build_tree_data
+_EXHAUSTED = object()
+
 def build_tree_data(df):
     """Build tree data for streamlit_tree_select component.
     
+    The tree is assembled without recursion, so arbitrarily deep chains are
+    fine. Children are grouped and sorted once from the edge arrays, and a
+    node that appears again on its own path is skipped instead of looping.
+    
     Args:
         df: DataFrame with closure table data
         
     Returns:
         list: List of tree nodes in the format required by streamlit_tree_select
     """
-    tree = {}
-    # Create a dictionary to store node properties
-    node_properties = {}
-    
-    # Check if the required columns exist in the DataFrame
-    has_user_defined = 'is_user_defined' in df.columns
-    has_node_type = 'node_type' in df.columns
-    has_attributes = 'attributes' in df.columns
-    
-    # Extract unique nodes with their properties
-    columns = ['descendant']
-    if has_user_defined:
-        columns.append('is_user_defined')
-    if has_node_type:
-        columns.append('node_type')
-    if has_attributes:
-        columns.append('attributes')
-    
-    unique_nodes = df[columns].drop_duplicates()
-    for _, row in unique_nodes.iterrows():
-        props = {
-            'is_user_defined': row.get('is_user_defined', False) if has_user_defined else False,
-            'node_type': row.get('node_type', None) if has_node_type else None,
-            'attributes': row.get('attributes', '{}') if has_attributes else '{}'
-        }
-        node_properties[row['descendant']] = props
-    
-    # Build the tree structure
-    for _, row in df[df['depth'] == 1].iterrows():
-        parent, child = row['ancestor'], row['descendant']
-        tree.setdefault(parent, set()).add(child)
+    # One row of properties per node, defaulting the columns that are missing
+    nodes = df.drop_duplicates('descendant', keep='last')
+    names = nodes['descendant'].tolist()
+    user_defined = nodes['is_user_defined'].tolist() if 'is_user_defined' in df.columns else [False] * len(names)
+    node_types = nodes['node_type'].tolist() if 'node_type' in df.columns else [None] * len(names)
+    attributes = nodes['attributes'].tolist() if 'attributes' in df.columns else ['{}'] * len(names)
+    node_properties = dict(zip(names, zip(user_defined, node_types, attributes)))
+    
+    # Children of each parent, sorted, from the distinct direct edges
+    edges = df.loc[df['depth'] == 1, ['ancestor', 'descendant']].drop_duplicates()
+    edges = edges.sort_values(['ancestor', 'descendant'])
+    parents = edges['ancestor'].to_numpy()
+    children = edges['descendant'].to_numpy()
+    boundaries = np.flatnonzero(parents[1:] != parents[:-1]) + 1 if len(parents) else np.array([], dtype=int)
+    starts = parents[np.r_[0, boundaries]] if len(parents) else []
+    tree = dict(zip(starts, (group.tolist() for group in np.split(children, boundaries))))
+    
+    def make_item(node):
+        return _tree_item(node, *node_properties.get(node, (False, 'Neurčený', '{}')))
+    
+    # Find root nodes: those that are not descendants of any other node
+    all_nodes = set(df['descendant'].unique())
+    child_nodes = set(children.tolist())
+    roots = sorted(all_nodes - child_nodes)
+    
+    tree_data = []
+    for root in roots:
+        root_item = make_item(root)
+        tree_data.append(root_item)
+        # Depth-first with an explicit stack of (item, iterator over its children)
+        stack = [(root_item, iter(tree.get(root, ())))]
+        on_path = {root}
+        while stack:
+            item, remaining = stack[-1]
+            child = next(remaining, _EXHAUSTED)
+            if child is _EXHAUSTED:
+                stack.pop()
+                on_path.discard(item["value"])
+                continue
+            if child in on_path:
+                continue
+            child_item = make_item(child)
+            item["children"].append(child_item)
+            stack.append((child_item, iter(tree.get(child, ()))))
+            on_path.add(child)
+    return tree_data
+
+@st.cache_data(max_entries=8)
+def _build_table_tree_data(version, _closure_table):
+    # The version stamp is the cache key, the table itself is not hashed
+    return build_tree_data(_closure_table.to_dataframe())
+
+def build_table_tree_data(closure_table):
+    """Build tree data for a ClosureTable or ClosureOverlay, cached by its version."""
+    return _build_table_tree_data(closure_table.version, closure_table)
+
+# Prefix of the values of placeholder children standing in for unloaded branches
+LAZY_PLACEHOLDER = "__nacitat__:"
+
+def build_lazy_tree_data(closure_table, expanded):
+    """Build tree data holding only the expanded levels of a closure table.
+    
+    Starting from the roots, children are fetched level by level through the
+    table's children index, and only for expanded nodes. A collapsed node with
+    children gets a single placeholder child so it still shows as expandable;
+    its branch is loaded once it appears in ``expanded``. The payload and the
+    build time are proportional to the visible nodes.
+    
+    Args:
+        closure_table: ClosureTable or ClosureOverlay instance
+        expanded: Collection of the names of the expanded nodes
+        
+    Returns:
+        list: List of tree nodes in the format required by streamlit_tree_select
+    """
+    expanded = set(expanded)
+    
+    def make_items(nodes):
+        # One property lookup per level
+        properties = closure_table.get_nodes(nodes)
+        is_user_defined = properties['is_user_defined'].astype(bool).tolist()
+        node_types = properties['node_type'].tolist()
+        attributes = properties['attributes'].tolist()
+        items = map(_tree_item, properties['descendant'].tolist(), is_user_defined, node_types, attributes)
+        return {item["value"]: item for item in items}
+    
+    roots = closure_table.roots()
+    level = make_items(roots)
+    tree_data = [level[root] for root in roots]
+    seen = set(level)
+    while level:
+        # One children query per level, covering every visible node
+        edges = closure_table.children_many(list(level)).sort_values(['ancestor', 'descendant'], kind='stable')
+        visible = []
+        for parent, child in zip(edges['ancestor'].tolist(), edges['descendant'].tolist()):
+            item = level[parent]
+            if parent not in expanded:
+                if not item["children"]:
+                    item["children"].append({"label": "…", "value": LAZY_PLACEHOLDER + parent, "disabled": True})
+            elif child not in seen:
+                visible.append((item, child))
+                seen.add(child)
+        next_level = make_items([child for _, child in visible])
+        for item, child in visible:
+            item["children"].append(next_level[child])
+        level = next_level
+    return tree_data
+
+# Distance between neighbouring leaves and between levels of the graph layout, in pixels
+LAYOUT_X_SPACING = 120
+LAYOUT_Y_SPACING = 100
 
-    def build_subtree(node):
-        children = tree.get(node, [])
-        props = node_properties.get(node, {})
-        is_user_defined = props.get('is_user_defined', False)
-        node_type = props.get('node_type', 'Neurčený')
+def compute_tree_layout(parents, children, nodes=None):
+    """Compute a layered layout of a forest from its direct edges.
+    
+    Each node is placed on the row of its depth. Leaves take consecutive
+    columns in pre-order and every other node is centered above the leaves
+    of its subtree, so subtrees never overlap. Siblings are ordered by name.
+    Nodes on a cycle, which have no depth, go to a row below the forest.
+    
+    Args:
+        parents: Array of the parent of each edge
+        children: Array of the child of each edge
+        nodes: Optional iterable of all nodes, so nodes without edges are placed too
         
-        # Create label with visual indicators for user_defined status
-        if is_user_defined:
-            label = f"🟢 {node}"  # Green circle for user-defined nodes
-        else:
-            label = f"🔴 {node}"  # Red circle for non-user-defined nodes
+    Returns:
+        DataFrame: node, x and y columns with one row per node
+    """
+    # The index orders siblings by their position among the nodes, so pass the nodes sorted
+    parents, children = np.asarray(parents, dtype=object), np.asarray(children, dtype=object)
+    nodes = pd.Index(np.concatenate([np.asarray([] if nodes is None else nodes, dtype=object), parents, children]))
+    index = IntervalIndex(parents, children, nodes=nodes.unique().sort_values().to_numpy())
+    placed = index.pre >= 0
+    
+    # Leaves counted before each pre-order position give the leaf columns of every subtree
+    is_leaf = index.size[index.order] == 1
+    leaves_before = np.concatenate([[0], np.cumsum(is_leaf)])
+    pre, end = index.pre[placed], index.end[placed]
+    x = np.zeros(len(index.labels))
+    x[placed] = (leaves_before[pre] + leaves_before[end + 1] - 1) / 2
+    y = index.depth.astype(float)
+    
+    unplaced = ~placed
+    x[unplaced] = np.arange(unplaced.sum())
+    y[unplaced] = index.depth.max(initial=-1) + 1
+    return pd.DataFrame({
+        'node': index.labels.to_numpy(),
+        'x': x * LAYOUT_X_SPACING,
+        'y': y * LAYOUT_Y_SPACING
+    })
+
+@st.cache_data(max_entries=8)
+def _compute_table_layout(version, _closure_table):
+    # The version stamp is the cache key, the table itself is not hashed
+    edges = _closure_table.get_direct_edges()
+    layout = compute_tree_layout(edges['ancestor'].to_numpy(), edges['descendant'].to_numpy(), _closure_table.get_all_nodes())
+    return dict(zip(layout['node'].tolist(), zip(layout['x'].tolist(), layout['y'].tolist())))
+
+def compute_table_layout(closure_table):
+    """Compute the graph layout of a ClosureTable or ClosureOverlay, cached by its version.
+    
+    Returns:
+        dict: Node name to its (x, y) position
+    """
+    return _compute_table_layout(closure_table.version, closure_table)
+
+# Prefix of the IDs of aggregate nodes standing in for collapsed subtrees
+AGGREGATE_PREFIX = "__zbalene__:"
+
+# Default number of nodes drawn in the graph before subtrees are collapsed
+GRAPH_NODE_BUDGET = 200
+
+class GraphIndex:
+    """Hierarchy of a closure table as arrays, for drawing it at a reduced level of detail.
+    
+    Built from the direct edges and the node types only. Nodes are numbered
+    by sorted name and labeled in pre-order by an IntervalIndex, so the
+    children of a level are one segment lookup, the size of a subtree is
+    read off the index and the types of its nodes are one contiguous slice.
+    """
+    
+    def __init__(self, closure_table):
+        """Index the hierarchy of a closure table.
+        
+        Args:
+            closure_table: ClosureTable, ClosureOverlay or SQLiteClosureTable instance
+        """
+        edges = closure_table.get_direct_edges()
+        nodes = closure_table.get_unique_nodes()
+        parents = edges['ancestor'].to_numpy(dtype=object)
+        children = edges['descendant'].to_numpy(dtype=object)
+        names = pd.Index(np.concatenate([nodes['descendant'].to_numpy(dtype=object), parents, children]))
+        self.index = IntervalIndex(parents, children, nodes=names.unique().sort_values().to_numpy())
+        labels = self.index.labels
+        
+        # Children grouped by parent, siblings in name order
+        parent_codes, child_codes = labels.get_indexer(parents), labels.get_indexer(children)
+        order = np.lexsort((child_codes, parent_codes))
+        self._child_parents, self._children = parent_codes[order], child_codes[order]
+        self.roots = np.flatnonzero(self.index.depth == 0)
+        
+        # Node types in pre-order, so a subtree's types are one slice
+        node_types = pd.Series(nodes['node_type'].to_numpy(dtype=object), index=nodes['descendant'].to_numpy(dtype=object))
+        node_types = node_types[~node_types.index.duplicated()].reindex(labels)
+        node_types = node_types.where(node_types.notna() & (node_types != ''), 'Neurčený')
+        type_codes, self.type_names = pd.factorize(node_types.to_numpy(dtype=object))
+        self._preorder_types = type_codes[self.index.order]
+    
+    def code(self, node):
+        """Get the position of a node, or -1 if it is unknown or on a cycle."""
+        return int(self.index._codes([node])[0])
+    
+    def children(self, codes):
+        """Get the children of many nodes.
         
-        # Add node type if available
-        if node_type:
-            label = f"{label} [Typ: {node_type}]"
+        Args:
+            codes: Array of node positions
+            
+        Returns:
+            tuple: (parents, children) position arrays, one entry per edge
+        """
+        starts = np.searchsorted(self._child_parents, codes, side='left')
+        counts = np.searchsorted(self._child_parents, codes, side='right') - starts
+        return np.repeat(codes, counts), self._children[_segments(starts, counts)]
+    
+    def summarize(self, ranges):
+        """Count the nodes of groups of pre-order ranges by type.
         
-        return {
-            "label": label,
-            "value": node,
-            "children": [build_subtree(child) for child in sorted(children)],
-            "is_user_defined": is_user_defined,
-            "node_type": node_type,
-            "attributes": props.get('attributes', '{}')
-        }
+        Args:
+            ranges: List of (starts, ends) arrays of inclusive pre-order ranges, one per group
+            
+        Returns:
+            tuple: (counts, histograms) with the number of nodes of each group
+                and a dictionary of type name to count per group
+        """
+        groups = np.concatenate([np.full(int((ends - starts + 1).sum()), group) for group, (starts, ends) in enumerate(ranges)] or [[]])
+        positions = np.concatenate([_segments(starts, ends - starts + 1) for starts, ends in ranges] or [[]]).astype(np.intp)
+        type_count = len(self.type_names)
+        table = np.bincount(
+            groups.astype(np.intp) * type_count + self._preorder_types[positions], minlength=len(ranges) * type_count
+        ).reshape(len(ranges), type_count)
+        histograms = [
+            {self.type_names[code]: int(row[code]) for code in np.flatnonzero(row)} for row in table
+        ]
+        return table.sum(axis=1), histograms
 
-    # Find root nodes: those that are not descendants of any other node
-    all_nodes = set(df['descendant'].unique())
-    child_nodes = set(df[df['depth'] == 1]['descendant'].unique())
-    roots = list(all_nodes - child_nodes)
+@st.cache_data(max_entries=8)
+def _graph_index(version, _closure_table):
+    # The version stamp is the cache key, the table itself is not hashed
+    return GraphIndex(_closure_table)
+
+def build_graph_view(closure_table, budget, focus=None, radius=None):
+    """Select the part of a closure table to draw within a node budget.
+    
+    The hierarchy is expanded from the roots one level at a time, as long as
+    the next level still fits in ``budget``. The subtrees below the last
+    drawn level are collapsed, each into a single aggregate summarizing the
+    hidden descendants. With ``focus`` the graph starts from that node
+    instead, drawing its ``radius`` nearest ancestors above it and at most
+    ``radius`` levels below it. The work is done on the table's GraphIndex,
+    cached per version, so it is proportional to the drawn and hidden nodes.
+    
+    Args:
+        closure_table: ClosureTable, ClosureOverlay or SQLiteClosureTable instance
+        budget: Maximum number of drawn nodes, not counting the aggregates
+        focus: Optional name of the node to center the graph on
+        radius: Optional number of levels drawn above and below ``focus``
+        
+    Returns:
+        tuple: (nodes, edges, aggregates) where nodes lists the names of the
+            drawn nodes, edges is a DataFrame of the (ancestor, descendant)
+            edges between them and aggregates is a DataFrame with the id,
+            parent, count and types (node type to count) of each collapsed
+            subtree; an aggregate without a parent stands for the roots that
+            didn't fit
+        
+    Raises:
+        ValueError: If the focus node doesn't exist
+    """
+    graph = _graph_index(closure_table.version, closure_table)
+    index, labels = graph.index, graph.index.labels.to_numpy()
+    budget = max(int(budget), 1)
+    edge_parents, edge_children = [], []
+    if focus is None:
+        level = graph.roots
+        drawn = []
+    else:
+        code = graph.code(focus)
+        if code < 0:
+            raise ValueError(f"Uzol '{focus}' neexistuje.")
+        # Ancestors come nearest first; draw them as the path down to the focus node
+        path = np.append(index.labels.get_indexer(closure_table.ancestors(focus, max_depth=radius)[::-1]), code)
+        drawn = [path[:-1]]
+        edge_parents.append(path[:-1])
+        edge_children.append(path[1:])
+        level = np.array([code])
+    
+    # Roots beyond the budget are collapsed into one aggregate without a parent
+    collapsed_roots = level[budget:]
+    level = level[:budget]
+    drawn_count = sum(len(part) for part in drawn)
+    depth = 0
+    while True:
+        drawn.append(level)
+        drawn_count += len(level)
+        if radius is not None and focus is not None and depth == radius:
+            break
+        parents, children = graph.children(level)
+        if not len(children) or drawn_count + len(children) > budget:
+            break
+        edge_parents.append(parents)
+        edge_children.append(children)
+        level = children
+        depth += 1
+    
+    # Summarize the hidden descendants of the last drawn level
+    frontier = level[index.size[level] > 1]
+    ranges = [(np.array([start]), np.array([end])) for start, end in zip(index.pre[frontier] + 1, index.end[frontier])]
+    if len(collapsed_roots):
+        ranges.append((index.pre[collapsed_roots], index.end[collapsed_roots]))
+    counts, histograms = graph.summarize(ranges)
+    parents = labels[frontier].tolist() + [None] * bool(len(collapsed_roots))
+    aggregates = pd.DataFrame({
+        'id': [AGGREGATE_PREFIX + ('' if parent is None else parent) for parent in parents],
+        'parent': pd.Series(parents, dtype=object),
+        'count': pd.Series(counts, dtype=np.int64),
+        'types': pd.Series(histograms, dtype=object)
+    })
+    edges = pd.DataFrame({
+        'ancestor': labels[np.concatenate(edge_parents or [[]]).astype(np.intp)],
+        'descendant': labels[np.concatenate(edge_children or [[]]).astype(np.intp)]
+    }, dtype=object)
+    return labels[np.concatenate(drawn).astype(np.intp)].tolist(), edges, aggregates
+
+@st.cache_data(max_entries=8)
+def _build_table_graph_view(version, budget, focus, radius, _closure_table):
+    # The version stamp is the cache key, the table itself is not hashed
+    return build_graph_view(_closure_table, budget, focus, radius)
 
-    return [build_subtree(root) for root in sorted(roots)]
+def build_table_graph_view(closure_table, budget, focus=None, radius=None):
+    """Select the part of a ClosureTable or ClosureOverlay to draw, cached by its version."""
+    return _build_table_graph_view(closure_table.version, budget, focus, radius, closure_table)
 
 @st.cache_data
 def load_object_types():
@@ -1,13 +1,16 @@
 import streamlit as st
 import json
 import uuid
+import numpy as np
 from streamlit_agraph import agraph, Node, Edge, Config
 from streamlit_tree_select import tree_select
 
-from models import ClosureTable
+from models import ClosureOverlay
 from text_interface import TextInterface
 from utils import (
-    convert_df_to_csv, compute_completion_score, build_tree_data,
+    convert_table_to_csv, convert_table_to_parquet, convert_table_to_edges_csv, columnar_formats_available,
+    CompletionScore, build_table_tree_data, build_lazy_tree_data, compute_table_layout, compute_tree_layout,
+    build_table_graph_view, GRAPH_NODE_BUDGET,
     load_object_types, get_object_type_names, get_object_type_by_name,
     get_object_type_color, get_object_type_attributes
 )
@@ -19,19 +22,54 @@ class BaseView:
     def render_graph(closure_table):
         """Render a graph visualization of the closure table.
         
+        By default the graph is drawn at a reduced level of detail: subtrees
+        beyond the node budget are collapsed into aggregate nodes, and the graph
+        can be focused on the neighborhood of a single node.
+        
         Args:
-            closure_table: ClosureTable instance
+            closure_table: ClosureTable or ClosureOverlay instance
         """
-        unique_nodes = closure_table.get_unique_nodes()
+        with st.expander("Nastavenia grafu", expanded=False):
+            level_of_detail = st.checkbox("Zbaliť podstromy nad limit uzlov", value=True, key="graph_level_of_detail")
+            if level_of_detail:
+                budget = st.number_input(
+                    "Maximálny počet zobrazených uzlov", min_value=1, value=GRAPH_NODE_BUDGET, step=50, key="graph_budget"
+                )
+                focus = st.text_input("Zamerať na uzol (prázdne = celý strom)", key="graph_focus").strip()
+                radius = st.number_input("Počet úrovní nad a pod uzlom", min_value=0, value=2, step=1, key="graph_radius")
         
-        # Check if the required columns exist in the DataFrame
-        df = closure_table.to_dataframe()
-        has_user_defined = 'is_user_defined' in df.columns
-        has_node_type = 'node_type' in df.columns
-        has_attributes = 'attributes' in df.columns
+        if level_of_detail:
+            try:
+                visible, direct_edges, aggregates = build_table_graph_view(
+                    closure_table, budget, focus or None, radius if focus else None
+                )
+            except ValueError as e:
+                st.error(str(e))
+                return
+            unique_nodes = closure_table.get_nodes(visible)
+            
+            # The drawn part is small, so its layout is computed on every run
+            aggregate_edges = aggregates[aggregates['parent'].notna()]
+            layout = compute_tree_layout(
+                np.concatenate([direct_edges['ancestor'].to_numpy(), aggregate_edges['parent'].to_numpy()]),
+                np.concatenate([direct_edges['descendant'].to_numpy(), aggregate_edges['id'].to_numpy()]),
+                np.concatenate([np.asarray(visible, dtype=object), aggregates['id'].to_numpy()])
+            )
+            layout = dict(zip(layout['node'].tolist(), zip(layout['x'].tolist(), layout['y'].tolist())))
+        else:
+            unique_nodes = closure_table.get_nodes(closure_table.get_all_nodes())
+            direct_edges = closure_table.get_direct_edges()
+            aggregates = None
+            # Positions are computed here, so the browser doesn't have to run the physics simulation
+            layout = compute_table_layout(closure_table)
+        
+        # Check which properties the nodes being drawn carry
+        has_user_defined = 'is_user_defined' in unique_nodes.columns
+        has_node_type = 'node_type' in unique_nodes.columns
+        has_attributes = 'attributes' in unique_nodes.columns
         
         nodes = []
-        for _, row in unique_nodes.iterrows():
+        for row in unique_nodes.to_dict('records'):
             # Determine node color based on type and whether it's a KoKo descendant
             if row['is_descendant_koko']:
                 color = "red"  # KoKo nodes are always red
@@ -70,22 +108,46 @@ class BaseView:
                     label=row['descendant'], 
                     color=color,
                     title=title,
-                    borderWidth=border  # Add border width to visually mark user-defined nodes
+                    borderWidth=border,  # Add border width to visually mark user-defined nodes
+                    x=layout[row['descendant']][0],
+                    y=layout[row['descendant']][1]
                 )
             )
         
-        direct_edges = closure_table.get_direct_edges()
         edges = [
-            Edge(source=row['ancestor'], target=row['descendant']) 
-            for _, row in direct_edges.iterrows()
+            Edge(source=ancestor, target=descendant)
+            for ancestor, descendant in zip(direct_edges['ancestor'].tolist(), direct_edges['descendant'].tolist())
         ]
         
+        # Each collapsed subtree is drawn as one node with the count and types of its hidden nodes
+        if aggregates is not None:
+            for aggregate in aggregates.to_dict('records'):
+                title = f"Zbalené uzly: {aggregate['count']}"
+                for node_type, count in aggregate['types'].items():
+                    title += f"\n{node_type}: {count}"
+                nodes.append(
+                    Node(
+                        id=aggregate['id'],
+                        label=f"+{aggregate['count']}",
+                        color="#D3D3D3",
+                        title=title,
+                        shape="box",
+                        x=layout[aggregate['id']][0],
+                        y=layout[aggregate['id']][1]
+                    )
+                )
+                if aggregate['parent'] is not None:
+                    edges.append(Edge(source=aggregate['parent'], target=aggregate['id'], dashes=True))
+            if len(aggregates):
+                st.caption(f"Zobrazených {len(unique_nodes)} uzlov, {aggregates['count'].sum()} je zbalených v šedých uzloch.")
+        
         config = Config(
             width=700, 
             height=500, 
             directed=True, 
             nodeHighlightBehavior=True, 
-            highlightColor="#F7A7A6"
+            highlightColor="#F7A7A6",
+            physics=False
         )
         
         agraph(nodes=nodes, edges=edges, config=config)
@@ -106,6 +168,7 @@ class AdminView(BaseView):
     def render(self):
         """Render the administrator view."""
         st.sidebar.header("Správa stromu")
+        self._render_undo_redo()
         action = st.sidebar.selectbox("Akcia:", ["Pridať nový uzol", "Zmazať uzol", "Presunúť uzol", "Textové rozhranie"])
         
         if action == "Pridať nový uzol":
@@ -121,13 +184,46 @@ class AdminView(BaseView):
         self.render_graph(self.admin_table)
         
         # Download button for admin table
-        admin_csv = convert_df_to_csv(self.admin_table.to_dataframe())
+        admin_csv = convert_table_to_csv(self.admin_table)
         st.sidebar.download_button(
             label="Stiahnuť admin closure_table ako CSV",
             data=admin_csv,
             file_name='admin_closure_table.csv',
             mime='text/csv'
         )
+        st.sidebar.download_button(
+            label="Stiahnuť admin strom ako zoznam hrán (CSV)",
+            data=convert_table_to_edges_csv(self.admin_table),
+            file_name='admin_edges.csv',
+            mime='text/csv'
+        )
+        if columnar_formats_available():
+            st.sidebar.download_button(
+                label="Stiahnuť admin closure_table ako Parquet",
+                data=convert_table_to_parquet(self.admin_table),
+                file_name='admin_closure_table.parquet',
+                mime='application/vnd.apache.parquet'
+            )
+    
+    def _render_undo_redo(self):
+        """Render the undo and redo buttons."""
+        history = st.session_state.admin_history
+        undo_column, redo_column = st.sidebar.columns(2)
+        undo = undo_column.button("Späť", disabled=not history.can_undo())
+        redo = redo_column.button("Znova", disabled=not history.can_redo())
+        
+        if undo or redo:
+            if undo:
+                history.undo(self.admin_table)
+            else:
+                history.redo(self.admin_table)
+            
+            # Synchronize user table with admin table
+            if 'user_closure_table' in st.session_state:
+                st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(
+                    self.admin_table, self.admin_table.pop_changes()
+                )
+            st.rerun()
     
     def _render_text_interface(self):
         """Render the text interface for natural language interaction."""
@@ -184,18 +280,21 @@ class AdminView(BaseView):
                 attributes['uuid'] = str(uuid.uuid4())
                 
                 # Add node to admin table
-                self.admin_table.add_node(
-                    selected_parent,
-                    new_node_name.strip(),
-                    is_descendant_koko=True,
-                    is_user_defined=False,
-                    node_type=selected_node_type,
-                    attributes=attributes
-                )
+                with st.session_state.admin_history.track(self.admin_table):
+                    self.admin_table.add_node(
+                        selected_parent,
+                        new_node_name.strip(),
+                        is_descendant_koko=True,
+                        is_user_defined=False,
+                        node_type=selected_node_type,
+                        attributes=attributes
+                    )
                 
                 # Synchronize user table with admin table
                 if 'user_closure_table' in st.session_state:
-                    st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(self.admin_table)
+                    st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(
+                        self.admin_table, self.admin_table.pop_changes()
+                    )
                 
                 st.sidebar.success(f"Uzol '{new_node_name}' typu '{selected_node_type}' pridaný pod '{selected_parent}'!")
                 st.rerun()
@@ -211,11 +310,14 @@ class AdminView(BaseView):
         
         if st.sidebar.button("Zmaž uzol"):
             # Delete node from admin table
-            self.admin_table.delete_node(node_to_delete)
+            with st.session_state.admin_history.track(self.admin_table):
+                self.admin_table.delete_node(node_to_delete)
             
             # Synchronize user table with admin table
             if 'user_closure_table' in st.session_state:
-                st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(self.admin_table)
+                st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(
+                    self.admin_table, self.admin_table.pop_changes()
+                )
             
             st.sidebar.success(f"Uzol '{node_to_delete}' a jeho potomkovia boli zmazaní!")
             st.rerun()
@@ -234,11 +336,14 @@ class AdminView(BaseView):
         if st.sidebar.button("Presuň uzol"):
             try:
                 # Move node in admin table
-                self.admin_table.move_node(node_to_move, new_parent)
+                with st.session_state.admin_history.track(self.admin_table):
+                    self.admin_table.move_node(node_to_move, new_parent)
                 
                 # Synchronize user table with admin table
                 if 'user_closure_table' in st.session_state:
-                    st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(self.admin_table)
+                    st.session_state.user_closure_table = st.session_state.user_closure_table.synchronize_with(
+                        self.admin_table, self.admin_table.pop_changes()
+                    )
                 
                 st.sidebar.success(f"Uzol '{node_to_move}' bol presunutý pod '{new_parent}'!")
                 st.rerun()
@@ -258,7 +363,24 @@ class UserView(BaseView):
         """
         self.admin_table = admin_table
         self.user_table = user_table
-        self.combined_table = admin_table.merge(user_table)
+        self.combined_table = self._combined_table()
+    
+    def _combined_table(self):
+        """Get the read-only overlay of both tables.
+        
+        The overlay is kept in the session state and reused across reruns
+        while it wraps the same two tables. Its query results are cached until
+        either table's version changes, so a rerun without edits doesn't pay
+        for collecting the user layer again.
+        
+        Returns:
+            ClosureOverlay: Overlay of the admin and user tables
+        """
+        cached = st.session_state.get('combined_table')
+        if cached is None or cached.admin_table is not self.admin_table or cached.user_table is not self.user_table:
+            cached = ClosureOverlay(self.admin_table, self.user_table)
+            st.session_state.combined_table = cached
+        return cached
     
     def render(self):
         """Render the user view."""
@@ -269,29 +391,51 @@ class UserView(BaseView):
         self._render_delete_user_node()
         
         # Download button for user table
-        user_csv = convert_df_to_csv(self.user_table.to_dataframe())
+        user_csv = convert_table_to_csv(self.user_table)
         st.sidebar.download_button(
             label="Stiahnuť používateľský closure_table ako CSV",
             data=user_csv,
             file_name='user_closure_table.csv',
             mime='text/csv'
         )
+        st.sidebar.download_button(
+            label="Stiahnuť používateľský strom ako zoznam hrán (CSV)",
+            data=convert_table_to_edges_csv(self.user_table),
+            file_name='user_edges.csv',
+            mime='text/csv'
+        )
+        if columnar_formats_available():
+            st.sidebar.download_button(
+                label="Stiahnuť používateľský closure_table ako Parquet",
+                data=convert_table_to_parquet(self.user_table),
+                file_name='user_closure_table.parquet',
+                mime='application/vnd.apache.parquet'
+            )
         
         # Interactive tree structure
         st.subheader("🌳 Interaktívna stromová štruktúra")
-        tree_data = build_tree_data(self.combined_table.to_dataframe())
-        selected = tree_select(tree_data)
+        lazy_tree = st.checkbox("Načítavať vetvy stromu až pri rozbalení", value=True, key="lazy_tree")
+        if lazy_tree:
+            # Only the expanded levels are sent; a newly expanded node's children are loaded on rerun
+            expanded = st.session_state.get('tree_expanded', [])
+            tree_data = build_lazy_tree_data(self.combined_table, expanded)
+            selected = tree_select(tree_data, expanded=expanded, key="lazy_tree_select")
+            if selected and set(selected.get('expanded', [])) != set(expanded):
+                st.session_state.tree_expanded = list(selected['expanded'])
+                st.rerun()
+        else:
+            tree_data = build_table_tree_data(self.combined_table)
+            selected = tree_select(tree_data)
         
         # Display node details when selected
         if selected and selected.get('value'):
             selected_node = selected['value']
-            node_info = self.combined_table.df[self.combined_table.df['descendant'] == selected_node].iloc[0]
+            node_info = self.combined_table.get_node(selected_node)
             
-            # Check if the required columns exist in the DataFrame
-            df = self.combined_table.to_dataframe()
-            has_user_defined = 'is_user_defined' in df.columns
-            has_node_type = 'node_type' in df.columns
-            has_attributes = 'attributes' in df.columns
+            # Check if the required columns exist in the node's row
+            has_user_defined = 'is_user_defined' in node_info.index
+            has_node_type = 'node_type' in node_info.index
+            has_attributes = 'attributes' in node_info.index
             
             with st.expander(f"Detaily uzla: {selected_node}", expanded=True):
                 # Display user_defined status with colored indicator
@@ -309,6 +453,11 @@ class UserView(BaseView):
                 else:
                     st.markdown("**Typ uzla:** Neurčený")
                 
+                # Completion score of the selected node's subtree
+                subtree_total, subtree_completed = self._completion_score().subtree(selected_node)
+                if subtree_total:
+                    st.markdown(f"**Skóre podstromu:** {subtree_completed} / {subtree_total}")
+                
                 # Display attributes if available
                 if has_attributes and node_info.get('attributes') and node_info.get('attributes') != '{}':
                     st.markdown("**Atribúty:**")
@@ -327,8 +476,35 @@ class UserView(BaseView):
         self.render_graph(self.combined_table)
         
         # Completion score
-        total, completed = compute_completion_score(self.combined_table.to_dataframe())
-        st.markdown(f"### Skóre vyplnenosti stromu: {completed} / {total} koncových KoKo uzlov má potomkov")
+        score = self._completion_score()
+        st.markdown(f"### Skóre vyplnenosti stromu: {score.completed} / {score.total} koncových KoKo uzlov má potomkov")
+    
+    def _completion_score(self):
+        """Get the completion score of the combined tree.
+        
+        The score is kept in the session state and updated from the changes
+        both tables journaled since the last call; it is recomputed only when
+        either table has been replaced.
+        
+        Returns:
+            CompletionScore: Score of the combined tree
+        """
+        cached = st.session_state.get('completion_score')
+        if cached is None or cached['admin_table'] is not self.admin_table or cached['user_table'] is not self.user_table:
+            score = CompletionScore(self.combined_table)
+        else:
+            score = cached['score']
+            if cached['versions'] != self.combined_table.version:
+                changes = self.admin_table.changes_since(cached['versions'][0])
+                changes.update(self.user_table.changes_since(cached['versions'][1]))
+                score.update(self.combined_table, changes)
+        st.session_state.completion_score = {
+            'admin_table': self.admin_table,
+            'user_table': self.user_table,
+            'versions': self.combined_table.version,
+            'score': score
+        }
+        return score
     
     def _render_add_user_node(self):
         """Render the UI for adding a user node."""
@@ -378,7 +554,7 @@ class UserView(BaseView):
                     # Add UUID to attributes
                     attributes['uuid'] = str(uuid.uuid4())
                     
-                    merged_table = self.admin_table.merge(self.user_table)
+                    merged_table = self.combined_table.materialize()
                     updated_table = merged_table.add_node(
                         selected_parent,
                         new_node_name.strip(),
@@ -389,7 +565,7 @@ class UserView(BaseView):
                     )
                     
                     # Update both the instance variable and the session state
-                    self.user_table = ClosureTable(updated_table.to_dataframe())
+                    self.user_table = updated_table
                     st.session_state.user_closure_table = self.user_table
                     
                     st.sidebar.success(f"Tvoj uzol '{new_node_name}' typu '{selected_node_type}' bol pridaný pod '{selected_parent}'!")